@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_userprofile_gmail_access_token_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='gmail_sent_today',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='gmail_sent_today_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -34,6 +34,9 @@ class UserProfile(models.Model):
     gmail_token_expires_at = models.DateTimeField(blank=True, null=True)
     gmail_email = models.EmailField(blank=True, null=True)
     gmail_connected = models.BooleanField(default=False)
+    # Sends through this Gmail connection today (campaign daily budget)
+    gmail_sent_today = models.IntegerField(default=0)
+    gmail_sent_today_date = models.DateField(blank=True, null=True)
     
     class Meta:
         verbose_name = "User Profile"
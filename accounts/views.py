@@ -138,49 +138,6 @@ class UserStatsView(APIView):
     
     def get(self, request):
         """Get user email statistics."""
-        from emails.models import EmailLog
-        
-        user = request.user
-        
-        # Get email statistics
-        total_emails = EmailLog.objects.filter(user=user).count()
-        
-        # This month
-        from datetime import datetime, timedelta
-        from django.utils import timezone
-        
-        now = timezone.now()
-        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        emails_this_month = EmailLog.objects.filter(
-            user=user, 
-            created_at__gte=start_of_month
-        ).count()
-        
-        # This week
-        start_of_week = now - timedelta(days=now.weekday())
-        start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
-        emails_this_week = EmailLog.objects.filter(
-            user=user, 
-            created_at__gte=start_of_week
-        ).count()
-        
-        # Unique recipients
-        unique_recipients = EmailLog.objects.filter(user=user).values_list('recipients', flat=True)
-        unique_count = set()
-        for recipients in unique_recipients:
-            if recipients:
-                unique_count.update(recipients.split(','))
-        
-        # Last email date
-        last_email = EmailLog.objects.filter(user=user).order_by('-created_at').first()
-        last_email_date = last_email.created_at if last_email else None
-        
-        stats = {
-            'total_emails': total_emails,
-            'emails_this_month': emails_this_month,
-            'emails_this_week': emails_this_week,
-            'unique_recipients': len(unique_count),
-            'last_email_date': last_email_date,
-        }
-        
-        return Response(stats)
\ No newline at end of file
+        from emails.stats import user_stats
+
+        return Response(user_stats(request.user))
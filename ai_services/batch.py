@@ -0,0 +1,69 @@
+"""
+Email generation for lists of businesses
+
+Businesses are split into GEMINI_BATCH_SIZE chunks (one Gemini call each) that
+run concurrently; results are yielded per business as their chunk finishes.
+Large lists run as a background job tracked by an AIRequest row whose
+response_data fills up as chunks complete.
+"""
+import time
+import logging
+from .email_generator import EmailGenerator, GEMINI_BATCH_SIZE
+from .executor import generate_concurrently
+from .sender_context import SenderContext
+from .models import AIRequest
+
+logger = logging.getLogger(__name__)
+
+
+def generate_emails(businesses, developer_name, developer_services, user=None, fresh=False):
+    """Yield (index, email) for every business, in completion order"""
+    # Sender details are looked up once here, not per chunk in the worker threads
+    sender = SenderContext.for_user(user, developer_name)
+    chunks = [businesses[i:i + GEMINI_BATCH_SIZE] for i in range(0, len(businesses), GEMINI_BATCH_SIZE)]
+
+    def generate(chunk):
+        return EmailGenerator.generate_intro_emails_batch(
+            chunk, developer_name, developer_services, user=user, batch_size=len(chunk), fresh=fresh, sender=sender
+        )
+
+    def fallback(chunk):
+        return [
+            {**email, 'source': 'template'}
+            for email in EmailGenerator.template_intro_emails(chunk, developer_name, developer_services, user, sender=sender)
+        ]
+
+    for chunk_index, emails, _ in generate_concurrently(chunks, generate, fallback):
+        offset = chunk_index * GEMINI_BATCH_SIZE
+        for position, email in enumerate(emails):
+            yield offset + position, email
+
+
+def run_batch_job(request_id):
+    """Background job: generate the emails stored on an AIRequest and save them as they complete"""
+    job = AIRequest.objects.select_related('user').get(pk=request_id)
+    data = job.request_data
+    results = [None] * len(data['businesses'])
+
+    AIRequest.objects.filter(pk=request_id).update(status='processing')
+    try:
+        completed = 0
+        last_saved = 0.0
+        for index, email in generate_emails(
+            data['businesses'], data['developer_name'], data['developer_services'],
+            user=job.user, fresh=data.get('fresh', False)
+        ):
+            results[index] = email
+            completed += 1
+            # Save progress at most once a second (and always at the end)
+            if completed == len(results) or time.monotonic() - last_saved >= 1:
+                AIRequest.objects.filter(pk=request_id).update(
+                    response_data={'completed': completed, 'total': len(results), 'results': results}
+                )
+                last_saved = time.monotonic()
+    except Exception as e:
+        logger.error(f"Batch email generation {request_id} failed: {str(e)}")
+        AIRequest.objects.filter(pk=request_id).update(status='failed')
+        return
+
+    AIRequest.objects.filter(pk=request_id).update(status='completed')
@@ -0,0 +1,111 @@
+"""
+Circuit breaker for the Gemini path
+
+Tracks the outcome of recent Gemini calls. When too many of them fail or are
+slow, the breaker opens and generation goes straight to the localized template
+emails without touching the network. After a cool-down it lets a probe call
+through (half-open); a good probe closes the breaker, a bad one re-opens it.
+"""
+import os
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Gemini while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Thread-safe breaker over a sliding window of call outcomes"""
+
+    def __init__(self, failure_rate=None, slow_call_seconds=None, slow_call_rate=None,
+                 window=None, min_calls=None, open_seconds=None, half_open_probes=None):
+        self.failure_rate = failure_rate or float(os.getenv('GEMINI_BREAKER_FAILURE_RATE', '0.5'))
+        # Per-email latency above this counts as a slow call
+        self.slow_call_seconds = slow_call_seconds or float(os.getenv('GEMINI_BREAKER_SLOW_CALL_SECONDS', '15'))
+        self.slow_call_rate = slow_call_rate or float(os.getenv('GEMINI_BREAKER_SLOW_CALL_RATE', '0.5'))
+        self.min_calls = min_calls or int(os.getenv('GEMINI_BREAKER_MIN_CALLS', '5'))
+        # Seconds to stay open before probing again
+        self.open_seconds = open_seconds or float(os.getenv('GEMINI_BREAKER_OPEN_SECONDS', '30'))
+        self.half_open_probes = half_open_probes or int(os.getenv('GEMINI_BREAKER_HALF_OPEN_PROBES', '1'))
+
+        self.state = CLOSED
+        self.opened_until = 0.0
+        self._probes = 0
+        self._outcomes = deque(maxlen=window or int(os.getenv('GEMINI_BREAKER_WINDOW', '20')))
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        """Cheap check for the fast path: open and not yet due for a probe"""
+        return self.state == OPEN and time.monotonic() < self.opened_until
+
+    def allow(self):
+        """Whether a call may go out now; every allowed call must be followed by record() or release()"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() < self.opened_until:
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def release(self):
+        """Give back an allowed call that ended without a verdict (throttled and retried, or abandoned)"""
+        with self._lock:
+            # Neither success nor failure: free the probe slot so the next call can probe instead
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record(self, latency=None, failed=False):
+        """Report how an allowed call went (latency per email, in seconds)"""
+        slow = latency is not None and latency > self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    logger.info("Gemini circuit closed")
+                return
+
+            self._outcomes.append((failed, slow))
+            total = len(self._outcomes)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, s in self._outcomes if s)
+            if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_until = time.monotonic() + self.open_seconds
+        self._outcomes.clear()
+        logger.warning(f"Gemini circuit open for {self.open_seconds:.0f}s, using template emails")
+
+    def stats(self):
+        with self._lock:
+            total = len(self._outcomes)
+            return {
+                'state': self.state,
+                'retry_in': round(max(0.0, self.opened_until - time.monotonic()), 1) if self.state == OPEN else 0,
+                'recent_calls': total,
+                'failure_rate': round(sum(1 for f, _ in self._outcomes if f) / total, 3) if total else 0.0,
+                'slow_call_rate': round(sum(1 for _, s in self._outcomes if s) / total, 3) if total else 0.0,
+            }
+
+
+gemini_breaker = CircuitBreaker()
@@ -0,0 +1,108 @@
+"""
+Adaptive (AIMD) concurrency control for Gemini calls
+
+Every generate_content call takes a slot from a process-wide limiter. The
+limit grows by one slot per window of fast successes (additive increase) and
+halves when Gemini throttles us or latency climbs well above the observed
+baseline (multiplicative decrease), so throughput settles just under the
+provider's limit instead of alternating between idle and 429 floods.
+"""
+import os
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def is_throttle_error(exc):
+    """True for Gemini 429 / RESOURCE_EXHAUSTED responses"""
+    code = getattr(exc, 'code', None)
+    if getattr(code, 'value', code) == 429 or type(exc).__name__ in ('ResourceExhausted', 'TooManyRequests'):
+        return True
+    text = str(exc)
+    return '429' in text or 'RESOURCE_EXHAUSTED' in text
+
+
+class AdaptiveLimiter:
+    """Thread-safe AIMD limit on concurrent requests"""
+
+    # Outcomes kept for the recent error/throttle rates
+    WINDOW = 100
+
+    def __init__(self, initial=None, min_limit=1, max_limit=None, latency_tolerance=None):
+        self.max_limit = max_limit or int(os.getenv('AI_GENERATION_MAX_CONCURRENCY', '32'))
+        self.min_limit = min_limit
+        self.limit = float(min(self.max_limit, initial or int(os.getenv('AI_GENERATION_CONCURRENCY', '8'))))
+        # Latency above baseline * tolerance counts as congestion
+        self.latency_tolerance = latency_tolerance or float(os.getenv('AI_GENERATION_LATENCY_TOLERANCE', '2.0'))
+
+        self.in_flight = 0
+        self.baseline_latency = None
+        self.latency_ewma = None
+        self._last_decrease = 0.0
+        self._outcomes = deque(maxlen=self.WINDOW)
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """Hold one request slot; report the outcome with record()"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify()
+
+    def record(self, latency=None, error=None):
+        """Adjust the limit after a request finished (error=None for success)"""
+        with self._cond:
+            throttled = error is not None and is_throttle_error(error)
+            self._outcomes.append('throttled' if throttled else 'error' if error is not None else 'ok')
+
+            if latency is not None and error is None:
+                self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+                # Baseline follows the fastest recent responses and drifts up slowly
+                self.baseline_latency = latency if self.baseline_latency is None else min(latency, self.baseline_latency * 1.01)
+
+            congested = (
+                latency is not None and self.baseline_latency
+                and latency > self.baseline_latency * self.latency_tolerance
+            )
+            if throttled or congested:
+                self._decrease()
+            elif error is None and self.in_flight >= int(self.limit) - 1:
+                # +1 slot after roughly `limit` successes, only while the current limit is in use
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _decrease(self):
+        # Requests already in flight saw the same congestion: back off once per round trip
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency_ewma or 1.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit / 2)
+        logger.info(f"Gemini concurrency limit reduced to {int(self.limit)}")
+
+    def stats(self):
+        with self._cond:
+            total = len(self._outcomes)
+            return {
+                'limit': int(self.limit),
+                'max_limit': self.max_limit,
+                'in_flight': self.in_flight,
+                'error_rate': round(sum(1 for o in self._outcomes if o != 'ok') / total, 3) if total else 0.0,
+                'throttle_rate': round(self._outcomes.count('throttled') / total, 3) if total else 0.0,
+                'latency_ewma': round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+                'baseline_latency': round(self.baseline_latency, 3) if self.baseline_latency is not None else None,
+            }
+
+
+gemini_limiter = AdaptiveLimiter()
@@ -4,23 +4,33 @@ AI Email Content Generation Service
 This module provides AI-powered email content generation for developers
 to reach out to local businesses.
 
-Now includes automatic language detection based on business location:
+Now includes automatic language detection based on business location
+(country, city or ISO country code, see language.py), e.g.:
 Italy → Italian
 France → French
 Spain → Spanish
 Morocco → Arabic
 Germany → German
+Portugal/Brazil → Portuguese
+Netherlands → Dutch
 UK/US → English
 """
 
 import os
 import json
 import re
+import time
 
-try:
-    import google.generativeai as genai  # type: ignore
-except Exception:  # pragma: no cover
-    genai = None
+from .gemini import get_model, generate_content, stream_content, DEFAULT_MODEL
+from .circuit_breaker import gemini_breaker, CircuitOpenError
+from .streaming import IncrementalEmailParser
+from .generation_cache import generation_cache, make_key
+from .sender_context import SenderContext
+from .language import language_resolver
+from .prompts import OUTREACH_SYSTEM_INSTRUCTION, intro_payload, business_line, batch_payload
+
+# Businesses per Gemini call in generate_intro_emails_batch
+GEMINI_BATCH_SIZE = int(os.getenv('GEMINI_BATCH_SIZE', '10'))
 
 
 class EmailGenerator:
@@ -72,148 +82,284 @@ class EmailGenerator:
         }
 
     @staticmethod
-    def detect_language_from_location(location: str) -> str:
-        """Detect email language automatically based on location (country or city string)."""
-        if not location:
-            return 'English'
-
-        loc = location.lower().strip()
-        if any(country in loc for country in ['italy', 'italia', 'pisa', 'milano', 'roma', 'napoli']):
-            return 'Italian'
-        elif any(country in loc for country in ['france', 'paris', 'lyon', 'marseille']):
-            return 'French'
-        elif any(country in loc for country in ['spain', 'españa', 'madrid', 'barcelona']):
-            return 'Spanish'
-        elif any(country in loc for country in ['morocco', 'maroc', 'casablanca', 'rabat', 'marrakech']):
-            return 'Arabic'
-        elif any(country in loc for country in ['germany', 'deutschland', 'berlin', 'munich', 'frankfurt']):
-            return 'German'
-        elif any(country in loc for country in ['united kingdom', 'england', 'london', 'uk', 'usa', 'united states', 'america']):
-            return 'English'
-        return 'English'
+    def detect_language_from_location(location: str, country_code: str = None) -> str:
+        """Detect email language automatically based on location (country or city string) or ISO country code."""
+        return language_resolver.language(location, country_code)
+
+    @staticmethod
+    def business_language(business):
+        """Email language for a business dict from search results / campaign recipients."""
+        location_str = f"{business.get('city') or ''}, {business.get('country') or ''}".strip(", ")
+        return language_resolver.language(location_str, business.get('country_code'))
 
     @staticmethod
     def generate_intro_email(business_name, business_category, developer_name, developer_services,
-                             user=None, business_country=None, business_city=None):
+                             user=None, business_country=None, business_city=None, fresh=False, sender=None,
+                             business_country_code=None):
         """
         Generate an introductory email in the correct language based on the business location.
+
+        Gemini results are cached by their inputs; pass fresh=True to always generate a new one.
+        'source' in the result is the path used: gemini, cache, template (Gemini unavailable
+        or failed) or circuit_open (Gemini skipped because the circuit breaker is open).
+        Pass a prebuilt SenderContext as sender when generating several emails for one user.
         """
-        user_info = EmailGenerator.get_user_info(user)
-        actual_name = user_info['full_name'] if user_info['full_name'] != 'Developer' else developer_name
+        sender = sender or SenderContext.for_user(user, developer_name)
 
         # Combine location fields
         location_str = f"{business_city or ''}, {business_country or ''}".strip(", ")
-        target_language = EmailGenerator.detect_language_from_location(location_str)
-
-        api_key = os.getenv('GEMINI_API_KEY', '')
-        model_name = os.getenv('GEMINI_MODEL', 'models/gemini-2.0-flash')
+        target_language = EmailGenerator.detect_language_from_location(location_str, business_country_code)
+
+        # Shared model (configured once per process, instructions context-cached) if Gemini is available
+        model = get_model(system_instruction=OUTREACH_SYSTEM_INSTRUCTION)
+        fallback_source = 'template'
+        if model is not None:
+            cache_key = EmailGenerator.generation_cache_key(
+                business_name, business_category, business_city, business_country,
+                developer_services, sender, target_language
+            )
+            if not fresh:
+                cached = generation_cache.get(cache_key)
+                if cached is not None:
+                    return {**cached, 'source': 'cache', 'cached': True}
 
-        # Use Gemini AI if available
-        if genai and api_key:
             try:
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel(model_name)
-
-                contact_info = []
-                if user_info.get('phone'):
-                    contact_info.append(f"Phone: {user_info['phone']}")
-                if user_info.get('website_url'):
-                    contact_info.append(f"Website: {user_info['website_url']}")
-                if user_info.get('company'):
-                    contact_info.append(f"Company: {user_info['company']}")
-                if user_info.get('job_title'):
-                    contact_info.append(f"Title: {user_info['job_title']}")
-                contact_string = "\n".join(contact_info)
-
-                location_context = f"Business located in {location_str}. Write in {target_language}."
-
-                # Build business research context
-                business_research_context = f"""
-BUSINESS RESEARCH REQUIRED:
-Before writing the email, you MUST research this business and analyze their needs:
-
-1. RESEARCH THE BUSINESS: Search for information about {business_name} online to understand their business better
-2. FIND REAL CONTACT NAMES: Try to find the actual name of the business owner/manager online
-3. RESEARCH THE BUSINESS TYPE: What are common digital needs for {business_category} businesses?
-4. IDENTIFY SPECIFIC PAIN POINTS: What challenges do {business_category} businesses typically face?
-5. SUGGEST RELEVANT SOLUTIONS: What digital solutions would be most valuable for this type of business?
-6. PERSONALIZE THE APPROACH: How can you tailor your services to their specific industry needs?
-
-Business Name: {business_name}
-Business Category: {business_category}
-Location: {business_city or 'Unknown'}, {business_country or 'Unknown'}
-
-IMPORTANT: If you find a real contact name, use it. If not, use simple "Gentile Sig.ra/Sig." - NEVER use placeholder text like "Ricerca il nome di un responsabile se disponibile online".
-"""
-                
-                # Build contact information context (only include what exists)
-                contact_context = "DEVELOPER CONTACT INFORMATION (ONLY include what is available):\n"
-                if user_info.get('phone'):
-                    contact_context += f"- Phone: {user_info['phone']}\n"
-                if user_info.get('website_url'):
-                    contact_context += f"- Website: {user_info['website_url']}\n"
-                if user_info.get('github_url'):
-                    contact_context += f"- GitHub: {user_info['github_url']}\n"
-                if user_info.get('linkedin_url'):
-                    contact_context += f"- LinkedIn: {user_info['linkedin_url']}\n"
-                if user_info.get('company'):
-                    contact_context += f"- Company: {user_info['company']}\n"
-                if user_info.get('job_title'):
-                    contact_context += f"- Title: {user_info['job_title']}\n"
-                
-                if contact_context == "DEVELOPER CONTACT INFORMATION (ONLY include what is available):\n":
-                    contact_context += "- Only name is available\n"
-
-                prompt = (
-                    f"Write a professional outreach email FROM {actual_name} TO {business_name}.\n"
-                    f"Category: {business_category}\n"
-                    f"Developer offers: {developer_services}\n"
-                    f"{location_context}\n\n"
-                    f"{business_research_context}\n"
-                    f"{contact_context}\n"
-                    f"\nCRITICAL REQUIREMENTS:\n"
-                    f"- Write the subject and body entirely in {target_language}\n"
-                    f"- Use correct business etiquette for {target_language}\n"
-                    f"- Use the name '{actual_name}' exactly as given\n"
-                    f"- RESEARCH the business online to find real contact names if possible\n"
-                    f"- If you find a real contact name, use it in the greeting\n"
-                    f"- If no real name found, use simple 'Gentile Sig.ra/Sig.' or equivalent in {target_language}\n"
-                    f"- NEVER use placeholder text like 'Ricerca il nome di un responsabile se disponibile online'\n"
-                    f"- RESEARCH the business type and suggest relevant digital solutions\n"
-                    f"- PERSONALIZE the email based on what {business_category} businesses typically need\n"
-                    f"- Be specific about how you can help their business grow\n"
-                    f"- Mention relevant services for their industry\n"
-                    f"- Include ONLY the contact information that is actually available from the database\n"
-                    f"- Do NOT include placeholder text like [Your Phone Number], [Your Website], or [Link to your website/portfolio]\n"
-                    f"- Use ONLY real contact information from the developer's profile\n"
-                    f"- End with a professional signature using only available contact information\n"
-                    f"- Return valid JSON with keys 'subject' and 'body'\n"
+                if gemini_breaker.is_open():
+                    # Gemini is failing or slow: use the template right away
+                    raise CircuitOpenError('Gemini circuit is open')
+
+                prompt = EmailGenerator.build_intro_prompt(
+                    business_name, business_category, business_city, business_country,
+                    developer_services, sender, target_language
                 )
 
-                resp = model.generate_content(prompt)
+                started = time.monotonic()
+                resp = generate_content(model, prompt)
+                latency = time.monotonic() - started
                 text = resp.text or ''
                 match = re.search(r"\{[\s\S]*\}", text)
                 if match:
                     data = json.loads(match.group(0))
-                    return {
+                    result = {
                         'subject': data.get('subject', f"Partnership Opportunity - {business_name}"),
                         'body': data.get('body', ''),
                         'source': 'gemini'
                     }
+                    usage = getattr(resp, 'usage_metadata', None)
+                    generation_cache.put(cache_key, result, latency, getattr(usage, 'total_token_count', 0))
+                    return result
+            except CircuitOpenError:
+                fallback_source = 'circuit_open'
             except Exception:
                 pass  # fallback to template below
 
-        # Build signature with real contact info
-        signature_parts = [actual_name]
-        if user_info.get('phone'):
-            signature_parts.append(user_info['phone'])
-        if user_info.get('website_url'):
-            signature_parts.append(user_info['website_url'])
-        if user_info.get('github_url'):
-            signature_parts.append(user_info['github_url'])
-        if user_info.get('company'):
-            signature_parts.append(user_info['company'])
-        signature = "\n".join(signature_parts)
+        email = EmailGenerator.template_email(business_name, developer_services, sender, target_language)
+        return {**email, 'source': fallback_source}
+
+    @staticmethod
+    def stream_intro_email(business_name, business_category, developer_name, developer_services,
+                           user=None, business_country=None, business_city=None, fresh=False, sender=None,
+                           business_country_code=None):
+        """
+        Streaming variant of generate_intro_email.
+
+        Yields ('delta', {'field', 'text'}) events while Gemini writes the subject and body,
+        then one ('result', email) event with the validated email (same shape as
+        generate_intro_email). If the stream fails the result is the template email.
+        """
+        sender = sender or SenderContext.for_user(user, developer_name)
+        location_str = f"{business_city or ''}, {business_country or ''}".strip(", ")
+        target_language = EmailGenerator.detect_language_from_location(location_str, business_country_code)
+
+        model = get_model(system_instruction=OUTREACH_SYSTEM_INSTRUCTION)
+        fallback_source = 'template'
+        if model is not None:
+            cache_key = EmailGenerator.generation_cache_key(
+                business_name, business_category, business_city, business_country,
+                developer_services, sender, target_language
+            )
+            cached = None if fresh else generation_cache.get(cache_key)
+            if cached is not None:
+                yield 'result', {**cached, 'source': 'cache', 'cached': True}
+                return
+
+            try:
+                if gemini_breaker.is_open():
+                    raise CircuitOpenError('Gemini circuit is open')
+
+                prompt = EmailGenerator.build_intro_prompt(
+                    business_name, business_category, business_city, business_country,
+                    developer_services, sender, target_language
+                )
+                parser = IncrementalEmailParser()
+                tokens = 0
+                started = time.monotonic()
+                for chunk in stream_content(model, prompt):
+                    for field, text in parser.feed(EmailGenerator._chunk_text(chunk)):
+                        yield 'delta', {'field': field, 'text': text}
+                    usage = getattr(chunk, 'usage_metadata', None)
+                    tokens = getattr(usage, 'total_token_count', 0) or tokens
+                latency = time.monotonic() - started
+
+                data = parser.result()
+                if data.get('subject') and data.get('body'):
+                    result = {'subject': data['subject'], 'body': data['body'], 'source': 'gemini'}
+                    generation_cache.put(cache_key, result, latency, tokens)
+                    yield 'result', result
+                    return
+            except CircuitOpenError:
+                fallback_source = 'circuit_open'
+            except Exception:
+                pass  # fallback to template below
+
+        email = EmailGenerator.template_email(business_name, developer_services, sender, target_language)
+        yield 'result', {**email, 'source': fallback_source}
+
+    @staticmethod
+    def _chunk_text(chunk):
+        # Chunks without text parts (e.g. the final usage-only chunk) raise on .text
+        try:
+            return chunk.text or ''
+        except Exception:
+            return ''
+
+    @staticmethod
+    def build_intro_prompt(business_name, business_category, business_city, business_country,
+                           developer_services, sender, target_language):
+        """Per-call prompt for one email; the instructions are in OUTREACH_SYSTEM_INSTRUCTION."""
+        return intro_payload(
+            sender, developer_services, business_name, business_category,
+            business_city, business_country, target_language
+        )
+
+    @staticmethod
+    def generate_intro_emails_batch(businesses, developer_name, developer_services, user=None,
+                                    batch_size=None, fresh=False, sender=None):
+        """
+        Generate intro emails for many businesses with one Gemini call per batch.
+
+        businesses are dicts with name, category, city and country (as in search results).
+        Returns one result per business, in order. Cached results are reused unless fresh=True;
+        businesses missing or invalid in a batch response are generated one by one.
+        """
+        sender = sender or SenderContext.for_user(user, developer_name)
+        batch_size = batch_size or GEMINI_BATCH_SIZE
+        results = [None] * len(businesses)
+
+        model = get_model(system_instruction=OUTREACH_SYSTEM_INSTRUCTION)
+        if model is not None:
+            pending = []
+            for index, business in enumerate(businesses):
+                cache_key = EmailGenerator.generation_cache_key(
+                    business.get('name', 'Business'), business.get('category', 'business'),
+                    business.get('city'), business.get('country'),
+                    developer_services, sender, EmailGenerator.business_language(business)
+                )
+                cached = None if fresh else generation_cache.get(cache_key)
+                if cached is not None:
+                    results[index] = {**cached, 'source': 'cache', 'cached': True}
+                else:
+                    pending.append((index, cache_key))
+
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                try:
+                    generated, latency, tokens = EmailGenerator._generate_batch(
+                        model, [businesses[index] for index, _ in chunk],
+                        developer_services, sender
+                    )
+                except Exception:
+                    continue  # every business in the chunk falls back to single generation
+
+                for position, (index, cache_key) in enumerate(chunk):
+                    result = generated.get(position)
+                    if result is not None:
+                        results[index] = result
+                        # Attribute an even share of the call to each email
+                        generation_cache.put(cache_key, result, latency / len(generated), tokens // len(generated))
+
+        for index, business in enumerate(businesses):
+            if results[index] is None:
+                results[index] = EmailGenerator.generate_intro_email(
+                    business_name=business.get('name', 'Business'),
+                    business_category=business.get('category', 'business'),
+                    developer_name=developer_name,
+                    developer_services=developer_services,
+                    user=user,
+                    business_country=business.get('country'),
+                    business_city=business.get('city'),
+                    fresh=True,  # cache was already checked above
+                    sender=sender,
+                    business_country_code=business.get('country_code')
+                )
+        return results
+
+    @staticmethod
+    def template_intro_emails(businesses, developer_name, developer_services, user=None, sender=None):
+        """Localized template emails for businesses (no Gemini call), e.g. after a missed deadline."""
+        sender = sender or SenderContext.for_user(user, developer_name)
+
+        emails = []
+        for business in businesses:
+            emails.append(EmailGenerator.template_email(
+                business.get('name', 'Business'), developer_services,
+                sender, EmailGenerator.business_language(business)
+            ))
+        return emails
+
+    @staticmethod
+    def _generate_batch(model, businesses, developer_services, sender):
+        """One Gemini call for several businesses; returns ({position: result}, latency, tokens)."""
+        lines = []
+        for business in businesses:
+            lines.append(business_line(
+                business.get('name', 'Business'), business.get('category', 'business'),
+                business.get('city'), business.get('country'), EmailGenerator.business_language(business)
+            ))
+        prompt = batch_payload(sender, developer_services, lines)
+
+        started = time.monotonic()
+        resp = generate_content(model, prompt, items=len(businesses))
+        latency = time.monotonic() - started
+        usage = getattr(resp, 'usage_metadata', None)
+        tokens = getattr(usage, 'total_token_count', 0) or 0
+
+        generated = {}
+        match = re.search(r"\[[\s\S]*\]", resp.text or '')
+        items = json.loads(match.group(0)) if match else []
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            index, subject, body = item.get('index'), item.get('subject'), item.get('body')
+            if not isinstance(index, int) or not 1 <= index <= len(businesses) or (index - 1) in generated:
+                continue
+            if not isinstance(subject, str) or not isinstance(body, str) or not subject.strip() or not body.strip():
+                continue
+            generated[index - 1] = {'subject': subject, 'body': body, 'source': 'gemini'}
+        return generated, latency, tokens
+
+    @staticmethod
+    def generation_cache_key(business_name, business_category, business_city, business_country,
+                             developer_services, sender, target_language):
+        """Cache key for one generated email (same inputs give the same prompt)."""
+        # The resolved language rather than the country code: it is what the prompt actually uses
+        return make_key(
+            os.getenv('GEMINI_MODEL', DEFAULT_MODEL),
+            business_name=business_name,
+            business_category=business_category,
+            business_city=business_city,
+            business_country=business_country,
+            target_language=target_language,
+            developer_services=developer_services,
+            sender=sender.fingerprint,
+        )
+
+    @staticmethod
+    def template_email(business_name, developer_services, sender, target_language):
+        """Localized template email used when Gemini is unavailable or fails."""
+        actual_name = sender.name
+        # Closing line plus signature with real contact info, built once per sender
+        signature = sender.sign_off(target_language)
 
         # Localized fallback templates
         if target_language == 'Italian':
@@ -223,7 +369,7 @@ IMPORTANT: If you find a real contact name, use it. If not, use simple "Gentile
                 f"Mi chiamo {actual_name}, e mi occupo di {developer_services}.\n"
                 f"Sarei felice di discutere come possiamo collaborare per migliorare la vostra presenza digitale.\n\n"
                 f"Possiamo sentirci questa settimana?\n\n"
-                f"Cordiali saluti,\n{signature}"
+                f"{signature}"
             )
         elif target_language == 'French':
             subject = f"Opportunité de Partenariat - {business_name}"
@@ -232,7 +378,7 @@ IMPORTANT: If you find a real contact name, use it. If not, use simple "Gentile
                 f"Je m'appelle {actual_name}, et je suis spécialisé dans {developer_services}.\n"
                 f"J'aimerais discuter d'une collaboration pour renforcer votre présence digitale.\n\n"
                 f"Êtes-vous disponibles pour un appel cette semaine ?\n\n"
-                f"Cordialement,\n{signature}"
+                f"{signature}"
             )
         elif target_language == 'Spanish':
             subject = f"Oportunidad de Colaboración - {business_name}"
@@ -241,7 +387,7 @@ IMPORTANT: If you find a real contact name, use it. If not, use simple "Gentile
                 f"Me llamo {actual_name}, y me especializo en {developer_services}.\n"
                 f"Me encantaría hablar sobre cómo podríamos colaborar para mejorar su presencia digital.\n\n"
                 f"¿Podemos agendar una breve llamada esta semana?\n\n"
-                f"Atentamente,\n{signature}"
+                f"{signature}"
             )
         elif target_language == 'Arabic':
             subject = f"فرصة تعاون - {business_name}"
@@ -250,7 +396,7 @@ IMPORTANT: If you find a real contact name, use it. If not, use simple "Gentile
                 f"اسمي {actual_name}، وأنا متخصص في {developer_services}.\n"
                 f"يسعدني أن أتناقش معكم حول إمكانية التعاون لتعزيز حضوركم الرقمي.\n\n"
                 f"هل يمكننا التحدث هذا الأسبوع؟\n\n"
-                f"مع أطيب التحيات،\n{signature}"
+                f"{signature}"
             )
         elif target_language == 'German':
             subject = f"Partnerschaftsmöglichkeit - {business_name}"
@@ -258,7 +404,25 @@ IMPORTANT: If you find a real contact name, use it. If not, use simple "Gentile
                 f"Sehr geehrte Damen und Herren,\n\n"
                 f"Mein Name ist {actual_name}, und ich bin spezialisiert auf {developer_services}.\n"
                 f"Ich würde mich freuen, mit Ihnen über eine mögliche Zusammenarbeit zu sprechen.\n\n"
-                f"Mit freundlichen Grüßen,\n{signature}"
+                f"{signature}"
+            )
+        elif target_language == 'Portuguese':
+            subject = f"Oportunidade de Parceria - {business_name}"
+            body = (
+                f"Prezados,\n\n"
+                f"O meu nome é {actual_name}, e sou especializado em {developer_services}.\n"
+                f"Gostaria de conversar sobre como podemos colaborar para melhorar a vossa presença digital.\n\n"
+                f"Podemos marcar uma breve chamada esta semana?\n\n"
+                f"{signature}"
+            )
+        elif target_language == 'Dutch':
+            subject = f"Samenwerkingsmogelijkheid - {business_name}"
+            body = (
+                f"Geachte heer/mevrouw,\n\n"
+                f"Mijn naam is {actual_name}, en ik ben gespecialiseerd in {developer_services}.\n"
+                f"Ik bespreek graag hoe we kunnen samenwerken om uw digitale aanwezigheid te versterken.\n\n"
+                f"Heeft u deze week tijd voor een kort gesprek?\n\n"
+                f"{signature}"
             )
         else:
             subject = f"Partnership Opportunity - {business_name}"
@@ -267,10 +431,9 @@ IMPORTANT: If you find a real contact name, use it. If not, use simple "Gentile
                 f"My name is {actual_name}, and I specialize in {developer_services}.\n"
                 f"I'd love to explore how we can collaborate to improve your digital presence.\n\n"
                 f"Would you be open to a short call this week?\n\n"
-                f"Best regards,\n{signature}"
+                f"{signature}"
             )
 
-
         return {'subject': subject, 'body': body, 'source': 'template'}
 
     @staticmethod
@@ -278,14 +441,14 @@ IMPORTANT: If you find a real contact name, use it. If not, use simple "Gentile
         """
         Generate a template for bulk emails to businesses in a specific category.
         """
-        user_info = EmailGenerator.get_user_info(user)
-        actual_name = user_info['full_name'] if user_info['full_name'] != 'Developer' else developer_name
+        sender = SenderContext.for_user(user, developer_name)
+        actual_name = sender.name
 
         subject = f"Digital Solutions for {category.title()} Businesses"
 
         signature_parts = [actual_name]
         for field in ('company', 'phone', 'website'):
-            val = user_info.get(field)
+            val = sender.info.get(field)
             if val:
                 signature_parts.append(val)
         signature = "\n".join(signature_parts)
@@ -0,0 +1,88 @@
+"""
+Bounded-concurrency executor for AI generation
+
+Runs many generation requests in parallel with at most N in flight and yields
+each result as soon as it finishes, so callers can persist progress instead of
+waiting for the slowest request. A request still running when its deadline
+passes is answered with the caller's fallback (the localized template email)
+and its late result is discarded; its worker stays busy until the SDK call
+returns, so concurrency never exceeds the bound.
+
+Long-running generation jobs (campaign prepare, async batches) run on their
+own small pool via submit_job(), so they never occupy the email send workers.
+"""
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Gemini requests in flight at once for one job
+AI_GENERATION_CONCURRENCY = int(os.getenv('AI_GENERATION_CONCURRENCY', '8'))
+# Seconds a request may run before the template fallback is used
+AI_GENERATION_DEADLINE = float(os.getenv('AI_GENERATION_DEADLINE', '60'))
+
+_job_executor = ThreadPoolExecutor(max_workers=settings.AI_JOB_WORKERS, thread_name_prefix='ai-job')
+
+
+def submit_job(fn, *args, **kwargs):
+    """Run a generation job in the background job pool with fresh database connections"""
+    def run():
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Background generation job {getattr(fn, '__name__', fn)} failed: {str(e)}")
+        finally:
+            close_old_connections()
+    return _job_executor.submit(run)
+
+
+def generate_concurrently(items, generate, fallback, max_in_flight=None, deadline=None):
+    """
+    Yield (index, result, timed_out) for every item, in completion order.
+
+    generate(item) runs in a worker thread; fallback(item) is used when it
+    raises or runs past the deadline (measured from when the request starts).
+    """
+    max_in_flight = max_in_flight or AI_GENERATION_CONCURRENCY
+    deadline = deadline or AI_GENERATION_DEADLINE
+    items = list(items)
+    if not items:
+        return
+
+    started = {}
+
+    def run(index):
+        started[index] = time.monotonic()
+        return generate(items[index])
+
+    executor = ThreadPoolExecutor(max_workers=min(max_in_flight, len(items)), thread_name_prefix='ai-generate')
+    try:
+        pending = {executor.submit(run, index): index for index in range(len(items))}
+        while pending:
+            now = time.monotonic()
+            running = [started[i] for i in pending.values() if i in started]
+            timeout = max(0.0, min(running) + deadline - now) if running else deadline
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    yield index, future.result(), False
+                except Exception as e:
+                    logger.warning(f"AI generation failed, using fallback: {str(e)}")
+                    yield index, fallback(items[index]), False
+
+            now = time.monotonic()
+            for future, index in list(pending.items()):
+                if index in started and now - started[index] >= deadline and not future.done():
+                    del pending[future]
+                    logger.warning(f"AI generation exceeded {deadline:.0f}s deadline, using fallback")
+                    yield index, fallback(items[index]), True
+    finally:
+        # Do not wait for requests that already missed their deadline
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,184 @@
+"""
+Process-wide registry of configured Gemini models
+
+`genai.configure()` throws away the SDK's default clients (and their gRPC
+channels), so calling it before every generation meant a new client and a new
+connection per email. The registry configures the SDK once per API key and
+keeps one `GenerativeModel` per (api_key, model_name, system_instruction); a
+model binds its client on first use and keeps reusing it. A static system
+instruction is put in a Gemini context cache when the model supports it, so
+calls only send (and pay full price for) their small per-request payload.
+generate_content() runs calls under the adaptive concurrency limit, the
+circuit breaker and a per-call latency budget, and records token usage;
+stream_content() does the same for streamed responses.
+"""
+import os
+import time
+import random
+import threading
+import logging
+from datetime import timedelta
+from .concurrency import gemini_limiter, is_throttle_error
+from .circuit_breaker import gemini_breaker, CircuitOpenError
+from .token_usage import token_usage
+
+try:
+    import google.generativeai as genai  # type: ignore
+except Exception:  # pragma: no cover
+    genai = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'models/gemini-2.0-flash'
+
+# Extra attempts for a throttled call once the limiter has backed off
+GEMINI_THROTTLE_RETRIES = int(os.getenv('GEMINI_THROTTLE_RETRIES', '2'))
+# Seconds one call may take before the SDK gives up on it
+GEMINI_LATENCY_BUDGET = float(os.getenv('GEMINI_LATENCY_BUDGET', '45'))
+# Put system instructions in a Gemini context cache (skipped when the model or instruction size does not allow it)
+GEMINI_CONTEXT_CACHE = os.getenv('GEMINI_CONTEXT_CACHE', 'true').lower() == 'true'
+# Seconds a context cache lives; models are rebuilt (and caching retried) after this
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', '3600'))
+
+
+class GeminiModelRegistry:
+    """Thread-safe cache of GenerativeModel objects keyed by (api_key, model_name, system_instruction)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._configured_key = None
+
+    def get_model(self, api_key=None, model_name=None, system_instruction=None):
+        """Return the shared model, or None when Gemini is unavailable"""
+        api_key = api_key if api_key is not None else os.getenv('GEMINI_API_KEY', '')
+        model_name = model_name or os.getenv('GEMINI_MODEL', DEFAULT_MODEL)
+        if not genai or not api_key:
+            return None
+
+        key = (api_key, model_name, system_instruction)
+        entry = self._models.get(key)
+        if entry is not None and (entry[1] is None or time.monotonic() < entry[1]):
+            return entry[0]
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None or (entry[1] is not None and time.monotonic() >= entry[1]):
+                self._configure(api_key)
+                entry = self._build(model_name, system_instruction)
+                self._models[key] = entry
+        return entry[0]
+
+    def _build(self, model_name, system_instruction):
+        # Returns (model, expires_at); expires_at is None for models that never need rebuilding
+        if not system_instruction:
+            return genai.GenerativeModel(model_name), None
+
+        expires_at = time.monotonic() + GEMINI_CONTEXT_CACHE_TTL
+        if GEMINI_CONTEXT_CACHE:
+            try:
+                cached = genai.caching.CachedContent.create(
+                    model=model_name,
+                    system_instruction=system_instruction,
+                    ttl=timedelta(seconds=GEMINI_CONTEXT_CACHE_TTL),
+                )
+                # Rebuild a minute before the server drops the cache
+                return genai.GenerativeModel.from_cached_content(cached), expires_at - 60
+            except Exception as e:
+                # Typically an instruction below the model's minimum cacheable size
+                logger.info(f"Gemini context cache unavailable for {model_name}, sending the system instruction instead: {str(e)}")
+        # Retry caching once the TTL has passed
+        return genai.GenerativeModel(model_name, system_instruction=system_instruction), expires_at
+
+    def configure(self, api_key=None):
+        """Configure the SDK for api_key unless it already is (for non-model calls like list_models)"""
+        api_key = api_key if api_key is not None else os.getenv('GEMINI_API_KEY', '')
+        with self._lock:
+            self._configure(api_key)
+
+    def _configure(self, api_key):
+        # The SDK keeps one global configuration; only reconfigure when the key changes
+        if api_key != self._configured_key:
+            genai.configure(api_key=api_key)
+            self._configured_key = api_key
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._configured_key = None
+
+
+model_registry = GeminiModelRegistry()
+
+
+def get_model(api_key=None, model_name=None, system_instruction=None):
+    return model_registry.get_model(api_key, model_name, system_instruction)
+
+
+def generate_content(model, prompt, items=1):
+    """
+    model.generate_content under the adaptive concurrency limit, retrying throttled calls.
+
+    items is how many emails the prompt asks for; latency is compared per item
+    so batch and single calls share one baseline, and token usage is recorded
+    per item. Raises CircuitOpenError without calling Gemini while the breaker is open.
+    """
+    for attempt in range(GEMINI_THROTTLE_RETRIES + 1):
+        if not gemini_breaker.allow():
+            raise CircuitOpenError('Gemini circuit is open')
+        with gemini_limiter.slot():
+            started = time.monotonic()
+            try:
+                resp = model.generate_content(prompt, request_options={'timeout': GEMINI_LATENCY_BUDGET})
+            except Exception as e:
+                latency = (time.monotonic() - started) / items
+                gemini_limiter.record(latency, e)
+                retry = is_throttle_error(e) and attempt < GEMINI_THROTTLE_RETRIES
+                # Throttles are the limiter's job; only count them once retries are exhausted,
+                # and never as a success (a throttled half-open probe must not close the breaker)
+                if retry:
+                    gemini_breaker.release()
+                else:
+                    gemini_breaker.record(latency, failed=True)
+                    raise
+            else:
+                latency = (time.monotonic() - started) / items
+                gemini_limiter.record(latency)
+                gemini_breaker.record(latency)
+                token_usage.record(getattr(resp, 'usage_metadata', None), items, latency * items)
+                return resp
+        # Jittered backoff so throttled callers do not come back together
+        time.sleep(random.uniform(0.5, 1.5) * 2 ** attempt)
+
+
+def stream_content(model, prompt):
+    """Streaming generate_content under the circuit breaker and concurrency limit; yields response chunks"""
+    if not gemini_breaker.allow():
+        raise CircuitOpenError('Gemini circuit is open')
+    with gemini_limiter.slot():
+        started = time.monotonic()
+        error = None
+        abandoned = False
+        usage = None
+        try:
+            for chunk in model.generate_content(prompt, stream=True, request_options={'timeout': GEMINI_LATENCY_BUDGET}):
+                # The final chunk carries the usage for the whole response
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                yield chunk
+        except GeneratorExit:
+            # Client disconnected mid-stream: says nothing about Gemini either way
+            abandoned = True
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Always report, so a half-open probe never stays claimed
+            latency = time.monotonic() - started
+            if abandoned:
+                gemini_breaker.release()
+            else:
+                gemini_limiter.record(latency, error)
+                gemini_breaker.record(latency, failed=error is not None)
+            if usage is not None:
+                token_usage.record(usage, 1, latency)
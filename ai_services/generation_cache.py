@@ -0,0 +1,110 @@
+"""
+In-process cache for AI-generated outreach emails
+
+Identical inputs (business, location, sender profile, model) produce the same
+prompt, so a campaign re-run or a preview followed by a send can reuse the
+earlier Gemini result instead of paying for another call. Entries expire after
+a TTL and the least recently used ones are evicted past a size limit. Each hit
+adds the latency and tokens of the original generation to the saved totals.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return ' '.join(value.split()).lower()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if value is None:
+        return ''
+    return value
+
+
+def make_key(model_name, **inputs):
+    """Stable hash of the normalized prompt inputs and the model name"""
+    payload = json.dumps({'model': model_name, **_normalize(inputs)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CachedGeneration:
+    """Generated email plus what it cost to produce"""
+
+    __slots__ = ('result', 'expires_at', 'latency', 'tokens')
+
+    def __init__(self, result, expires_at, latency, tokens):
+        self.result = result
+        self.expires_at = expires_at
+        self.latency = latency
+        self.tokens = tokens
+
+
+class GenerationCache:
+    """Thread-safe TTL + LRU cache with hit/miss accounting"""
+
+    def __init__(self, maxsize=None, ttl=None):
+        self.maxsize = maxsize or int(os.getenv('AI_GENERATION_CACHE_SIZE', '1000'))
+        # Seconds a generated email stays reusable (default 1 day)
+        self.ttl = ttl or int(os.getenv('AI_GENERATION_CACHE_TTL', '86400'))
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+
+    def get(self, key):
+        """Return a copy of the cached result, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry.latency
+            self.saved_tokens += entry.tokens
+
+        logger.debug(f"AI generation cache hit, saved {entry.latency:.2f}s and {entry.tokens} tokens")
+        return dict(entry.result)
+
+    def put(self, key, result, latency=0.0, tokens=0):
+        entry = CachedGeneration(dict(result), time.monotonic() + self.ttl, latency, tokens or 0)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'saved_seconds': round(self.saved_seconds, 3),
+                'saved_tokens': self.saved_tokens,
+            }
+
+
+generation_cache = GenerationCache()
@@ -0,0 +1,98 @@
+"""
+Country and language resolution for business locations
+
+A compact gazetteer (data/countries.tsv: ISO code, default language, country
+names, aliases and major cities) is loaded on first use into one dict from
+normalized name to a shared (code, language) entry. A location such as
+"Reggio Emilia, Italia" is normalized (case, accents, punctuation) and matched
+by whole names and word n-grams, so "uk" only matches the token "uk" and never
+the inside of another name. The comma-separated parts are tried from last to
+first, so the country decides when both a city and a country are given.
+ISO codes are only accepted through country_code: in free text "Boston, MA"
+is a US state, not Morocco.
+"""
+import os
+import re
+import sys
+import threading
+import unicodedata
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), 'data', 'countries.tsv')
+DEFAULT_LANGUAGE = 'English'
+
+_NON_WORD = re.compile(r'[^0-9a-z؀-ۿ]+')
+
+
+def normalize(text):
+    """Lowercase ASCII-folded words separated by single spaces"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return _NON_WORD.sub(' ', text).strip()
+
+
+class LanguageResolver:
+    """Maps free-text locations or ISO country codes to a country and its default language"""
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.path = path
+        self._names = None
+        self._codes = None
+        self._max_words = 1
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._names is not None:
+                return
+            names, codes, max_words = {}, {}, 1
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip() or line.startswith('#'):
+                        continue
+                    code, language, aliases = line.rstrip('\n').split('\t')
+                    entry = (code, sys.intern(language))
+                    codes[code.lower()] = entry
+                    for alias in aliases.split('|'):
+                        key = normalize(alias)
+                        names[key] = entry
+                        max_words = max(max_words, key.count(' ') + 1)
+            self._codes, self._max_words = codes, max_words
+            self._names = names  # set last: other threads check it without the lock
+
+    def lookup(self, location='', country_code=None):
+        """(code, language) for a location string / ISO country code, or None if unknown"""
+        if self._names is None:
+            self._load()
+
+        if country_code:
+            entry = self._codes.get(country_code.strip().lower())
+            if entry:
+                return entry
+
+        for part in reversed((location or '').split(',')):
+            part = normalize(part)
+            if not part:
+                continue
+            entry = self._names.get(part)
+            if entry:
+                return entry
+            words = part.split(' ')
+            # Longest n-grams first so "new york" wins over "york"
+            for size in range(min(self._max_words, len(words)), 0, -1):
+                for start in range(len(words) - size + 1):
+                    entry = self._names.get(' '.join(words[start:start + size]))
+                    if entry:
+                        return entry
+        return None
+
+    def country_code(self, location='', country_code=None):
+        entry = self.lookup(location, country_code)
+        return entry[0] if entry else None
+
+    def language(self, location='', country_code=None):
+        """Default language for the location (English when unknown)"""
+        entry = self.lookup(location, country_code)
+        return entry[1] if entry else DEFAULT_LANGUAGE
+
+
+language_resolver = LanguageResolver()
@@ -0,0 +1,50 @@
+# Management commands
+import time
+from django.core.management.base import BaseCommand, CommandError
+from ai_services.gemini import genai, GeminiModelRegistry
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark the per-generation Gemini setup cost: configure + new model vs the shared registry (no API calls)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--model', default='models/gemini-2.0-flash')
+
+    def handle(self, *args, **options):
+        if not genai:
+            raise CommandError('google-generativeai not installed')
+
+        from google.generativeai import client as genai_client
+
+        iterations = options['iterations']
+        model_name = options['model']
+        # Client construction does not contact the API, so any key works here
+        api_key = 'benchmark-key'
+
+        def per_call_setup():
+            # What generate_intro_email did before every email (the client is built on first generate_content)
+            genai.configure(api_key=api_key)
+            genai.GenerativeModel(model_name)
+            genai_client.get_default_generative_client()
+
+        registry = GeminiModelRegistry()
+
+        def registry_setup():
+            registry.get_model(api_key, model_name)
+
+        old = self._time(per_call_setup, iterations)
+        registry.clear()
+        new = self._time(registry_setup, iterations)
+
+        self.stdout.write(f'configure + GenerativeModel per call: {old * 1000:.3f} ms/call')
+        self.stdout.write(f'shared model registry:              {new * 1000:.3f} ms/call')
+        self.stdout.write(
+            self.style.SUCCESS(f'Saved {(old - new) * 1000:.3f} ms per generation ({old / max(new, 1e-9):.0f}x)')
+        )
+
+    def _time(self, fn, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return (time.perf_counter() - start) / iterations
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='airequest',
+            name='request_type',
+            field=models.CharField(choices=[('email_generation', 'Email Generation'), ('bulk_email', 'Bulk Email Template'), ('business_search', 'Business Search'), ('gemini_test', 'Gemini Test'), ('batch_email_generation', 'Batch Email Generation')], help_text='Type of AI request made', max_length=50),
+        ),
+    ]
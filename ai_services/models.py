@@ -10,6 +10,7 @@ class AIRequest(models.Model):
         ('bulk_email', 'Bulk Email Template'),
         ('business_search', 'Business Search'),
         ('gemini_test', 'Gemini Test'),
+        ('batch_email_generation', 'Batch Email Generation'),
     ]
     
     STATUS_CHOICES = [
@@ -0,0 +1,59 @@
+"""
+Prompts for outreach email generation
+
+The instructions are the same for every email, so they live in one static
+system instruction that is sent (or context-cached) once per model instead of
+being re-sent in front of every request. Each call only carries a compact
+payload: the sender block and one line per business.
+"""
+
+OUTREACH_SYSTEM_INSTRUCTION = """\
+You write professional outreach emails from a developer to local businesses.
+
+For each business in the request:
+1. Research the business online to understand it and try to find the real name of its owner or manager.
+2. Identify the common digital needs and pain points of businesses in its category.
+3. Suggest the digital solutions that would be most valuable for that type of business.
+4. Personalize the email to what businesses of that category typically need.
+
+Requirements for every email:
+- Write the subject and body entirely in the Language given for the business, with correct business etiquette for that language
+- Write FROM the sender and use the sender's name exactly as given
+- If you find a real contact name, use it in the greeting; otherwise use a simple polite greeting such as 'Gentile Sig.ra/Sig.' or its equivalent in that language
+- NEVER use placeholder text like 'Ricerca il nome di un responsabile se disponibile online'
+- Be specific about how the developer can help the business grow and mention services relevant to its industry
+- Include ONLY the developer contact information listed in the request
+- Do NOT include placeholder text like [Your Phone Number], [Your Website], or [Link to your website/portfolio]
+- End with a professional signature using only the available contact information
+
+Output:
+- For a single BUSINESS, return only a valid JSON object with keys 'subject' and 'body'
+- For a numbered list of BUSINESSES, return only a valid JSON array with one object per business and keys 'index' (the business number), 'subject' and 'body'
+"""
+
+
+def sender_block(sender, developer_services):
+    """Who the emails are from (same for every business of a request or campaign)"""
+    return f"SENDER: {sender.name}\nDeveloper offers: {developer_services}\n{sender.contact_context}"
+
+
+def business_line(business_name, business_category, business_city, business_country, language):
+    return (
+        f"Name: {business_name} | Category: {business_category}"
+        f" | Location: {business_city or 'Unknown'}, {business_country or 'Unknown'} | Language: {language}"
+    )
+
+
+def intro_payload(sender, developer_services, business_name, business_category, business_city,
+                  business_country, language):
+    """Per-call prompt for one email"""
+    return (
+        f"{sender_block(sender, developer_services)}\n"
+        f"BUSINESS: {business_line(business_name, business_category, business_city, business_country, language)}\n"
+    )
+
+
+def batch_payload(sender, developer_services, lines):
+    """Per-call prompt for several emails; lines are business_line() strings"""
+    numbered = "\n".join(f"{number}. {line}" for number, line in enumerate(lines, 1))
+    return f"{sender_block(sender, developer_services)}\nBUSINESSES:\n{numbered}\n"
@@ -0,0 +1,86 @@
+"""
+Precomputed sender details for email generation
+
+The sender's resolved name, the contact section of the Gemini prompt and the
+signature of the localized template emails depend only on the user, not on
+the business being written to. They are built once per campaign or request
+(one profile lookup) and the same read-only SenderContext is passed to every
+generation, including ones running in worker threads.
+"""
+import json
+import hashlib
+from types import MappingProxyType
+
+# Closing line of the localized template emails, by target language
+SIGN_OFFS = {
+    'Italian': 'Cordiali saluti,',
+    'French': 'Cordialement,',
+    'Spanish': 'Atentamente,',
+    'Arabic': 'مع أطيب التحيات،',
+    'German': 'Mit freundlichen Grüßen,',
+    'Portuguese': 'Com os melhores cumprimentos,',
+    'Dutch': 'Met vriendelijke groet,',
+    'English': 'Best regards,',
+}
+
+_CONTACT_HEADER = "DEVELOPER CONTACT INFORMATION (ONLY include what is available):\n"
+_CONTACT_FIELDS = (
+    ('phone', 'Phone'),
+    ('website_url', 'Website'),
+    ('github_url', 'GitHub'),
+    ('linkedin_url', 'LinkedIn'),
+    ('company', 'Company'),
+    ('job_title', 'Title'),
+)
+_SIGNATURE_FIELDS = ('phone', 'website_url', 'github_url', 'company')
+
+
+class SenderContext:
+    """Immutable sender details shared by every email generated for one user"""
+
+    __slots__ = ('info', 'name', 'contact_context', 'signature', 'sign_offs', 'fingerprint')
+
+    def __init__(self, user_info, developer_name='Developer'):
+        info = MappingProxyType(dict(user_info))
+        name = info['full_name'] if info['full_name'] != 'Developer' else developer_name
+
+        contact_context = _CONTACT_HEADER + ''.join(
+            f"- {label}: {info[field]}\n" for field, label in _CONTACT_FIELDS if info.get(field)
+        )
+        if contact_context == _CONTACT_HEADER:
+            contact_context += "- Only name is available\n"
+
+        signature = "\n".join([name] + [info[field] for field in _SIGNATURE_FIELDS if info.get(field)])
+        sign_offs = MappingProxyType({
+            language: f"{closing}\n{signature}" for language, closing in SIGN_OFFS.items()
+        })
+        # Stands in for the whole profile in generation cache keys
+        fingerprint = hashlib.sha256(
+            json.dumps({'name': name, **info}, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+
+        for slot, value in (
+            ('info', info), ('name', name), ('contact_context', contact_context),
+            ('signature', signature), ('sign_offs', sign_offs), ('fingerprint', fingerprint),
+        ):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SenderContext is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('SenderContext is immutable')
+
+    @classmethod
+    def for_user(cls, user, developer_name='Developer'):
+        """Build the context for user (anonymous users fall back to developer_name)"""
+        from .email_generator import EmailGenerator
+
+        return cls(EmailGenerator.get_user_info(user), developer_name)
+
+    def sign_off(self, language):
+        """Closing line plus signature for a template email in language"""
+        return self.sign_offs.get(language, self.sign_offs['English'])
+
+    def __repr__(self):
+        return f"SenderContext(name={self.name!r})"
@@ -0,0 +1,171 @@
+"""
+Incremental extraction of the email JSON from a streamed Gemini response
+
+Gemini streams the reply in arbitrary text chunks, for example
+'```json\n{"subj' + 'ect": "Hello' + ' there", "body": "...'. The parser
+consumes those chunks and reports the characters of the subject/body string
+values as soon as they arrive, so the UI can render them while the model is
+still writing.
+"""
+import json
+
+# Parser states
+_SEEK_OBJECT = 0
+_EXPECT_KEY = 1
+_IN_KEY = 2
+_EXPECT_COLON = 3
+_EXPECT_VALUE = 4
+_IN_STRING = 5
+_IN_OTHER = 6
+_AFTER_VALUE = 7
+_DONE = 8
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class IncrementalEmailParser:
+    """Streaming parser for the top-level JSON object of a generated email"""
+
+    def __init__(self, fields=('subject', 'body')):
+        self.fields = fields
+        self.values = {}
+        self._state = _SEEK_OBJECT
+        self._key = []
+        self._current = None  # key whose string value is being read
+        self._escape = None   # None, '' after a backslash, or the hex digits of \uXXXX
+        self._high_surrogate = None
+        self._depth = 0       # nesting inside a non-string value
+        self._in_nested_string = False
+
+    @property
+    def done(self):
+        return self._state == _DONE
+
+    def feed(self, chunk):
+        """Consume a chunk; returns a list of (field, text) deltas for the tracked fields"""
+        deltas = []
+        text = []
+
+        for ch in chunk:
+            state = self._state
+            if state == _IN_STRING:
+                if self._escape is not None:
+                    ch = self._unescape(ch)
+                    if ch is None:
+                        continue
+                elif ch == '\\':
+                    self._escape = ''
+                    continue
+                elif ch == '"':
+                    self._end_string(text, deltas)
+                    continue
+                text.append(ch)
+            elif state == _SEEK_OBJECT:
+                if ch == '{':
+                    self._state = _EXPECT_KEY
+            elif state == _EXPECT_KEY:
+                if ch == '"':
+                    self._key = []
+                    self._state = _IN_KEY
+                elif ch == '}':
+                    self._state = _DONE
+            elif state == _IN_KEY:
+                if ch == '"' and not (self._key and self._key[-1] == '\\'):
+                    self._state = _EXPECT_COLON
+                else:
+                    self._key.append(ch)
+            elif state == _EXPECT_COLON:
+                if ch == ':':
+                    self._state = _EXPECT_VALUE
+            elif state == _EXPECT_VALUE:
+                if ch == '"':
+                    self._current = ''.join(self._key)
+                    self.values[self._current] = ''
+                    self._state = _IN_STRING
+                elif not ch.isspace():
+                    self._depth = 1 if ch in '{[' else 0
+                    self._state = _AFTER_VALUE if self._depth == 0 and ch not in '-0123456789tfn' else _IN_OTHER
+            elif state == _IN_OTHER:
+                self._skip_other(ch)
+            elif state == _AFTER_VALUE:
+                if ch == ',':
+                    self._state = _EXPECT_KEY
+                elif ch == '}':
+                    self._state = _DONE
+            else:
+                break
+
+        if text and self._current is not None:
+            self._emit(''.join(text), deltas)
+        return deltas
+
+    def result(self):
+        """All string values parsed so far"""
+        return dict(self.values)
+
+    def _unescape(self, ch):
+        if self._escape == '':
+            if ch == 'u':
+                self._escape = 'u'
+                return None
+            self._escape = None
+            return _ESCAPES.get(ch, ch)
+        # Collecting \uXXXX
+        self._escape += ch
+        if len(self._escape) < 5:
+            return None
+        code, self._escape = self._escape[1:], None
+        try:
+            value = int(code, 16)
+        except ValueError:
+            return ''
+        # Characters outside the BMP arrive as a \uD8xx\uDCxx surrogate pair
+        if 0xD800 <= value < 0xDC00:
+            self._high_surrogate = value
+            return None
+        if 0xDC00 <= value < 0xE000 and self._high_surrogate is not None:
+            value = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (value - 0xDC00)
+        self._high_surrogate = None
+        return chr(value)
+
+    def _end_string(self, text, deltas):
+        if text:
+            self._emit(''.join(text), deltas)
+            text.clear()
+        self._current = None
+        self._state = _AFTER_VALUE
+
+    def _emit(self, piece, deltas):
+        self.values[self._current] += piece
+        if self._current in self.fields:
+            deltas.append((self._current, piece))
+
+    def _skip_other(self, ch):
+        # Numbers/literals end at a delimiter; objects/arrays end at their matching bracket
+        if self._depth == 0:
+            if ch == ',':
+                self._state = _EXPECT_KEY
+            elif ch == '}':
+                self._state = _DONE
+            return
+        if self._in_nested_string:
+            if self._escape == '':
+                self._escape = None
+            elif ch == '\\':
+                self._escape = ''
+            elif ch == '"':
+                self._in_nested_string = False
+            return
+        if ch == '"':
+            self._in_nested_string = True
+        elif ch in '{[':
+            self._depth += 1
+        elif ch in '}]':
+            self._depth -= 1
+            if self._depth == 0:
+                self._state = _AFTER_VALUE
+
+
+def sse_event(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,286 @@
+import json
+import time
+from unittest import mock
+from django.test import SimpleTestCase
+from . import gemini
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from .concurrency import AdaptiveLimiter
+from .language import LanguageResolver
+from .streaming import IncrementalEmailParser, sse_event
+
+
+def feed_chunks(chunks, **kwargs):
+    parser = IncrementalEmailParser(**kwargs)
+    deltas = []
+    for chunk in chunks:
+        deltas.extend(parser.feed(chunk))
+    return parser, deltas
+
+
+def join_deltas(deltas, field):
+    return ''.join(text for name, text in deltas if name == field)
+
+
+class IncrementalEmailParserTests(SimpleTestCase):
+    reply = '```json\n' + json.dumps({
+        'subject': 'Café "Sol" \U0001F600',
+        'score': -1.5,
+        'tags': ['a', {'b': '}]'}],
+        'body': 'Line one\nLine two\t\\ end',
+        'ok': True,
+    }) + '\n```'
+
+    def test_any_split_point_matches_json(self):
+        expected = json.loads(self.reply[self.reply.index('{'):self.reply.rindex('}') + 1])
+        for split in range(len(self.reply) + 1):
+            with self.subTest(split=split):
+                parser, deltas = feed_chunks([self.reply[:split], self.reply[split:]])
+                self.assertTrue(parser.done)
+                self.assertEqual(join_deltas(deltas, 'subject'), expected['subject'])
+                self.assertEqual(join_deltas(deltas, 'body'), expected['body'])
+
+    def test_one_character_at_a_time(self):
+        parser, deltas = feed_chunks(list(self.reply))
+        self.assertEqual(parser.result(), {'subject': 'Café "Sol" \U0001F600', 'body': 'Line one\nLine two\t\\ end'})
+        self.assertEqual({name for name, _ in deltas}, {'subject', 'body'})
+
+    def test_only_tracked_fields_emit_deltas(self):
+        parser, deltas = feed_chunks(['{"note": "skip", "subject": "Hi"}'], fields=('subject',))
+        self.assertEqual(deltas, [('subject', 'Hi')])
+        self.assertEqual(parser.result(), {'note': 'skip', 'subject': 'Hi'})
+
+    def test_text_arrives_before_the_string_closes(self):
+        parser = IncrementalEmailParser()
+        self.assertEqual(parser.feed('{"subject": "Hel'), [('subject', 'Hel')])
+        self.assertEqual(parser.feed('lo", "bo'), [('subject', 'lo')])
+        self.assertFalse(parser.done)
+        self.assertEqual(parser.feed('dy": "x"}'), [('body', 'x')])
+        self.assertTrue(parser.done)
+
+    def test_ignores_text_after_the_object(self):
+        parser, deltas = feed_chunks(['{"subject": "a"} {"subject": "b"}'])
+        self.assertEqual(join_deltas(deltas, 'subject'), 'a')
+
+
+class SseEventTests(SimpleTestCase):
+    def test_format(self):
+        self.assertEqual(sse_event('delta', {'field': 'body', 'text': 'hé'}),
+                         'event: delta\ndata: {"field": "body", "text": "hé"}\n\n')
+
+
+class LanguageResolverTests(SimpleTestCase):
+    resolver = LanguageResolver()
+
+    def test_us_state_abbreviations_are_not_country_codes(self):
+        for location in ('Boston, MA', 'Philadelphia, PA', 'Denver, CO', 'Wilmington, DE'):
+            with self.subTest(location=location):
+                self.assertEqual(self.resolver.language(location), 'English')
+
+    def test_country_names_aliases_and_cities(self):
+        cases = {
+            'Reggio Emilia, Italia': ('IT', 'Italian'),
+            'Casablanca, Morocco': ('MA', 'Arabic'),
+            'Bogotá, Colombia': ('CO', 'Spanish'),
+            'Lisboa': ('PT', 'Portuguese'),
+            'Amsterdam, The Netherlands': ('NL', 'Dutch'),
+            'New York, USA': ('US', 'English'),
+        }
+        for location, expected in cases.items():
+            with self.subTest(location=location):
+                self.assertEqual(self.resolver.lookup(location), expected)
+
+    def test_explicit_country_code_wins(self):
+        self.assertEqual(self.resolver.lookup('Boston, MA', 'US'), ('US', 'English'))
+        self.assertEqual(self.resolver.lookup('', ' de '), ('DE', 'German'))
+        self.assertEqual(self.resolver.lookup('Paris', 'ma'), ('MA', 'Arabic'))
+
+    def test_unknown(self):
+        self.assertIsNone(self.resolver.lookup('Springfield'))
+        self.assertIsNone(self.resolver.lookup('', 'XX'))
+        self.assertEqual(self.resolver.language(''), 'English')
+
+
+def make_breaker(**kwargs):
+    options = dict(failure_rate=0.5, slow_call_seconds=10, slow_call_rate=0.5, window=4, min_calls=4,
+                   open_seconds=30, half_open_probes=1)
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def due_for_probe(breaker):
+    breaker.opened_until = time.monotonic() - 1
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_on_failure_rate(self):
+        breaker = make_breaker()
+        for failed in (False, True, False):
+            self.assertTrue(breaker.allow())
+            breaker.record(1.0, failed=failed)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record(1.0, failed=True)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertTrue(breaker.is_open())
+
+    def test_opens_on_slow_call_rate(self):
+        breaker = make_breaker()
+        for latency in (1.0, 1.0, 11.0, 12.0):
+            breaker.record(latency)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_good_probe_closes(self):
+        breaker = make_breaker()
+        breaker._open()
+        due_for_probe(breaker)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        # Only one probe at a time
+        self.assertFalse(breaker.allow())
+        breaker.record(1.0)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.stats()['recent_calls'], 0)
+
+    def test_bad_or_slow_probe_reopens(self):
+        for kwargs in ({'failed': True}, {'latency': 20.0}):
+            with self.subTest(**kwargs):
+                breaker = make_breaker()
+                breaker._open()
+                due_for_probe(breaker)
+                self.assertTrue(breaker.allow())
+                breaker.record(**{'latency': 1.0, **kwargs})
+                self.assertEqual(breaker.state, OPEN)
+                self.assertFalse(breaker.allow())
+
+    def test_release_frees_the_probe_without_a_verdict(self):
+        breaker = make_breaker()
+        breaker._open()
+        due_for_probe(breaker)
+        self.assertTrue(breaker.allow())
+        breaker.release()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_release_is_not_counted_when_closed(self):
+        breaker = make_breaker()
+        self.assertTrue(breaker.allow())
+        breaker.release()
+        self.assertEqual(breaker.stats()['recent_calls'], 0)
+
+
+class FakeModel:
+    """generate_content raising the queued errors first, then returning a response"""
+
+    def __init__(self, errors=(), chunks=()):
+        self.errors = list(errors)
+        self.chunks = list(chunks)
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        if stream:
+            return iter(self.chunks)
+        if self.errors:
+            raise self.errors.pop(0)
+        return mock.Mock(usage_metadata=None)
+
+
+class GeminiBreakerIntegrationTests(SimpleTestCase):
+    def setUp(self):
+        self.breaker = make_breaker()
+        self.breaker._open()
+        due_for_probe(self.breaker)
+        patches = [
+            mock.patch.object(gemini, 'gemini_breaker', self.breaker),
+            mock.patch.object(gemini, 'gemini_limiter', AdaptiveLimiter(initial=4, max_limit=8)),
+            mock.patch.object(gemini, 'token_usage', mock.Mock()),
+            mock.patch.object(gemini, 'GEMINI_THROTTLE_RETRIES', 2),
+            mock.patch.object(gemini.time, 'sleep', lambda seconds: None),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_throttled_probe_does_not_close_the_breaker(self):
+        model = FakeModel(errors=[Exception('429 RESOURCE_EXHAUSTED')] * 3)
+        with self.assertRaises(Exception):
+            gemini.generate_content(model, 'prompt')
+        # Retried as probes, then counted as a failure once retries ran out
+        self.assertEqual(model.calls, 3)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_probe_retried_after_a_throttle_closes_on_success(self):
+        model = FakeModel(errors=[Exception('429 RESOURCE_EXHAUSTED')])
+        gemini.generate_content(model, 'prompt')
+        self.assertEqual(model.calls, 2)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_open_breaker_skips_the_call(self):
+        self.breaker._open()
+        model = FakeModel()
+        with self.assertRaises(CircuitOpenError):
+            gemini.generate_content(model, 'prompt')
+        self.assertEqual(model.calls, 0)
+
+    def test_abandoned_stream_is_not_a_success(self):
+        model = FakeModel(chunks=[mock.Mock(usage_metadata=None), mock.Mock(usage_metadata=None)])
+        stream = gemini.stream_content(model, 'prompt')
+        next(stream)
+        stream.close()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # The probe slot was given back
+        self.assertTrue(self.breaker.allow())
+
+    def test_finished_stream_closes_the_breaker(self):
+        model = FakeModel(chunks=[mock.Mock(usage_metadata=None)])
+        self.assertEqual(len(list(gemini.stream_content(model, 'prompt'))), 1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+class AdaptiveLimiterTests(SimpleTestCase):
+    def make_limiter(self, **kwargs):
+        limiter = AdaptiveLimiter(**{'initial': 8, 'max_limit': 32, 'latency_tolerance': 2.0, **kwargs})
+        limiter._last_decrease = float('-inf')
+        return limiter
+
+    def test_throttle_halves_once_per_round_trip(self):
+        limiter = self.make_limiter()
+        limiter.record(1.0, Exception('429 RESOURCE_EXHAUSTED'))
+        self.assertEqual(limiter.limit, 4)
+        # In-flight requests report the same congestion: no second cut right away
+        limiter.record(1.0, Exception('429 RESOURCE_EXHAUSTED'))
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.stats()['throttle_rate'], 1.0)
+
+    def test_never_below_min_limit(self):
+        limiter = self.make_limiter(initial=1)
+        limiter.record(1.0, Exception('429'))
+        self.assertEqual(limiter.limit, 1)
+
+    def test_latency_above_baseline_decreases(self):
+        limiter = self.make_limiter()
+        limiter.record(1.0)
+        self.assertEqual(limiter.baseline_latency, 1.0)
+        limiter._last_decrease = float('-inf')
+        limiter.record(2.5)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_success_increases_only_while_the_limit_is_used(self):
+        limiter = self.make_limiter(initial=4)
+        limiter.record(1.0)
+        self.assertEqual(limiter.limit, 4)
+        limiter.in_flight = 3
+        limiter.record(1.0)
+        self.assertAlmostEqual(limiter.limit, 4.25)
+
+    def test_increase_stops_at_max_limit(self):
+        limiter = self.make_limiter(initial=4, max_limit=4)
+        limiter.in_flight = 4
+        limiter.record(1.0)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_other_errors_do_not_change_the_limit(self):
+        limiter = self.make_limiter()
+        limiter.record(1.0, ValueError('bad response'))
+        self.assertEqual(limiter.limit, 8)
+        self.assertEqual(limiter.stats()['error_rate'], 1.0)
@@ -0,0 +1,63 @@
+"""
+Token accounting for Gemini calls
+
+Every completed call reports the usage metadata of its response: prompt
+(input) tokens, candidate (output) tokens and how many of the input tokens were
+served from a context cache. Totals are kept per process and normalized per
+generated email, so prompt changes and batching show up as a per-email cost.
+"""
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenUsage:
+    """Thread-safe running totals of Gemini token usage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.emails = 0
+            self.input_tokens = 0
+            self.output_tokens = 0
+            self.cached_tokens = 0
+            self.seconds = 0.0
+
+    def record(self, usage, items=1, latency=None):
+        """Add one call's usage_metadata (items: emails the call generated)"""
+        input_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
+        logger.debug(
+            f"Gemini call: {input_tokens} input ({cached_tokens} cached) / {output_tokens} output tokens"
+            f" for {items} email(s)"
+        )
+        with self._lock:
+            self.calls += 1
+            self.emails += items
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.cached_tokens += cached_tokens
+            self.seconds += latency or 0.0
+
+    def stats(self):
+        with self._lock:
+            emails = self.emails or 1
+            return {
+                'calls': self.calls,
+                'emails': self.emails,
+                'input_tokens': self.input_tokens,
+                'output_tokens': self.output_tokens,
+                'cached_tokens': self.cached_tokens,
+                'input_tokens_per_email': round(self.input_tokens / emails, 1),
+                'output_tokens_per_email': round(self.output_tokens / emails, 1),
+                'seconds_per_email': round(self.seconds / emails, 3),
+            }
+
+
+token_usage = TokenUsage()
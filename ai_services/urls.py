@@ -1,10 +1,19 @@
 from django.urls import path
-from .views import GenerateEmailView, GenerateBulkEmailView, GenerateBusinessesView, TestGeminiView
+from .views import (
+    GenerateEmailView, GenerateEmailStreamView, GenerateEmailsBatchView, GenerateEmailsBatchStatusView,
+    GenerateBulkEmailView, GenerateBusinessesView, TestGeminiView,
+    GenerationCacheStatsView, GeminiStatusView
+)
 
 
 urlpatterns = [
     path('generate-email/', GenerateEmailView.as_view(), name='generate_email'),
+    path('generate-email/stream/', GenerateEmailStreamView.as_view(), name='generate_email_stream'),
+    path('generate-emails/batch/', GenerateEmailsBatchView.as_view(), name='generate_emails_batch'),
+    path('generate-emails/batch/<int:job_id>/', GenerateEmailsBatchStatusView.as_view(), name='generate_emails_batch_status'),
     path('generate-bulk-email/', GenerateBulkEmailView.as_view(), name='generate_bulk_email'),
     path('generate-businesses/', GenerateBusinessesView.as_view(), name='generate_businesses'),
     path('test-gemini/', TestGeminiView.as_view(), name='test_gemini'),
+    path('gemini-status/', GeminiStatusView.as_view(), name='gemini_status'),
+    path('generation-cache/', GenerationCacheStatsView.as_view(), name='generation_cache_stats'),
 ]
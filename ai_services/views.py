@@ -1,12 +1,20 @@
+import json
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .email_generator import EmailGenerator
+from .gemini import genai, model_registry
+from .generation_cache import generation_cache
+from .concurrency import gemini_limiter
+from .circuit_breaker import gemini_breaker
+from .token_usage import token_usage
+from .streaming import sse_event
+from .batch import generate_emails, run_batch_job
+from .executor import submit_job
+from .models import AIRequest
 import os
-try:
-    import google.generativeai as genai  # type: ignore
-except Exception:
-    genai = None
 
 
 class GenerateEmailView(APIView):
@@ -15,6 +23,12 @@ class GenerateEmailView(APIView):
     
     def post(self, request):
         """Generate email content based on business and developer info."""
+        # Generate email content
+        email_content = EmailGenerator.generate_intro_email(**self.get_generation_params(request))
+        
+        return Response(email_content, status=status.HTTP_200_OK)
+
+    def get_generation_params(self, request):
         data = request.data
         
         # Extract parameters
@@ -22,21 +36,120 @@ class GenerateEmailView(APIView):
         business_category = data.get('business_category', '')
         business_country = data.get('business_country', '')
         business_city = data.get('business_city', '')
+        # ISO code from the geocoder, when the client has one (overrides the country name for language detection)
+        business_country_code = data.get('business_country_code') or None
         developer_name = data.get('developer_name', request.user.username)
         developer_services = data.get('developer_services', 'Web development and digital solutions')
+        # fresh=true skips the generation cache
+        fresh = str(data.get('fresh', request.query_params.get('fresh', ''))).lower() in ('1', 'true', 'yes')
         
-        # Generate email content
-        email_content = EmailGenerator.generate_intro_email(
+        return dict(
             business_name=business_name,
             business_category=business_category,
             developer_name=developer_name,
             developer_services=developer_services,
             user=request.user,
             business_country=business_country,
-            business_city=business_city
+            business_city=business_city,
+            business_country_code=business_country_code,
+            fresh=fresh
         )
-        
-        return Response(email_content, status=status.HTTP_200_OK)
+
+
+class GenerateEmailStreamView(GenerateEmailView):
+    """Stream generated email content as server-sent events (delta events, then a result event)."""
+
+    def post(self, request):
+        events = EmailGenerator.stream_intro_email(**self.get_generation_params(request))
+        response = StreamingHttpResponse(
+            (sse_event(event, data) for event, data in events),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Keep nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class GeminiStatusView(APIView):
+    """Current adaptive concurrency limit, recent Gemini error rate, circuit breaker state and token usage."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({
+            'concurrency': gemini_limiter.stats(),
+            'circuit': gemini_breaker.stats(),
+            'tokens': token_usage.stats(),
+        }, status=status.HTTP_200_OK)
+
+
+class GenerationCacheStatsView(APIView):
+    """Hit rate and the latency/tokens saved by the AI generation cache."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(generation_cache.stats(), status=status.HTTP_200_OK)
+
+
+class GenerateEmailsBatchView(APIView):
+    """Generate emails for a list of businesses: NDJSON as they complete, or a job id for large lists."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        data = request.data
+        businesses = data.get('businesses')
+        if not isinstance(businesses, list) or not businesses or not all(isinstance(b, dict) for b in businesses):
+            return Response({'detail': 'businesses must be a non-empty list of objects'}, status=400)
+
+        params = {
+            'developer_name': data.get('developer_name', request.user.username),
+            'developer_services': data.get('developer_services', 'Web development and digital solutions'),
+            'fresh': str(data.get('fresh', request.query_params.get('fresh', ''))).lower() in ('1', 'true', 'yes'),
+        }
+
+        if request.query_params.get('async') == '1' or len(businesses) > settings.AI_BATCH_STREAM_LIMIT:
+            job = AIRequest.objects.create(
+                user=request.user,
+                request_type='batch_email_generation',
+                request_data={'businesses': businesses, **params}
+            )
+            submit_job(run_batch_job, job.id)
+            return Response({
+                'job_id': job.id,
+                'status': 'pending',
+                'status_url': f'/api/ai/generate-emails/batch/{job.id}/'
+            }, status=status.HTTP_202_ACCEPTED)
+
+        lines = (
+            json.dumps({'index': index, **email}, ensure_ascii=False) + '\n'
+            for index, email in generate_emails(businesses, user=request.user, **params)
+        )
+        response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class GenerateEmailsBatchStatusView(APIView):
+    """Progress and results of a batch generation job."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = AIRequest.objects.filter(
+            pk=job_id, user=request.user, request_type='batch_email_generation'
+        ).values('id', 'status', 'response_data', 'created_at', 'updated_at').first()
+        if not job:
+            return Response({'detail': 'Job not found'}, status=404)
+
+        progress = job['response_data'] or {}
+        return Response({
+            'job_id': job['id'],
+            'status': job['status'],
+            'completed': progress.get('completed', 0),
+            'total': progress.get('total'),
+            'results': progress.get('results', []),
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at'],
+        }, status=status.HTTP_200_OK)
 
 
 class GenerateBulkEmailView(APIView):
@@ -69,6 +182,7 @@ class GenerateBusinessesView(APIView):
 
     def post(self, request):
         from businesses.google_places_service import GooglePlacesService
+        from emails.contacted import ContactedIndex, include_contacted
         import random
         
         params = request.data or {}
@@ -77,6 +191,20 @@ class GenerateBusinessesView(APIView):
         category = params.get('category', '')
         search = params.get('search', '')
         page = params.get('page', 0)  # Add page parameter for pagination
+        # Optional seed to make the ranking's random variety reproducible
+        seed = params.get('seed')
+        if seed is not None:
+            try:
+                if isinstance(seed, (bool, float)):
+                    raise ValueError(seed)
+                seed = int(seed)
+            except (TypeError, ValueError):
+                return Response({'detail': 'seed must be an integer'}, status=400)
+
+        # Leave out businesses the user already emailed (unless include_contacted is set)
+        contacted = None
+        if request.user.is_authenticated and not include_contacted(request):
+            contacted = ContactedIndex(request.user)
 
         # Use Google Places API for real business data
         places_service = GooglePlacesService()
@@ -87,20 +215,27 @@ class GenerateBusinessesView(APIView):
                 city=city,
                 country=country,
                 category=category,
-                search=search
+                search=search,
+                contacted_lookup=contacted and contacted.contacted_place_ids,
+                seed=seed
             ),
             lambda: places_service.search_businesses_with_pagination(
                 city=city,
                 country=country,
                 category=category,
                 search=search,
-                page=page
+                page=page,
+                contacted_lookup=contacted and contacted.contacted_place_ids,
+                seed=seed
             )
         ]
         
-        # Randomly select a search method
-        selected_method = random.choice(search_methods)
+        # Randomly select a search method (the same one for every request with this seed)
+        selected_method = random.Random(seed).choice(search_methods) if seed is not None else random.choice(search_methods)
         businesses = selected_method()
+        if businesses and contacted:
+            # Also match on the business email (addresses contacted outside a campaign have no place_id)
+            businesses, _ = contacted.exclude(businesses)
         
         if businesses:
             return Response(businesses, status=200)
@@ -129,7 +264,7 @@ class TestGeminiView(APIView):
         if not genai:
             return Response({'ok': False, 'error': 'google-generativeai not installed'}, status=500)
         try:
-            genai.configure(api_key=api_key)
+            model_registry.configure(api_key)
             # List available models
             available_models = []
             try:
@@ -139,7 +274,7 @@ class TestGeminiView(APIView):
             except:
                 pass
             
-            model = genai.GenerativeModel(model_name)
+            model = model_registry.get_model(api_key, model_name)
             resp = model.generate_content('ping')
             text = (getattr(resp, 'text', None) or '').strip()
             return Response({'ok': True, 'model': model_name, 'sample': text[:80], 'available_models': available_models[:10]}, status=200)
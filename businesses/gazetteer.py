@@ -0,0 +1,139 @@
+"""
+Offline gazetteer for business search locations
+
+Business searches start by turning "city, country" into coordinates. Known
+locations are answered from a local file of fixed-size binary records
+(normalized key, ISO country code, lat/lng, viewport) that is memory-mapped and
+indexed by key, so resolving them costs no network call. Locations the
+gazetteer does not know are geocoded with Google once and appended; other
+processes pick the new records up on their next miss. Seed it with
+`python manage.py build_gazetteer`.
+"""
+import os
+import mmap
+import struct
+import threading
+import logging
+from django.conf import settings
+from ai_services.language import language_resolver, normalize
+
+logger = logging.getLogger(__name__)
+
+# key (UTF-8, NUL-padded), ISO country code, lat, lng, viewport NE lat/lng, viewport SW lat/lng
+_RECORD = struct.Struct('<80s2s6d')
+
+
+class GeoLocation:
+    """Coordinates, viewport and country of a resolved search location"""
+
+    __slots__ = ('lat', 'lng', 'viewport', 'country_code')
+
+    def __init__(self, lat, lng, viewport=None, country_code=''):
+        self.lat = lat
+        self.lng = lng
+        # ((ne_lat, ne_lng), (sw_lat, sw_lng))
+        self.viewport = viewport or ((lat, lng), (lat, lng))
+        self.country_code = country_code
+
+    @classmethod
+    def from_geocode(cls, result):
+        """Build from one Google geocoding result"""
+        geometry = result['geometry']
+        location = geometry['location']
+        viewport = geometry.get('viewport')
+        if viewport:
+            viewport = (
+                (viewport['northeast']['lat'], viewport['northeast']['lng']),
+                (viewport['southwest']['lat'], viewport['southwest']['lng']),
+            )
+        country_code = next(
+            (c.get('short_name', '') for c in result.get('address_components', []) if 'country' in c.get('types', [])),
+            ''
+        )
+        return cls(location['lat'], location['lng'], viewport, country_code)
+
+
+class Gazetteer:
+    """Memory-mapped store of known search locations"""
+
+    def __init__(self, path=None):
+        self.path = path or settings.GAZETTEER_PATH
+        self._lock = threading.Lock()
+        self._index = {}  # key -> record number
+        self._mm = None
+        self._size = 0    # bytes of the file indexed so far
+
+    @staticmethod
+    def make_key(city, country):
+        # Country aliases share one key ("Roma, Italia", "Roma, Italy" and "Roma, IT" -> "roma|IT");
+        # the country field may hold an ISO code, so it is tried as one first
+        country_code = language_resolver.country_code(country, country_code=country) if country else None
+        return f"{normalize(city or '')}|{country_code or normalize(country or '')}"
+
+    def get(self, city, country):
+        """GeoLocation for a known location, or None"""
+        key = self.make_key(city, country)
+        number = self._index.get(key)
+        if number is None:
+            # Another process may have added it since we last looked
+            self._refresh()
+            number = self._index.get(key)
+            if number is None:
+                return None
+
+        _, code, lat, lng, ne_lat, ne_lng, sw_lat, sw_lng = _RECORD.unpack_from(self._mm, number * _RECORD.size)
+        return GeoLocation(lat, lng, ((ne_lat, ne_lng), (sw_lat, sw_lng)), code.rstrip(b'\0').decode('ascii'))
+
+    def add(self, city, country, location):
+        """Store a geocoded location (keys too long for a record are skipped)"""
+        key = self.make_key(city, country).encode('utf-8')
+        if len(key) > 80:
+            return
+        (ne_lat, ne_lng), (sw_lat, sw_lng) = location.viewport
+        record = _RECORD.pack(
+            key, (location.country_code or '').upper().encode('ascii', 'ignore')[:2],
+            location.lat, location.lng, ne_lat, ne_lng, sw_lat, sw_lng
+        )
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # One write in append mode, so concurrent writers never interleave inside a record
+            with open(self.path, 'ab') as f:
+                f.write(record)
+        self._refresh()
+
+    def __len__(self):
+        self._refresh()
+        return len(self._index)
+
+    def _refresh(self):
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return
+            size -= size % _RECORD.size  # ignore a record still being written
+            if size <= self._size:
+                return
+
+            with open(self.path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            # Swap the map in before indexing, so every indexed record is inside the current map
+            self._mm = mm
+            for number in range(self._size // _RECORD.size, size // _RECORD.size):
+                key = _RECORD.unpack_from(mm, number * _RECORD.size)[0].rstrip(b'\0').decode('utf-8')
+                self._index[key] = number  # later records win
+            self._size = size
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Process-wide gazetteer (created on first use)"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
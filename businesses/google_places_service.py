@@ -4,9 +4,11 @@ Fetches real business data from Google Places API
 """
 import os
 import random
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import googlemaps
 from django.conf import settings
+from .gazetteer import GeoLocation, get_gazetteer
+from .ranking import top_places
 
 
 class GooglePlacesService:
@@ -24,10 +26,12 @@ class GooglePlacesService:
         country: str = '', 
         category: str = '', 
         search: str = '',
-        radius: int = 5000
+        radius: int = 5000,
+        contacted_lookup: Optional[Callable[[List[str]], set]] = None,
+        seed: Optional[int] = None
     ) -> List[Dict]:
         """
-        Search for real businesses using Google Places API with randomization
+        Search for real businesses using Google Places API, best ranked first
         
         Args:
             city: City name
@@ -35,9 +39,11 @@ class GooglePlacesService:
             category: Business category/type
             search: Additional search keywords
             radius: Search radius in meters (default 5000m = 5km)
+            contacted_lookup: Returns the already contacted place_ids among the given ones (those are left out)
+            seed: Seed for the ranking's random variety (None = different each time)
             
         Returns:
-            List of business dictionaries (randomized each time)
+            List of business dictionaries
         """
         if not self.client:
             return []
@@ -46,14 +52,13 @@ class GooglePlacesService:
             # Build location query
             location_query = f"{city}, {country}" if city and country else city or country
             
-            # Get coordinates for the location
+            # Get coordinates for the location (local gazetteer first, Google geocoding for unknown places)
             if location_query:
-                geocode_result = self.client.geocode(location_query)
-                if not geocode_result:
+                geo = self._resolve_location(city, country, location_query)
+                if geo is None:
                     return []
                 
-                location = geocode_result[0]['geometry']['location']
-                lat, lng = location['lat'], location['lng']
+                lat, lng = geo.lat, geo.lng
             else:
                 return []
             
@@ -113,16 +118,15 @@ class GooglePlacesService:
                     seen_place_ids.add(place_id)
                     unique_results.append(result)
             
-            # Randomize the results to get different businesses each time
-            random.shuffle(unique_results)
+            unique_results = self._exclude_contacted(unique_results, contacted_lookup)
             
-            # Take up to 15 results (more variety)
-            selected_results = unique_results[:15]
+            # Rank by rating, reviews and distance (with some variety) and keep the best 15
+            selected_results = top_places(unique_results, 15, center=(lat, lng), radius=radius, seed=seed)
             
             # Format results
             businesses = []
             for idx, place in enumerate(selected_results):
-                business = self._format_place(place, idx + 1, city, country, category)
+                business = self._format_place(place, idx + 1, city, country, category, geo.country_code)
                 businesses.append(business)
             
             return businesses
@@ -131,6 +135,31 @@ class GooglePlacesService:
             print(f"Google Places API Error: {str(e)}")
             return []
     
+    def _resolve_location(self, city: str, country: str, location_query: str) -> Optional[GeoLocation]:
+        """Coordinates for the search location; only unknown locations are geocoded (and then remembered)"""
+        gazetteer = get_gazetteer()
+        geo = gazetteer.get(city, country)
+        if geo is not None:
+            return geo
+
+        geocode_result = self.client.geocode(location_query)
+        if not geocode_result:
+            return None
+
+        geo = GeoLocation.from_geocode(geocode_result[0])
+        try:
+            gazetteer.add(city, country, geo)
+        except OSError as e:
+            print(f"Could not store {location_query} in the gazetteer: {str(e)}")
+        return geo
+    
+    def _exclude_contacted(self, places: List[Dict], contacted_lookup) -> List[Dict]:
+        """Drop candidates already contacted (one lookup for all of them, before any Place Details call)"""
+        if not contacted_lookup or not places:
+            return places
+        contacted = contacted_lookup([place.get('place_id') for place in places])
+        return [place for place in places if place.get('place_id') not in contacted]
+    
     def _map_category_to_type(self, category: str) -> Optional[str]:
         """Map our categories to Google Places types"""
         category_mapping = {
@@ -149,7 +178,8 @@ class GooglePlacesService:
         }
         return category_mapping.get(category.lower())
     
-    def _format_place(self, place: Dict, idx: int, city: str, country: str, category: str) -> Dict:
+    def _format_place(self, place: Dict, idx: int, city: str, country: str, category: str,
+                      country_code: str = '') -> Dict:
         """Format Google Place data to our business format"""
         place_id = place.get('place_id', '')
         name = place.get('name', f'Business {idx}')
@@ -185,6 +215,7 @@ class GooglePlacesService:
             'website': website,
             'category': business_category,
             'country': country,
+            'country_code': country_code,  # ISO code from the gazetteer/geocoder (used for email language)
             'city': city,
             'address': address,
             'place_id': place_id,  # Extra: Google Place ID for reference
@@ -215,7 +246,9 @@ class GooglePlacesService:
         category: str = '', 
         search: str = '',
         radius: int = 5000,
-        page: int = 0
+        page: int = 0,
+        contacted_lookup: Optional[Callable[[List[str]], set]] = None,
+        seed: Optional[int] = None
     ) -> List[Dict]:
         """
         Search for businesses with pagination support for even more variety
@@ -227,6 +260,8 @@ class GooglePlacesService:
             search: Additional search keywords
             radius: Search radius in meters
             page: Page number (0-based) for pagination
+            contacted_lookup: Returns the already contacted place_ids among the given ones (those are left out)
+            seed: Seed for the ranking's random variety (None = different each time)
             
         Returns:
             List of business dictionaries
@@ -238,14 +273,13 @@ class GooglePlacesService:
             # Build location query
             location_query = f"{city}, {country}" if city and country else city or country
             
-            # Get coordinates for the location
+            # Get coordinates for the location (local gazetteer first, Google geocoding for unknown places)
             if location_query:
-                geocode_result = self.client.geocode(location_query)
-                if not geocode_result:
+                geo = self._resolve_location(city, country, location_query)
+                if geo is None:
                     return []
                 
-                location = geocode_result[0]['geometry']['location']
-                lat, lng = location['lat'], location['lng']
+                lat, lng = geo.lat, geo.lng
             else:
                 return []
             
@@ -280,18 +314,15 @@ class GooglePlacesService:
                 radius=radius
             )
             
-            results = places_result.get('results', [])
-            
-            # Randomize results
-            random.shuffle(results)
+            results = self._exclude_contacted(places_result.get('results', []), contacted_lookup)
             
-            # Take up to 12 results
-            selected_results = results[:12]
+            # Rank and take up to 12 results
+            selected_results = top_places(results, 12, center=(lat, lng), radius=radius, seed=seed)
             
             # Format results
             businesses = []
             for idx, place in enumerate(selected_results):
-                business = self._format_place(place, idx + 1, city, country, category)
+                business = self._format_place(place, idx + 1, city, country, category, geo.country_code)
                 businesses.append(business)
             
             return businesses
@@ -0,0 +1,55 @@
+# Management commands
+import os
+import googlemaps
+from django.core.management.base import BaseCommand, CommandError
+from businesses.gazetteer import GeoLocation, get_gazetteer
+from businesses.models import Business
+
+
+class Command(BaseCommand):
+    help = 'Geocode search locations once and store them in the local gazetteer (known locations are skipped)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('locations', nargs='*', help='"City, Country" entries')
+        parser.add_argument('--file', help='Text file with one "City, Country" per line')
+        parser.add_argument('--from-businesses', action='store_true',
+                            help='Add every city/country pair of the stored businesses')
+
+    def handle(self, *args, **options):
+        api_key = os.getenv('GOOGLE_PLACES_API_KEY', '')
+        if not api_key:
+            raise CommandError('GOOGLE_PLACES_API_KEY is not configured')
+
+        pairs = [self._split(location) for location in options['locations']]
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as f:
+                pairs += [self._split(line) for line in f if line.strip() and not line.startswith('#')]
+        if options['from_businesses']:
+            pairs += list(Business.objects.values_list('city', 'country').distinct())
+        if not pairs:
+            raise CommandError('No locations given')
+
+        client = googlemaps.Client(key=api_key)
+        gazetteer = get_gazetteer()
+        added = known = missing = 0
+        for city, country in pairs:
+            if gazetteer.get(city, country) is not None:
+                known += 1
+                continue
+            query = f"{city}, {country}" if city and country else city or country
+            result = client.geocode(query)
+            if not result:
+                missing += 1
+                self.stderr.write(f'Not found: {query}')
+                continue
+            gazetteer.add(city, country, GeoLocation.from_geocode(result[0]))
+            added += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Added {added}, already known {known}, not found {missing}; {len(gazetteer)} locations in {gazetteer.path}'
+        ))
+
+    def _split(self, location):
+        city, _, country = location.strip().rpartition(',')
+        # A single name without a comma is a city
+        return (city.strip(), country.strip()) if city else (country.strip(), '')
@@ -0,0 +1,82 @@
+"""
+Ranking of Google Places search candidates
+
+Candidates are scored on compact per-feature arrays (rating, review count,
+distance from the search centre) and the best k are picked with a heap, so only
+those k get the expensive Place Details call. Only fields present in Nearby /
+Text Search results can be used: the website, for example, comes from Place
+Details and is not known yet at this point.
+For variety, an exploration temperature adds Gumbel noise to the scores, which
+samples k candidates without replacement with probability growing with their
+score; a seed makes that sample reproducible (e.g. one seed per results page).
+"""
+import os
+import math
+import heapq
+import random
+from array import array
+
+# Weights of the score components (each in [0, 1])
+RANK_WEIGHT_QUALITY = float(os.getenv('PLACES_RANK_WEIGHT_QUALITY', '0.45'))
+RANK_WEIGHT_POPULARITY = float(os.getenv('PLACES_RANK_WEIGHT_POPULARITY', '0.2'))
+RANK_WEIGHT_PROXIMITY = float(os.getenv('PLACES_RANK_WEIGHT_PROXIMITY', '0.25'))
+# Gumbel noise scale for exploration (0 = always the same top results)
+PLACES_EXPLORATION = float(os.getenv('PLACES_EXPLORATION', '0.1'))
+
+# Rating prior: a 5.0 from 2 reviews should not beat a 4.7 from 900
+_PRIOR_RATING = 3.5
+_PRIOR_REVIEWS = 20
+# Review count treated as fully popular
+_POPULAR_REVIEWS = 1000
+_EARTH_RADIUS_M = 6371000.0
+
+
+def _distance_m(lat1, lng1, lat2, lng2):
+    # Haversine
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlmb = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * _EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def score_places(places, center=None, radius=5000):
+    """Score for each place (an array of doubles, same order as places)"""
+    n = len(places)
+    ratings = array('d', bytes(8 * n))
+    reviews = array('d', bytes(8 * n))
+    distances = array('d', bytes(8 * n))
+
+    for i, place in enumerate(places):
+        ratings[i] = place.get('rating') or 0.0
+        reviews[i] = place.get('user_ratings_total') or 0
+        location = (place.get('geometry') or {}).get('location')
+        if center and location:
+            distances[i] = _distance_m(center[0], center[1], location['lat'], location['lng'])
+
+    scores = array('d', bytes(8 * n))
+    log_popular = math.log1p(_POPULAR_REVIEWS)
+    for i in range(n):
+        count = reviews[i]
+        quality = (ratings[i] * count + _PRIOR_RATING * _PRIOR_REVIEWS) / (count + _PRIOR_REVIEWS) / 5.0
+        popularity = min(1.0, math.log1p(count) / log_popular)
+        proximity = math.exp(-distances[i] / radius) if radius else 1.0
+        scores[i] = (
+            RANK_WEIGHT_QUALITY * quality
+            + RANK_WEIGHT_POPULARITY * popularity
+            + RANK_WEIGHT_PROXIMITY * proximity
+        )
+    return scores
+
+
+def top_places(places, k, center=None, radius=5000, exploration=None, seed=None):
+    """The k best places, best first; exploration/seed control the random variety"""
+    if not places:
+        return []
+    scores = score_places(places, center, radius)
+    exploration = PLACES_EXPLORATION if exploration is None else exploration
+    if exploration > 0:
+        rng = random.Random(seed)
+        for i in range(len(scores)):
+            # Gumbel-top-k: sampling without replacement proportional to exp(score / exploration)
+            scores[i] -= exploration * math.log(-math.log(rng.random() or 1e-12))
+    return [places[i] for i in heapq.nlargest(k, range(len(places)), key=scores.__getitem__)]
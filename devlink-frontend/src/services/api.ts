@@ -117,6 +117,9 @@ export const businessAPI = {
 export const emailAPI = {
   sendEmail: (emailData: EmailRequest) =>
     api.post('/emails/send/', emailData),
+  // One call for many recipients: subject/body use {{placeholders}} filled from each recipient's variables
+  sendBulkEmail: (data: { subject: string; body: string; recipients: { email: string; variables?: Record<string, string> }[] }) =>
+    api.post('/emails/send/bulk/', data),
   history: (page: number, page_size = 10) =>
     api.get('/emails/history/', { params: { page, page_size } }),
   
@@ -131,6 +134,11 @@ export const emailAPI = {
   createCampaign: (data: any) => api.post('/emails/campaigns/', data),
   updateCampaign: (id: number, data: any) => api.put(`/emails/campaigns/${id}/`, data),
   deleteCampaign: (id: number) => api.delete(`/emails/campaigns/${id}/`),
+  prepareCampaign: (id: number) => api.post(`/emails/campaigns/${id}/prepare/`),
+  getCampaignDrafts: (id: number, status?: string) =>
+    api.get(`/emails/campaigns/${id}/drafts/`, { params: status ? { status } : {} }),
+  updateCampaignDraft: (id: number, draftId: number, data: { subject?: string; body?: string }) =>
+    api.patch(`/emails/campaigns/${id}/drafts/${draftId}/`, data),
   sendCampaign: (id: number) => api.post(`/emails/campaigns/${id}/send/`),
   createCampaignFromBusinesses: (businesses: any[], name?: string) => 
     api.post('/emails/campaigns/create-from-businesses/', { businesses, name }),
@@ -143,7 +151,62 @@ export const emailAPI = {
 export const aiAPI = {
   generateEmail: (data: GenerateEmailRequest) =>
     api.post('/ai/generate-email/', data),
+
+  // Server-sent events: onDelta receives subject/body text as Gemini writes it; resolves with the final email
+  streamEmail: async (
+    data: GenerateEmailRequest,
+    onDelta: (field: 'subject' | 'body', text: string) => void
+  ) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API_BASE_URL}/ai/generate-email/stream/`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify(data),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Email stream failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result: any = null;
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let end;
+      while ((end = buffer.indexOf('\n\n')) !== -1) {
+        const raw = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const payload = raw.match(/^data: (.*)$/m)?.[1];
+        if (!payload) continue;
+        const parsed = JSON.parse(payload);
+        if (event === 'delta') onDelta(parsed.field, parsed.text);
+        else if (event === 'result') result = parsed;
+      }
+    }
+    return result;
+  },
   
+  // Lists above AI_BATCH_STREAM_LIMIT (or async=true) return 202 with a job_id to poll
+  generateEmailsBatch: (businesses: any[], options: { developer_name?: string; developer_services?: string; async?: boolean } = {}) => {
+    const { async: runAsync, ...rest } = options;
+    return api.post('/ai/generate-emails/batch/', { businesses, ...rest }, {
+      params: runAsync ? { async: 1 } : {},
+      // NDJSON: one generated email per line
+      transformResponse: (body) => typeof body === 'string' && !body.trim().startsWith('{"job_id"')
+        ? body.split('\n').filter(Boolean).map((line) => JSON.parse(line))
+        : JSON.parse(body),
+    });
+  },
+  getEmailsBatchJob: (jobId: number) => api.get(`/ai/generate-emails/batch/${jobId}/`),
+
   generateBulkEmail: (data: { category: string; developer_name: string; developer_services: string }) =>
     api.post('/ai/generate-bulk-email/', data),
 
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'devlink_backend.settings')
 
 application = get_asgi_application()
+
+# Resume campaigns that were parked or orphaned by a restart, then keep dispatching due ones
+from django.conf import settings
+if settings.CAMPAIGN_DISPATCHER_ENABLED:
+    from emails.campaign_worker import start_dispatcher
+    start_dispatcher()
@@ -158,6 +158,25 @@ EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'true').lower() == 'true'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 
+# Queue sends from /api/emails/send/ and return 202 by default (override per request with ?async=0/1)
+EMAIL_SEND_ASYNC = os.getenv('EMAIL_SEND_ASYNC', 'false').lower() == 'true'
+# Background threads delivering queued emails
+EMAIL_SEND_WORKERS = int(os.getenv('EMAIL_SEND_WORKERS', '4'))
+# Background threads running AI generation jobs (campaign prepare, async batches), separate from the send workers
+AI_JOB_WORKERS = int(os.getenv('AI_JOB_WORKERS', '2'))
+# Queued sends still pending after this many seconds (lost in a restart) are queued again by the dispatcher
+EMAIL_PENDING_TIMEOUT = int(os.getenv('EMAIL_PENDING_TIMEOUT', '600'))
+# Bulk sends with more recipients than this are always queued (smaller ones too when sender pacing would make them wait)
+EMAIL_BULK_SYNC_LIMIT = int(os.getenv('EMAIL_BULK_SYNC_LIMIT', '50'))
+# Run the campaign dispatcher in server processes (resumes scheduled and orphaned campaigns)
+CAMPAIGN_DISPATCHER_ENABLED = os.getenv('CAMPAIGN_DISPATCHER_ENABLED', 'true').lower() == 'true'
+# /api/ai/generate-emails/batch/ streams lists up to this size; longer lists run as a background job
+AI_BATCH_STREAM_LIMIT = int(os.getenv('AI_BATCH_STREAM_LIMIT', '50'))
+# Local gazetteer of geocoded search locations (created and grown automatically)
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', str(BASE_DIR / 'gazetteer.bin'))
+# Seconds a user's dashboard stats stay cached (new email logs invalidate them right away)
+USER_STATS_CACHE_SECONDS = int(os.getenv('USER_STATS_CACHE_SECONDS', '300'))
+
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '127.0.0.1,localhost,172.19.32.147').split(',')
 
 # CORS configuration for local frontend dev server
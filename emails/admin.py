@@ -1,13 +1,34 @@
 from django.contrib import admin
-from .models import EmailLog, EmailTemplate, BulkEmailCampaign, EmailAnalytics
+from django.db.models import Q
+from .models import (
+    EmailLog, EmailTemplate, BulkEmailCampaign, EmailAnalytics, SenderAccount, DeadLetter, CampaignDraft,
+    ContactedRecipient, EmailLogRecipient
+)
+from .contacted import normalize_email
 
 @admin.register(EmailLog)
 class EmailLogAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'subject', 'status', 'created_at')
     list_filter = ('status', 'created_at', 'user')
-    search_fields = ('recipients', 'subject', 'user__username')
+    search_fields = ('subject', 'user__username')
     readonly_fields = ('created_at',)
     ordering = ('-created_at',)
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        # Recipients are matched by prefix on the indexed recipient rows instead of LIKE-scanning recipients:
+        # 'jo' or 'john@ac' match addresses, '@acme' or 'acme.co' match domains
+        term = normalize_email(search_term)
+        if not term or ' ' in term:
+            return results, may_have_duplicates
+        if term.startswith('@'):
+            match = Q(domain__startswith=term[1:])
+        elif '@' in term:
+            match = Q(address__startswith=term)
+        else:
+            match = Q(address__startswith=term) | Q(domain__startswith=term)
+        rows = EmailLogRecipient.objects.filter(match).values('log_id')
+        return results | queryset.filter(pk__in=rows), may_have_duplicates
     
     fieldsets = (
         ('Email Information', {
@@ -54,7 +75,7 @@ class BulkEmailCampaignAdmin(admin.ModelAdmin):
             'fields': ('recipients', 'total_count', 'sent_count')
         }),
         ('Timing', {
-            'fields': ('started_at', 'completed_at'),
+            'fields': ('started_at', 'completed_at', 'eta'),
             'classes': ('collapse',)
         }),
         ('Metadata', {
@@ -76,3 +97,56 @@ class EmailAnalyticsAdmin(admin.ModelAdmin):
             'fields': ('user', 'date', 'emails_sent', 'unique_recipients', 'templates_used', 'campaigns_completed')
         }),
     )
+
+@admin.register(SenderAccount)
+class SenderAccountAdmin(admin.ModelAdmin):
+    list_display = ('id', 'email', 'user', 'provider', 'health', 'sent_today', 'daily_limit', 'is_active')
+    list_filter = ('provider', 'health', 'is_active')
+    search_fields = ('email', 'user__username')
+    readonly_fields = ('created_at', 'updated_at')
+    
+    fieldsets = (
+        ('Sender Information', {
+            'fields': ('user', 'provider', 'email', 'display_name', 'is_active')
+        }),
+        ('SMTP', {
+            'fields': ('smtp_host', 'smtp_port', 'smtp_username', 'smtp_use_tls'),
+            'classes': ('collapse',)
+        }),
+        ('Budget & Health', {
+            'fields': ('per_second_limit', 'per_minute_limit', 'daily_limit', 'sent_today', 'sent_today_date', 'health', 'throttled_until', 'consecutive_failures', 'last_error')
+        }),
+        ('Metadata', {
+            'fields': ('created_at', 'updated_at'),
+            'classes': ('collapse',)
+        }),
+    )
+
+@admin.register(DeadLetter)
+class DeadLetterAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipient', 'user', 'campaign', 'failure_class', 'attempts', 'created_at', 'requeued_at')
+    list_filter = ('failure_class', 'created_at')
+    search_fields = ('recipient', 'user__username')
+    readonly_fields = ('created_at',)
+    ordering = ('-created_at',)
+
+@admin.register(CampaignDraft)
+class CampaignDraftAdmin(admin.ModelAdmin):
+    list_display = ('id', 'campaign', 'position', 'recipient', 'status', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('recipient', 'subject', 'campaign__name')
+    readonly_fields = ('created_at', 'updated_at')
+    ordering = ('campaign', 'position')
+
+@admin.register(ContactedRecipient)
+class ContactedRecipientAdmin(admin.ModelAdmin):
+    list_display = ('id', 'email', 'place_id', 'user', 'first_contacted_at')
+    search_fields = ('email', 'place_id', 'user__username')
+    readonly_fields = ('first_contacted_at',)
+    ordering = ('-first_contacted_at',)
+
+@admin.register(EmailLogRecipient)
+class EmailLogRecipientAdmin(admin.ModelAdmin):
+    list_display = ('id', 'address', 'domain', 'user', 'log')
+    search_fields = ('address', 'domain', 'user__username')
+    raw_id_fields = ('log',)
@@ -5,4 +5,7 @@ class EmailsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'emails'
 
+    def ready(self):
+        import emails.signals
+
 
@@ -0,0 +1,98 @@
+"""
+Bulk personalized sending
+
+Renders one message per recipient from a subject/body template plus that
+recipient's variables, then pushes every message through a single SenderPool
+(shared Gmail session / open SMTP connection) with a bounded number of
+concurrent sends.
+"""
+import os
+import threading
+import logging
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+from .models import EmailLog, BulkEmailCampaign
+from .sender_pool import SenderPool
+from .templating import render, get_sender_context
+
+logger = logging.getLogger(__name__)
+
+# Messages in flight at once for one bulk send
+BULK_SEND_CONCURRENCY = int(os.getenv('BULK_SEND_CONCURRENCY', '4'))
+
+
+def render_messages(user, subject_template, body_template, recipients):
+    """Return a list of (email, subject, body), one per recipient"""
+    sender = get_sender_context(user)
+
+    messages = []
+    for recipient in recipients:
+        context = {**recipient.get('variables', {}), 'email': recipient['email'], 'sender': sender}
+        messages.append((recipient['email'], render(subject_template, context), render(body_template, context)))
+    return messages
+
+
+def send_messages(user, messages, campaign=None):
+    """Send rendered messages concurrently; returns per-recipient results in input order"""
+    pool = SenderPool(user)
+
+    def send_one(message):
+        email, subject, body = message
+        try:
+            pool.send(subject, body, [email])
+        except Exception as e:
+            EmailLog.objects.create(
+                user=user, subject=subject, body=body, recipients=email,
+                status='failed', error_message=str(e)
+            )
+            return {'email': email, 'status': 'failed', 'error': str(e)}
+
+        EmailLog.objects.create(user=user, subject=subject, body=body, recipients=email, status='sent')
+        if campaign is not None:
+            BulkEmailCampaign.objects.filter(pk=campaign.pk).update(sent_count=F('sent_count') + 1)
+        return {'email': email, 'status': 'sent'}
+
+    results = [None] * len(messages)
+    indexes = iter(range(len(messages)))
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    index = next(indexes, None)
+                if index is None:
+                    return
+                results[index] = send_one(messages[index])
+        finally:
+            # Each worker thread has its own database connection
+            connection.close()
+
+    threads = [
+        threading.Thread(target=worker, name=f'bulk-send-{i}')
+        for i in range(max(1, min(BULK_SEND_CONCURRENCY, len(messages))))
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        pool.close()
+
+    return results
+
+
+def run_bulk_campaign(campaign_id, messages):
+    """Background job: send a bulk request tracked by a BulkEmailCampaign row"""
+    try:
+        campaign = BulkEmailCampaign.objects.select_related('user').get(pk=campaign_id)
+        send_messages(campaign.user, messages, campaign=campaign)
+    except Exception as e:
+        # The job's future swallows exceptions: record the failure so the campaign does not stay 'sending'
+        logger.error(f"Bulk send {campaign_id} failed: {str(e)}")
+        BulkEmailCampaign.objects.filter(pk=campaign_id).update(status='failed', error_message=str(e))
+        return
+
+    BulkEmailCampaign.objects.filter(pk=campaign_id).update(status='completed', completed_at=timezone.now())
@@ -0,0 +1,201 @@
+"""
+Prepare phase for bulk email campaigns
+
+Generates every recipient's personalized draft before sending (several
+recipients per Gemini call, a bounded number of calls in flight) and stores
+each batch as soon as it finishes, so users can preview (and edit) drafts and
+the send phase is pure I/O: a slow AI call never stalls the send loop and
+retries never regenerate. Calls past their deadline get the localized template
+email instead.
+
+Preparing holds the same lease as sending (worker_token + worker_heartbeat),
+renewed as batches are stored, so a prepare lost to a restart can be told
+apart from a slow one and recovered.
+"""
+import os
+import time
+import logging
+from django.utils import timezone
+from .models import BulkEmailCampaign, CampaignDraft
+from .templating import compile_template, build_business_context, get_sender_context
+from ai_services.email_generator import EmailGenerator, GEMINI_BATCH_SIZE
+from ai_services.executor import generate_concurrently
+from ai_services.sender_context import SenderContext
+
+logger = logging.getLogger(__name__)
+
+# Gemini calls in flight at once while preparing one campaign
+CAMPAIGN_PREPARE_CONCURRENCY = int(os.getenv('CAMPAIGN_PREPARE_CONCURRENCY', '4'))
+
+
+class LeaseLost(Exception):
+    """Another worker took the campaign over (or it was stopped); this worker must exit"""
+
+
+class DraftGenerator:
+    """Produces (subject, body) for a campaign recipient"""
+
+    def __init__(self, campaign):
+        self.campaign = campaign
+        # Sender name, contact details and signatures are resolved once for the whole campaign
+        self.sender = SenderContext.for_user(campaign.user, campaign.user.username or 'Developer')
+        self.renderers = None
+        if campaign.template_id:
+            # Compile once (cached by source) and reuse the same sender info for every recipient
+            template = campaign.template
+            self.renderers = (
+                compile_template(template.subject),
+                compile_template(template.body),
+                get_sender_context(campaign.user, self.sender),
+            )
+
+    def generate(self, recipient_data):
+        campaign = self.campaign
+
+        if self.renderers:
+            render_subject, render_body, sender = self.renderers
+            context = build_business_context(recipient_data, sender)
+            return render_subject(context), render_body(context)
+
+        # Use AI to generate personalized email with localization
+        ai_email = EmailGenerator.generate_intro_email(
+            business_name=recipient_data.get('name', 'Business'),
+            business_category=recipient_data.get('category', 'business'),
+            developer_name=campaign.user.username or 'Developer',
+            developer_services='Web development and digital solutions',
+            user=campaign.user,  # Pass the user object for real name and info
+            business_country=recipient_data.get('country', None),  # Pass country for language localization
+            business_city=recipient_data.get('city', None),  # Pass city for more specific localization
+            business_country_code=recipient_data.get('country_code'),  # Geocoder country code, when known
+            sender=self.sender
+        )
+
+        # Use AI-generated subject and body, or fallback to campaign defaults
+        return ai_email.get('subject', campaign.subject), ai_email.get('body', campaign.body)
+
+    def generate_many(self, recipients):
+        """(subject, body) for each recipient; AI drafts are generated several per Gemini call"""
+        if self.renderers:
+            return [self.generate(recipient_data) for recipient_data in recipients]
+
+        campaign = self.campaign
+        ai_emails = EmailGenerator.generate_intro_emails_batch(
+            recipients,
+            developer_name=campaign.user.username or 'Developer',
+            developer_services='Web development and digital solutions',
+            user=campaign.user,
+            batch_size=len(recipients),
+            sender=self.sender
+        )
+        return [
+            (ai_email.get('subject', campaign.subject), ai_email.get('body', campaign.body))
+            for ai_email in ai_emails
+        ]
+
+    def fallback_many(self, recipients):
+        """Localized template emails for recipients whose generation missed its deadline"""
+        campaign = self.campaign
+        emails = EmailGenerator.template_intro_emails(
+            recipients, campaign.user.username or 'Developer', 'Web development and digital solutions', campaign.user,
+            sender=self.sender
+        )
+        return [(email['subject'], email['body']) for email in emails]
+
+
+class CampaignPreparer:
+    """Runs one claimed campaign from 'preparing' to 'prepared'"""
+
+    # Seconds between heartbeats
+    HEARTBEAT_EVERY = 30
+
+    def __init__(self, campaign):
+        self.campaign = campaign
+        self._last_heartbeat = time.monotonic()
+
+    def run(self):
+        campaign = self.campaign
+        try:
+            # A job that waited in the queue past the lease may have been reset meanwhile
+            self._heartbeat(force=True)
+            self.generate_drafts(on_progress=self._heartbeat)
+            self._release(status='prepared')
+
+        except LeaseLost:
+            logger.info(f"Preparing campaign {campaign.id} was taken over")
+        except Exception as e:
+            logger.error(f"Preparing campaign {campaign.id} failed: {str(e)}")
+            # Drafts generated so far are kept; preparing again resumes from them
+            self._release(status='draft')
+
+    def _heartbeat(self, force=False):
+        if not force and time.monotonic() - self._last_heartbeat < self.HEARTBEAT_EVERY:
+            return
+        self._last_heartbeat = time.monotonic()
+        if not self._leased().update(worker_heartbeat=timezone.now()):
+            raise LeaseLost()
+
+    def _leased(self):
+        return BulkEmailCampaign.objects.filter(
+            pk=self.campaign.pk, status='preparing', worker_token=self.campaign.worker_token
+        )
+
+    def _release(self, status):
+        if self._leased().update(status=status, worker_token='', worker_heartbeat=None):
+            self.campaign.status = status
+
+    def generate_drafts(self, on_progress=None):
+        """
+        Create missing drafts and generate the ones without a usable result
+
+        on_progress() is called after every stored batch, e.g. to renew a lease
+        while a long prepare runs.
+        """
+        campaign = self.campaign
+        self._create_missing_drafts()
+
+        # Ready and edited drafts are kept
+        drafts = list(campaign.drafts.filter(status__in=['pending', 'failed']))
+        if not drafts:
+            return
+        generator = DraftGenerator(campaign)
+
+        # One Gemini call per batch of drafts
+        batches = [drafts[i:i + GEMINI_BATCH_SIZE] for i in range(0, len(drafts), GEMINI_BATCH_SIZE)]
+
+        # Workers only call the generator; each batch is saved from this thread as soon as it finishes
+        results = generate_concurrently(
+            [[draft.recipient_data for draft in batch] for batch in batches],
+            generator.generate_many,
+            generator.fallback_many,
+            max_in_flight=CAMPAIGN_PREPARE_CONCURRENCY,
+        )
+        for index, generated, timed_out in results:
+            for draft, (subject, body) in zip(batches[index], generated):
+                CampaignDraft.objects.filter(pk=draft.pk).update(
+                    subject=subject[:255], body=body, status='ready',
+                    error_message='AI generation timed out, template email used' if timed_out else None
+                )
+            if on_progress:
+                on_progress()
+
+    def _create_missing_drafts(self):
+        campaign = self.campaign
+        existing = set(campaign.drafts.values_list('position', flat=True))
+        CampaignDraft.objects.bulk_create([
+            CampaignDraft(
+                campaign=campaign,
+                position=position,
+                recipient=recipient_data.get('email', ''),
+                recipient_data=recipient_data,
+            )
+            for position, recipient_data in enumerate(campaign.recipients)
+            if position not in existing
+        ])
+
+
+def prepare_campaign(campaign_id, worker_token):
+    """Background entry point: generate drafts for a campaign claimed with claim_prepare()"""
+    campaign = BulkEmailCampaign.objects.select_related('user', 'template').get(pk=campaign_id)
+    # The lease taken by the claim, not whatever is stored now (a later claim may have replaced it)
+    campaign.worker_token = worker_token
+    CampaignPreparer(campaign).run()
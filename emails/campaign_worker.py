@@ -0,0 +1,393 @@
+"""
+Background worker for bulk email campaigns
+
+Sends each recipient's email through the user's sender pool, paced per sender.
+Drafts stored by the prepare phase are sent as-is; a campaign that was not
+prepared runs the (concurrent) prepare step first. Recipients whose draft
+still failed get their email generated inline.
+Recipients that cannot be sent because every sender is out of budget or
+throttled carry over to the next sending window. Failed sends are retried with
+backoff according to their failure class and end up in the dead-letter table
+when they cannot be delivered.
+
+The send schedule lives in the database: every draft stores when it is due
+(due_at) and how many attempts failed, so nothing is lost when the process
+restarts. A worker only sleeps through short pacing waits; when the next send
+is further away it parks the campaign as 'scheduled' with resume_at and exits.
+Workers hold a lease (worker_token + worker_heartbeat) on their campaign, and
+the dispatcher started with the server resumes parked campaigns once they are
+due and takes over 'sending' campaigns whose worker stopped heartbeating.
+The prepare phase holds the same lease; a 'preparing' campaign whose lease
+expired goes back to 'draft' (its finished drafts are kept).
+"""
+import os
+import time
+import uuid
+import threading
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+from .models import BulkEmailCampaign, EmailLog, DeadLetter, CampaignDraft
+from .campaign_prepare import DraftGenerator, CampaignPreparer, LeaseLost
+from .contacted import record_contacted
+from .retry import RetryPolicy, classify_failure
+from .scheduler import SendScheduler
+from .sender_pool import SenderPool, NoSenderAvailable, THROTTLE_COOLDOWN
+from .tasks import recover_pending_sends
+
+logger = logging.getLogger(__name__)
+
+# Waits longer than this (seconds) park the campaign instead of keeping a thread asleep
+CAMPAIGN_PARK_AFTER = int(os.getenv('CAMPAIGN_PARK_AFTER', '60'))
+# A worker silent for this long (seconds) is considered dead and its campaign is taken over
+CAMPAIGN_WORKER_LEASE = int(os.getenv('CAMPAIGN_WORKER_LEASE', '300'))
+# How often (seconds) the dispatcher looks for due and orphaned campaigns
+CAMPAIGN_DISPATCH_INTERVAL = int(os.getenv('CAMPAIGN_DISPATCH_INTERVAL', '30'))
+
+# Drafts that still have to be sent
+ACTIVE_DRAFT_STATUSES = ('pending', 'ready', 'failed')
+
+
+def _from_timestamp(seconds):
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+class CampaignWorker:
+    """Sends one claimed campaign until it is completed or parked"""
+
+    # Refresh the stored ETA every N sends
+    ETA_UPDATE_EVERY = 25
+    # Seconds between heartbeats
+    HEARTBEAT_EVERY = 30
+
+    def __init__(self, campaign):
+        self.campaign = campaign
+        self.retry_policy = RetryPolicy()
+        self.generator = None
+        self._last_heartbeat = time.monotonic()
+
+    def run(self):
+        campaign = self.campaign
+        try:
+            pool = SenderPool(campaign.user)
+            self.generator = DraftGenerator(campaign)
+            # Generate every missing draft concurrently up front instead of one per send,
+            # renewing the lease as batches finish so a long prepare is not taken over
+            CampaignPreparer(campaign).generate_drafts(on_progress=self._heartbeat)
+
+            try:
+                while True:
+                    scheduler = SendScheduler()
+                    for job, due_at in self._pending_jobs():
+                        scheduler.push(job, due_at)
+                    if not scheduler:
+                        if self._complete():
+                            return
+                        continue
+                    if self._send_due(pool, scheduler):
+                        return  # parked
+            finally:
+                pool.close()
+
+        except LeaseLost:
+            logger.info(f"Campaign {campaign.id} was taken over by another worker")
+        except Exception as e:
+            logger.error(f"Campaign {campaign.id} failed: {str(e)}")
+            self._release(status='failed', error_message=str(e))
+
+    def _send_due(self, pool, scheduler):
+        """Send every job in the scheduler; returns True if the campaign was parked"""
+        self._update_eta(pool, len(scheduler))
+        processed = 0
+
+        while scheduler:
+            job, wait = scheduler.pop()
+            self._heartbeat()
+
+            # Every sender out of budget or throttled: hold everything until one is back
+            blocked_until = pool.blocked_until()
+            if blocked_until:
+                wait = max(wait, (blocked_until - timezone.now()).total_seconds())
+
+            if wait > CAMPAIGN_PARK_AFTER:
+                # Nothing is due for a while: store the wake-up time and free the thread
+                scheduler.push(job, time.time() + wait)
+                self._update_eta(pool, len(scheduler))
+                self._park(_from_timestamp(time.time() + wait))
+                return True
+            if wait > 0:
+                time.sleep(wait)
+
+            try:
+                self._send(pool, job)
+            except NoSenderAvailable as e:
+                # Out of daily budget or throttled everywhere: carry over instead of failing
+                retry_at = e.retry_at.timestamp() if e.retry_at else time.time() + THROTTLE_COOLDOWN
+                self._schedule(scheduler, job, retry_at)
+                self._update_eta(pool, len(scheduler))
+                continue
+            except Exception as e:
+                self._handle_failure(scheduler, job, e)
+            else:
+                # The email is out: bookkeeping errors must never lead to a resend or a dead letter
+                try:
+                    self._record_sent(job)
+                except Exception as e:
+                    logger.error(f"Campaign {self.campaign.id}: sent to {job['recipient'].get('email', '')} but recording failed: {str(e)}")
+
+            processed += 1
+            if processed % self.ETA_UPDATE_EVERY == 0:
+                self._update_eta(pool, len(scheduler))
+        return False
+
+    def _send(self, pool, job):
+        """Render or generate (once) and send the email for one recipient"""
+        recipient_data = job['recipient']
+
+        if 'subject' not in job:
+            job['subject'], job['body'] = self.generator.generate(recipient_data)
+            # Keep the generated draft so a retry after a restart does not generate it again
+            CampaignDraft.objects.filter(pk=job['draft_id']).update(
+                subject=job['subject'][:255], body=job['body'], status='ready'
+            )
+
+        # Send through the sender that can go soonest; throttled senders hand off to the next one
+        pool.send(job['subject'], job['body'], [recipient_data.get('email', '')])
+
+    def _record_sent(self, job):
+        """Mark the draft sent (first, so a restart never resends it), then log it"""
+        campaign = self.campaign
+        recipient_data = job['recipient']
+        CampaignDraft.objects.filter(pk=job['draft_id']).update(status='sent', due_at=None)
+
+        # Log the email with AI generation info
+        EmailLog.objects.create(
+            user=campaign.user,
+            subject=job['subject'],
+            body=job['body'],
+            recipients=recipient_data.get('email', ''),
+            status='sent'
+        )
+        if recipient_data.get('place_id'):
+            # The EmailLog signal indexed the address; attach the Places id so searches skip this business
+            record_contacted(campaign.user, [(recipient_data.get('email', ''), recipient_data['place_id'])])
+
+        campaign.sent_count += 1
+        campaign.save(update_fields=['sent_count'])
+
+    def _pending_jobs(self):
+        """(job, due timestamp) for every draft still to send, from the database"""
+        now = time.time()
+        for draft in self.campaign.drafts.filter(status__in=ACTIVE_DRAFT_STATUSES):
+            job = {'recipient': draft.recipient_data, 'attempts': draft.attempts, 'draft_id': draft.id}
+            if draft.status == 'ready':
+                job['subject'] = draft.subject
+                job['body'] = draft.body
+            yield job, draft.due_at.timestamp() if draft.due_at else now
+
+    def _schedule(self, scheduler, job, due_at):
+        """Queue a job again and store when it is due"""
+        scheduler.push(job, due_at)
+        CampaignDraft.objects.filter(pk=job['draft_id']).update(due_at=_from_timestamp(due_at), attempts=job['attempts'])
+
+    def _handle_failure(self, scheduler, job, exc):
+        """Retry throttled/transient failures with backoff, dead-letter the rest"""
+        job['attempts'] = job.get('attempts', 0) + 1
+        failure_class = classify_failure(exc)
+
+        if self.retry_policy.should_retry(failure_class, job['attempts']):
+            delay = self.retry_policy.next_delay(job['attempts'], failure_class, exc)
+            self._schedule(scheduler, job, time.time() + delay)
+            return
+
+        campaign = self.campaign
+        recipient_data = job['recipient']
+
+        CampaignDraft.objects.filter(pk=job['draft_id']).update(
+            status='dead', due_at=None, attempts=job['attempts'], error_message=str(exc)
+        )
+        DeadLetter.objects.create(
+            user=campaign.user,
+            campaign=campaign,
+            draft_id=job['draft_id'],
+            recipient=recipient_data.get('email', ''),
+            recipient_data=recipient_data,
+            subject=job.get('subject', campaign.subject),
+            body=job.get('body', campaign.body),
+            attempts=job['attempts'],
+            failure_class=failure_class,
+            last_error=str(exc)
+        )
+
+        # Log failed email
+        EmailLog.objects.create(
+            user=campaign.user,
+            subject=job.get('subject', campaign.subject),
+            body=job.get('body', campaign.body),
+            recipients=recipient_data.get('email', ''),
+            status='failed',
+            error_message=str(exc)
+        )
+
+    def _heartbeat(self):
+        if time.monotonic() - self._last_heartbeat < self.HEARTBEAT_EVERY:
+            return
+        self._last_heartbeat = time.monotonic()
+        if not self._leased().update(worker_heartbeat=timezone.now()):
+            raise LeaseLost()
+
+    def _leased(self):
+        return BulkEmailCampaign.objects.filter(pk=self.campaign.pk, worker_token=self.campaign.worker_token)
+
+    def _park(self, resume_at):
+        logger.info(f"Campaign {self.campaign.id} scheduled to resume at {resume_at.isoformat()}")
+        self._release(status='scheduled', resume_at=resume_at)
+
+    def _complete(self):
+        """Mark the campaign completed unless drafts were requeued meanwhile; returns True when done"""
+        if not self._release(status='completed', completed_at=timezone.now(), eta=None):
+            raise LeaseLost()
+        if not self.campaign.drafts.filter(status__in=ACTIVE_DRAFT_STATUSES).exists():
+            return True
+        # A requeue landed between the last load and the status change: take the campaign back
+        return not claim_campaign(self.campaign)
+
+    def _release(self, **fields):
+        """Store the final state and give up the lease"""
+        fields.setdefault('resume_at', None)
+        updated = self._leased().update(worker_token='', worker_heartbeat=None, **fields)
+        for name, value in fields.items():
+            setattr(self.campaign, name, value)
+        return updated
+
+    def _update_eta(self, pool, pending):
+        self.campaign.eta = pool.estimate_eta(pending)
+        self._leased().update(eta=self.campaign.eta)
+
+
+def claim_campaign(campaign):
+    """
+    Take the send lease on a campaign; returns False if someone else changed it first
+
+    The update only matches the status and lease the caller saw, so two
+    dispatchers (or a dispatcher and a view) never both start a worker.
+    """
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    claimed = BulkEmailCampaign.objects.filter(
+        pk=campaign.pk, status=campaign.status, worker_token=campaign.worker_token,
+        worker_heartbeat=campaign.worker_heartbeat
+    ).update(status='sending', worker_token=token, worker_heartbeat=now, resume_at=None, error_message=None)
+    if claimed:
+        campaign.status = 'sending'
+        campaign.worker_token = token
+        campaign.worker_heartbeat = now
+        campaign.resume_at = None
+    return bool(claimed)
+
+
+def _stale_lease(now):
+    return Q(worker_heartbeat__isnull=True) | Q(worker_heartbeat__lt=now - timedelta(seconds=CAMPAIGN_WORKER_LEASE))
+
+
+def claim_prepare(campaign):
+    """
+    Move a draft/prepared campaign (or one whose prepare died) to 'preparing' under a new lease
+
+    Returns False when the campaign is in another state or someone else claimed it first.
+    """
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    claimed = BulkEmailCampaign.objects.filter(
+        Q(pk=campaign.pk) & (Q(status__in=('draft', 'prepared')) | Q(status='preparing') & _stale_lease(now))
+    ).update(status='preparing', worker_token=token, worker_heartbeat=now, error_message=None)
+    if claimed:
+        campaign.status = 'preparing'
+        campaign.worker_token = token
+        campaign.worker_heartbeat = now
+    return bool(claimed)
+
+
+def worker_is_alive(campaign):
+    """Whether a worker is sending the campaign right now (its lease is fresh)"""
+    return bool(
+        campaign.status == 'sending' and campaign.worker_heartbeat
+        and campaign.worker_heartbeat >= timezone.now() - timedelta(seconds=CAMPAIGN_WORKER_LEASE)
+    )
+
+
+def _run_worker(campaign):
+    close_old_connections()
+    try:
+        CampaignWorker(campaign).run()
+    finally:
+        close_old_connections()
+
+
+def start_campaign_worker(campaign):
+    """Claim the campaign and send it in a background thread; returns False if it was already claimed"""
+    if not claim_campaign(campaign):
+        return False
+    thread = threading.Thread(target=_run_worker, args=(campaign,), name=f'campaign-worker-{campaign.id}')
+    thread.daemon = True
+    thread.start()
+    return True
+
+
+def resume_campaigns():
+    """Start workers for parked campaigns that are due and for campaigns whose worker died"""
+    now = timezone.now()
+    stale = _stale_lease(now)
+
+    # A prepare that stopped heartbeating (restart, crash) can be prepared or sent again
+    recovered = BulkEmailCampaign.objects.filter(status='preparing').filter(stale).update(
+        status='draft', worker_token='', worker_heartbeat=None
+    )
+    if recovered:
+        logger.info(f"Reset {recovered} campaigns stuck in preparing")
+
+    due = BulkEmailCampaign.objects.filter(kind='outreach').filter(
+        Q(status='scheduled') & (Q(resume_at__isnull=True) | Q(resume_at__lte=now))
+        | Q(status='sending') & stale
+    ).select_related('user', 'template')
+
+    started = 0
+    for campaign in due:
+        if start_campaign_worker(campaign):
+            logger.info(f"Resumed campaign {campaign.id}")
+            started += 1
+    return started
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def run_dispatcher():
+    """Resume due and orphaned campaigns (and lost queued sends) every CAMPAIGN_DISPATCH_INTERVAL seconds, forever"""
+    stop = threading.Event()
+    while True:
+        close_old_connections()
+        try:
+            resume_campaigns()
+        except Exception as e:
+            logger.error(f"Campaign dispatcher failed: {str(e)}")
+        try:
+            recover_pending_sends()
+        except Exception as e:
+            logger.error(f"Recovering queued sends failed: {str(e)}")
+        if stop.wait(CAMPAIGN_DISPATCH_INTERVAL):
+            return
+
+
+def start_dispatcher():
+    """Start the campaign dispatcher thread once per process (resumes due work right away)"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher and _dispatcher.is_alive():
+            return
+        _dispatcher = threading.Thread(target=run_dispatcher, name='campaign-dispatcher')
+        _dispatcher.daemon = True
+        _dispatcher.start()
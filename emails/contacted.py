@@ -0,0 +1,76 @@
+"""
+Index of businesses each user already contacted
+
+Every successful send adds its recipients to ContactedRecipient (unique per
+user and normalized address, indexed by Places id as well), so "was this
+business already emailed?" is one indexed lookup per batch of candidates
+instead of a scan over every EmailLog.recipients string. Business search and
+campaign creation use it to leave those businesses out.
+"""
+from django.db.models import Q
+from .models import ContactedRecipient
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def include_contacted(request):
+    """Whether the request asks to keep already contacted businesses (include_contacted=true)"""
+    value = request.data.get('include_contacted', request.query_params.get('include_contacted', ''))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def record_contacted(user, contacts):
+    """Add (email, place_id) pairs to the user's index; place_id may be empty"""
+    contacts = [(normalize_email(email), place_id or '') for email, place_id in contacts]
+    contacts = [(email, place_id) for email, place_id in contacts if email]
+    if not contacts:
+        return
+
+    ContactedRecipient.objects.bulk_create(
+        [ContactedRecipient(user=user, email=email, place_id=place_id) for email, place_id in contacts],
+        ignore_conflicts=True
+    )
+    # Addresses first recorded without a Places id get it once it is known
+    for email, place_id in contacts:
+        if place_id:
+            ContactedRecipient.objects.filter(user=user, email=email, place_id='').update(place_id=place_id)
+
+
+class ContactedIndex:
+    """Membership checks against one user's contacted recipients"""
+
+    def __init__(self, user):
+        self.user = user
+
+    def lookup(self, emails=(), place_ids=()):
+        """(contacted emails, contacted place_ids) among the candidates, in one indexed query"""
+        emails = {normalize_email(email) for email in emails if email}
+        place_ids = {place_id for place_id in place_ids if place_id}
+        if not emails and not place_ids:
+            return set(), set()
+
+        rows = ContactedRecipient.objects.filter(user=self.user).filter(
+            Q(email__in=emails) | Q(place_id__in=place_ids)
+        ).values_list('email', 'place_id')
+        found_emails, found_place_ids = set(), set()
+        for email, place_id in rows:
+            found_emails.add(email)
+            found_place_ids.add(place_id)
+        return found_emails & emails, found_place_ids & place_ids
+
+    def contacted_place_ids(self, place_ids):
+        return self.lookup(place_ids=place_ids)[1]
+
+    def exclude(self, businesses):
+        """Businesses (dicts with email / place_id) not contacted yet, and how many were left out"""
+        emails, place_ids = self.lookup(
+            [business.get('email') for business in businesses],
+            [business.get('place_id') for business in businesses]
+        )
+        kept = [
+            business for business in businesses
+            if normalize_email(business.get('email')) not in emails and business.get('place_id') not in place_ids
+        ]
+        return kept, len(businesses) - len(kept)
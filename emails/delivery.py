@@ -0,0 +1,93 @@
+"""
+Single-message delivery used by SendEmailView
+
+Tries the user's Gmail OAuth2 connection first and falls back to the transport
+selected by EMAIL_AUTH_METHOD (Django backend or XOAUTH2 over SMTP). The
+fallback is only used when Gmail certainly did not send the message; after an
+ambiguous failure (e.g. a read timeout) DeliveryUncertainError is raised
+instead of risking a second copy.
+"""
+import os
+import base64
+import smtplib
+from email.mime.text import MIMEText
+from django.conf import settings
+from django.core.mail import send_mail
+from .gmail_oauth2 import GmailOAuth2Service
+from .retry import proves_not_sent
+
+
+class DeliveryConfigError(ValueError):
+    """The configured transport cannot be used (missing token, unknown method)"""
+
+
+class DeliveryUncertainError(Exception):
+    """Gmail failed in a way that does not rule out that the message was sent"""
+
+
+def get_smtp_auth_string():
+    """XOAUTH2 auth string for EMAIL_AUTH_METHOD, or None for the basic backend"""
+    auth_method = os.getenv('EMAIL_AUTH_METHOD', 'basic')  # basic | gmail_oauth2 | outlook_oauth2
+
+    if auth_method == 'basic':
+        return None
+    if auth_method == 'gmail_oauth2':
+        access_token = os.getenv('GMAIL_OAUTH2_ACCESS_TOKEN', '')
+        if not access_token:
+            raise DeliveryConfigError('GMAIL_OAUTH2_ACCESS_TOKEN missing')
+    elif auth_method == 'outlook_oauth2':
+        access_token = os.getenv('OUTLOOK_OAUTH2_ACCESS_TOKEN', '')
+        if not access_token:
+            raise DeliveryConfigError('OUTLOOK_OAUTH2_ACCESS_TOKEN missing')
+    else:
+        raise DeliveryConfigError('Unsupported EMAIL_AUTH_METHOD')
+
+    return f"user={settings.EMAIL_HOST_USER}\1auth=Bearer {access_token}\1\1"
+
+
+def deliver(user, subject, body, recipients):
+    """Send one message; returns a dict with the method used"""
+    # Check if user has Gmail OAuth2 connected
+    try:
+        oauth_service = GmailOAuth2Service()
+        use_gmail = oauth_service.has_gmail_connection(user)
+    except Exception:
+        # Profile doesn't exist or Gmail not connected, use basic method
+        use_gmail = False
+
+    if use_gmail:
+        try:
+            result = oauth_service.send_email(
+                user=user,
+                subject=subject,
+                body=body,
+                recipients=recipients
+            )
+            return {'method': 'gmail_oauth2', 'gmail_message_id': result.get('id')}
+        except Exception as e:
+            # Fall back to basic method only if Gmail certainly did not send it
+            if not proves_not_sent(e):
+                raise DeliveryUncertainError(f"Gmail send failed and may have been delivered: {str(e)}") from e
+
+    # Use basic email method (fallback)
+    auth_string = get_smtp_auth_string()
+
+    if auth_string is None:
+        # Send via configured backend (console by default or SMTP with app password)
+        send_mail(subject, body, settings.EMAIL_HOST_USER or None, recipients, fail_silently=False)
+    else:
+        # OAuth2 over SMTP
+        msg = MIMEText(body, _charset='utf-8')
+        msg['Subject'] = subject
+        msg['From'] = settings.EMAIL_HOST_USER
+        msg['To'] = ', '.join(recipients)
+
+        with smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT) as server:
+            if settings.EMAIL_USE_TLS:
+                server.starttls()
+            # XOAUTH2
+            server.ehlo()
+            server.docmd('AUTH', 'XOAUTH2 ' + base64.b64encode(auth_string.encode()).decode())
+            server.sendmail(settings.EMAIL_HOST_USER, recipients, msg.as_string())
+
+    return {'method': 'basic'}
@@ -0,0 +1,88 @@
+"""
+Shared HTTP session for Gmail and Google OAuth2 API calls
+
+One keep-alive connection pool per process so sends reuse TCP/TLS connections,
+with explicit timeouts and retries that honor Retry-After on 429/503.
+"""
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Pool size should match the number of threads sending at the same time
+POOL_SIZE = int(os.getenv('GMAIL_HTTP_POOL_SIZE', '10'))
+
+# (connect, read) timeouts in seconds
+TIMEOUT = (
+    float(os.getenv('GMAIL_HTTP_CONNECT_TIMEOUT', '5')),
+    float(os.getenv('GMAIL_HTTP_READ_TIMEOUT', '30')),
+)
+
+MAX_RETRIES = int(os.getenv('GMAIL_HTTP_MAX_RETRIES', '3'))
+# Longest Retry-After (seconds) a sending thread sleeps through; longer throttles
+# come back as the 429/503 response and are rescheduled by the caller
+MAX_RETRY_AFTER = float(os.getenv('GMAIL_HTTP_MAX_RETRY_AFTER', '10'))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class CappedRetry(Retry):
+    """Retry that never sleeps longer than MAX_RETRY_AFTER for a Retry-After header"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+def _build_retry():
+    """Retry policy that never repeats a request the server may have processed"""
+    return CappedRetry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,  # connection never established, safe for any method
+        read=0,               # response lost after sending: the email may already be out
+        status=MAX_RETRIES,
+        # Google rejects throttled/unavailable requests before processing them
+        status_forcelist=(429, 503),
+        allowed_methods=None,
+        backoff_factor=0.5,
+        backoff_jitter=0.5,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def get_session():
+    """Return the process-wide session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_SIZE,
+                    pool_maxsize=POOL_SIZE,
+                    max_retries=_build_retry(),
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def request(method, url, **kwargs):
+    """Issue a request through the shared session with the default timeouts"""
+    kwargs.setdefault('timeout', TIMEOUT)
+    return get_session().request(method, url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
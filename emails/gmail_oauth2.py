@@ -8,10 +8,11 @@ import smtplib
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import requests
 from django.conf import settings
 from django.utils import timezone
 from accounts.models import UserProfile
+from .gmail_token_cache import token_cache
+from . import gmail_http
 
 
 class GmailOAuth2Service:
@@ -67,7 +68,7 @@ class GmailOAuth2Service:
             'redirect_uri': self.redirect_uri
         }
         
-        response = requests.post(self.TOKEN_URL, data=data)
+        response = gmail_http.post(self.TOKEN_URL, data=data)
         response.raise_for_status()
         
         return response.json()
@@ -84,7 +85,7 @@ class GmailOAuth2Service:
             'grant_type': 'refresh_token'
         }
         
-        response = requests.post(self.TOKEN_URL, data=data)
+        response = gmail_http.post(self.TOKEN_URL, data=data)
         response.raise_for_status()
         
         return response.json()
@@ -92,7 +93,7 @@ class GmailOAuth2Service:
     def get_user_info(self, access_token):
         """Get user information from Gmail API"""
         headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get('https://www.googleapis.com/oauth2/v2/userinfo', headers=headers)
+        response = gmail_http.get('https://www.googleapis.com/oauth2/v2/userinfo', headers=headers)
         response.raise_for_status()
         return response.json()
     
@@ -115,12 +116,19 @@ class GmailOAuth2Service:
             profile.gmail_email = user_info.get('email')
         
         profile.save()
+        
+        token_cache.put(user.id, profile.gmail_access_token, profile.gmail_token_expires_at)
         return profile
     
     def get_valid_access_token(self, user):
         """Get valid access token, refreshing if necessary"""
+        # Fast path: token already cached in memory, no database access
+        cached = token_cache.get(user.id)
+        if cached:
+            return cached.access_token
+        
         try:
-            profile = user.profile
+            profile = UserProfile.objects.get(user_id=user.id)
         except UserProfile.DoesNotExist:
             raise ValueError("User profile not found")
         
@@ -129,6 +137,8 @@ class GmailOAuth2Service:
         
         # Check if token is still valid
         if profile.is_gmail_token_valid():
+            token_cache.put(user.id, profile.gmail_access_token, profile.gmail_token_expires_at)
+            token_cache.start_refresher(self._refresh_cached_token)
             return profile.gmail_access_token
         
         # Token expired, try to refresh
@@ -136,28 +146,141 @@ class GmailOAuth2Service:
             raise ValueError("No refresh token available")
         
         try:
-            token_data = self.refresh_access_token(profile.gmail_refresh_token)
-            
-            # Update profile with new token
-            expires_in = token_data.get('expires_in', 3600)
-            expires_at = timezone.now() + timedelta(seconds=expires_in)
-            
-            profile.gmail_access_token = token_data.get('access_token')
-            profile.gmail_token_expires_at = expires_at
-            
-            # Update refresh token if provided
-            if 'refresh_token' in token_data:
-                profile.gmail_refresh_token = token_data['refresh_token']
-            
-            profile.save()
-            
-            return profile.gmail_access_token
-            
+            entry = token_cache.refresh(user.id, lambda: self._refresh_profile_token(user.id))
         except Exception as e:
             # Refresh failed, mark as disconnected
-            profile.gmail_connected = False
-            profile.save()
+            token_cache.invalidate(user.id)
+            UserProfile.objects.filter(user_id=user.id).update(gmail_connected=False)
             raise ValueError(f"Failed to refresh token: {str(e)}")
+        
+        token_cache.start_refresher(self._refresh_cached_token)
+        return entry.access_token
+    
+    def has_gmail_connection(self, user):
+        """Check if the user can send through Gmail (valid or refreshable token)"""
+        if token_cache.get(user.id):
+            return True
+        
+        try:
+            profile = user.profile
+        except UserProfile.DoesNotExist:
+            return False
+        
+        return bool(profile.gmail_connected and (profile.is_gmail_token_valid() or profile.gmail_refresh_token))
+    
+    def _refresh_profile_token(self, user_id):
+        """Refresh the token stored on the user's profile and persist the new one"""
+        profile = UserProfile.objects.get(user_id=user_id)
+        if not profile.gmail_connected or not profile.gmail_refresh_token:
+            raise ValueError("No refresh token available")
+        
+        token_data = self.refresh_access_token(profile.gmail_refresh_token)
+        
+        # Update profile with new token
+        expires_in = token_data.get('expires_in', 3600)
+        expires_at = timezone.now() + timedelta(seconds=expires_in)
+        
+        updates = {
+            'gmail_access_token': token_data.get('access_token'),
+            'gmail_token_expires_at': expires_at,
+        }
+        
+        # Update refresh token if provided
+        if 'refresh_token' in token_data:
+            updates['gmail_refresh_token'] = token_data['refresh_token']
+        
+        # Update only the token columns so concurrent profile edits are not overwritten
+        UserProfile.objects.filter(user_id=user_id).update(**updates)
+        
+        return updates['gmail_access_token'], expires_at
+    
+    def get_account_access_token(self, account):
+        """Get valid access token for a Gmail SenderAccount, refreshing if necessary"""
+        key = ('sender', account.id)
+        
+        cached = token_cache.get(key)
+        if cached:
+            return cached.access_token
+        
+        if account.gmail_access_token and account.gmail_token_expires_at and timezone.now() < account.gmail_token_expires_at:
+            token_cache.put(key, account.gmail_access_token, account.gmail_token_expires_at)
+            token_cache.start_refresher(self._refresh_cached_token)
+            return account.gmail_access_token
+        
+        if not account.gmail_refresh_token:
+            raise ValueError(f"No refresh token available for {account.email}")
+        
+        try:
+            entry = token_cache.refresh(key, lambda: self._refresh_account_token(account.id))
+        except Exception as e:
+            token_cache.invalidate(key)
+            raise ValueError(f"Failed to refresh token for {account.email}: {str(e)}")
+        
+        token_cache.start_refresher(self._refresh_cached_token)
+        return entry.access_token
+    
+    def _refresh_account_token(self, account_id):
+        """Refresh the token stored on a SenderAccount and persist the new one"""
+        from .models import SenderAccount
+        
+        account = SenderAccount.objects.get(pk=account_id)
+        if not account.gmail_refresh_token:
+            raise ValueError("No refresh token available")
+        
+        token_data = self.refresh_access_token(account.gmail_refresh_token)
+        
+        expires_in = token_data.get('expires_in', 3600)
+        expires_at = timezone.now() + timedelta(seconds=expires_in)
+        
+        updates = {
+            'gmail_access_token': token_data.get('access_token'),
+            'gmail_token_expires_at': expires_at,
+        }
+        if 'refresh_token' in token_data:
+            updates['gmail_refresh_token'] = token_data['refresh_token']
+        
+        SenderAccount.objects.filter(pk=account_id).update(**updates)
+        
+        return updates['gmail_access_token'], expires_at
+    
+    def _refresh_cached_token(self, key, valid_until):
+        """Background refresher callback for tokens about to expire"""
+        if isinstance(key, tuple):
+            # ('sender', account_id) entries belong to pooled sender accounts
+            refresh_fn = lambda: self._refresh_account_token(key[1])
+        else:
+            refresh_fn = lambda: self._refresh_profile_token(key)
+        token_cache.refresh(key, refresh_fn, valid_until=valid_until, touch=False)
+    
+    def save_tokens_to_sender_account(self, user, token_data, user_info):
+        """Create or update a pooled Gmail SenderAccount from OAuth2 tokens"""
+        from .models import SenderAccount
+        
+        email = user_info.get('email')
+        if not email:
+            raise ValueError("Gmail account email not available")
+        
+        expires_in = token_data.get('expires_in', 3600)
+        expires_at = timezone.now() + timedelta(seconds=expires_in)
+        
+        account, created = SenderAccount.objects.get_or_create(
+            user=user,
+            email=email,
+            defaults={'provider': 'gmail_oauth2'}
+        )
+        account.provider = 'gmail_oauth2'
+        account.display_name = account.display_name or user_info.get('name', '')
+        account.gmail_access_token = token_data.get('access_token')
+        # Google only returns a refresh token on first consent; keep the old one otherwise
+        account.gmail_refresh_token = token_data.get('refresh_token') or account.gmail_refresh_token
+        account.gmail_token_expires_at = expires_at
+        account.is_active = True
+        account.health = 'healthy'
+        account.consecutive_failures = 0
+        account.save()
+        
+        token_cache.put(('sender', account.id), account.gmail_access_token, expires_at)
+        return account
     
     def send_email(self, user, subject, body, recipients, html_body=None):
         """Send email using Gmail OAuth2"""
@@ -170,6 +293,32 @@ class GmailOAuth2Service:
         except UserProfile.DoesNotExist:
             from_email = user.email
         
+        return self._send_message(access_token, from_email, subject, body, recipients, html_body, token_key=user.id)
+    
+    def send_email_as(self, account, subject, body, recipients, html_body=None):
+        """Send email through a pooled Gmail SenderAccount"""
+        access_token = self.get_account_access_token(account)
+        return self._send_message(
+            access_token, account.email, subject, body, recipients, html_body,
+            token_key=('sender', account.id), account=account
+        )
+    
+    def expire_token(self, key, account=None):
+        """Forget a token Google rejected so the next send refreshes it instead of reusing it"""
+        from .models import SenderAccount
+        
+        token_cache.invalidate(key)
+        now = timezone.now()
+        if isinstance(key, tuple):
+            SenderAccount.objects.filter(pk=key[1]).update(gmail_token_expires_at=now)
+            if account is not None:
+                account.gmail_token_expires_at = now
+        else:
+            UserProfile.objects.filter(user_id=key).update(gmail_token_expires_at=now)
+    
+    def _send_message(self, access_token, from_email, subject, body, recipients, html_body=None, token_key=None,
+                      account=None):
+        """Build the MIME message and post it to the Gmail API"""
         if not from_email:
             raise ValueError("No email address available for sending")
         
@@ -201,17 +350,23 @@ class GmailOAuth2Service:
             'raw': raw_message
         }
         
-        response = requests.post(
+        # Shared keep-alive session: pooled connections, timeouts, 429/503 retries
+        response = gmail_http.post(
             'https://gmail.googleapis.com/gmail/v1/users/me/messages/send',
             headers=headers,
             data=json.dumps(data)
         )
         
+        if response.status_code == 401 and token_key is not None:
+            # Revoked or expired early: the retry must not resend with the same cached token
+            self.expire_token(token_key, account)
         response.raise_for_status()
         return response.json()
     
     def disconnect_gmail(self, user):
         """Disconnect Gmail and revoke tokens"""
+        token_cache.invalidate(user.id)
+        
         try:
             profile = user.profile
         except UserProfile.DoesNotExist:
@@ -220,7 +375,7 @@ class GmailOAuth2Service:
         if profile.gmail_access_token:
             try:
                 # Revoke token
-                requests.post(self.REVOKE_URL, data={'token': profile.gmail_access_token})
+                gmail_http.post(self.REVOKE_URL, data={'token': profile.gmail_access_token})
             except:
                 pass  # Ignore revocation errors
         
@@ -0,0 +1,133 @@
+"""
+In-process cache for Gmail OAuth2 access tokens
+
+Sends read the access token from memory instead of re-loading the user profile,
+a background thread refreshes tokens a few minutes before they expire, and
+concurrent callers share a single refresh request per token. Only tokens used
+recently are kept warm: idle ones, and ones whose refresh fails (revoked
+grant, deleted sender, disconnected profile), are dropped from the cache.
+"""
+import os
+import time
+import threading
+import logging
+from datetime import timedelta
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class CachedToken:
+    """Access token held in memory together with its expiry time"""
+
+    __slots__ = ('access_token', 'expires_at', 'last_used')
+
+    def __init__(self, access_token, expires_at, last_used=None):
+        self.access_token = access_token
+        self.expires_at = expires_at
+        # time.monotonic() of the last send that read the token
+        self.last_used = time.monotonic() if last_used is None else last_used
+
+    def is_valid_until(self, moment):
+        """Check if the token is still usable at the given moment"""
+        return bool(self.access_token and self.expires_at and moment < self.expires_at)
+
+
+class GmailTokenCache:
+    """Thread-safe token cache with single-flight and proactive refresh"""
+
+    def __init__(self):
+        # Refresh tokens this long before they expire (default 5 minutes)
+        self.refresh_margin = timedelta(seconds=int(os.getenv('GMAIL_TOKEN_REFRESH_MARGIN', '300')))
+        # How often the background refresher scans the cache
+        self.poll_interval = int(os.getenv('GMAIL_TOKEN_REFRESH_INTERVAL', '30'))
+        # Tokens not used for this long are dropped instead of refreshed (default 1 hour)
+        self.idle_timeout = int(os.getenv('GMAIL_TOKEN_IDLE_TIMEOUT', '3600'))
+
+        self._entries = {}
+        self._refresh_locks = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._refresh_callback = None
+
+    def get(self, key):
+        """Return the cached token if it is still valid"""
+        entry = self._entries.get(key)
+        if entry and entry.is_valid_until(timezone.now()):
+            entry.last_used = time.monotonic()
+            return entry
+        return None
+
+    def put(self, key, access_token, expires_at, last_used=None):
+        """Store a token in the cache"""
+        entry = CachedToken(access_token, expires_at, last_used)
+        self._entries[key] = entry
+        return entry
+
+    def invalidate(self, key):
+        """Drop a token from the cache (e.g. after disconnecting Gmail)"""
+        self._entries.pop(key, None)
+
+    def refresh(self, key, refresh_fn, valid_until=None, touch=True):
+        """
+        Refresh a token so that only one thread talks to Google at a time
+
+        Threads that were waiting on the lock get the token the first thread
+        obtained instead of issuing their own refresh request. Background
+        refreshes pass touch=False so they do not count as a use.
+        """
+        valid_until = valid_until or timezone.now()
+
+        with self._lock:
+            key_lock = self._refresh_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            entry = self._entries.get(key)
+            if entry and entry.is_valid_until(valid_until):
+                return entry
+
+            access_token, expires_at = refresh_fn()
+            last_used = entry.last_used if entry and not touch else None
+            return self.put(key, access_token, expires_at, last_used)
+
+    def start_refresher(self, refresh_callback):
+        """Start the background refresher thread once per process"""
+        if self._refresher and self._refresher.is_alive():
+            return
+
+        with self._lock:
+            if self._refresher and self._refresher.is_alive():
+                return
+            self._refresh_callback = refresh_callback
+            self._refresher = threading.Thread(target=self._run_refresher, name='gmail-token-refresher')
+            self._refresher.daemon = True
+            self._refresher.start()
+
+    def _run_refresher(self):
+        """Refresh recently used tokens that are about to expire, forever"""
+        stop = threading.Event()
+        while not stop.wait(self.poll_interval):
+            deadline = timezone.now() + self.refresh_margin
+            idle_since = time.monotonic() - self.idle_timeout
+            expiring = [(key, entry) for key, entry in list(self._entries.items()) if not entry.is_valid_until(deadline)]
+
+            for key, entry in expiring:
+                if entry.last_used < idle_since:
+                    # Nobody sent with it lately; the send path reloads it if it is needed again
+                    self._evict(key, entry)
+                    continue
+                try:
+                    self._refresh_callback(key, deadline)
+                except Exception as e:
+                    # Revoked or deleted credentials do not come back: stop retrying them
+                    self._evict(key, entry)
+                    logger.warning(f"Background Gmail token refresh failed for {key}, dropped from cache: {str(e)}")
+
+    def _evict(self, key, entry):
+        # Only drop the entry we looked at, not a token a send stored in the meantime
+        if self._entries.get(key) is entry:
+            self._entries.pop(key, None)
+
+
+# Shared cache for the whole process
+token_cache = GmailTokenCache()
@@ -0,0 +1,32 @@
+# Management commands
+from django.core.management.base import BaseCommand
+from emails.models import EmailLog
+from emails.recipients import index_recipients
+
+
+class Command(BaseCommand):
+    help = 'Create the normalized recipient rows of email logs that do not have them yet (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Email logs per insert batch')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        logs = (
+            EmailLog.objects.filter(recipient_rows__isnull=True)
+            .order_by('id')
+            .only('id', 'user_id', 'recipients')
+        )
+        indexed = rows = 0
+        batch = []
+        for log in logs.iterator(chunk_size=batch_size):
+            batch.append(log)
+            if len(batch) >= batch_size:
+                rows += index_recipients(batch)
+                indexed += len(batch)
+                batch = []
+        if batch:
+            rows += index_recipients(batch)
+            indexed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {rows} recipients of {indexed} email logs'))
@@ -0,0 +1,27 @@
+# Management commands
+import threading
+from django.core.management.base import BaseCommand
+from emails.campaign_worker import resume_campaigns, run_dispatcher
+from emails.tasks import recover_pending_sends
+
+
+class Command(BaseCommand):
+    help = 'Resume scheduled campaigns that are due and campaigns whose worker stopped (for cron or a dedicated process)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep dispatching every CAMPAIGN_DISPATCH_INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            run_dispatcher()
+            return
+
+        started = resume_campaigns()
+        requeued, interrupted = recover_pending_sends()
+        # Workers run in daemon threads: let them finish (or park) before exiting
+        for thread in threading.enumerate():
+            if thread.name.startswith('campaign-worker-'):
+                thread.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Resumed {started} campaigns, queued {requeued} lost sends again, failed {interrupted} interrupted sends'
+        ))
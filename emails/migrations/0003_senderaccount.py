@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0002_alter_emaillog_options_emaillog_error_message_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SenderAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('gmail_oauth2', 'Gmail OAuth2'), ('smtp', 'SMTP')], max_length=20)),
+                ('email', models.EmailField(max_length=254)),
+                ('display_name', models.CharField(blank=True, max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('gmail_access_token', models.TextField(blank=True, null=True)),
+                ('gmail_refresh_token', models.TextField(blank=True, null=True)),
+                ('gmail_token_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('smtp_host', models.CharField(blank=True, max_length=255)),
+                ('smtp_port', models.IntegerField(default=587)),
+                ('smtp_username', models.CharField(blank=True, max_length=255)),
+                ('smtp_password', models.CharField(blank=True, max_length=255)),
+                ('smtp_use_tls', models.BooleanField(default=True)),
+                ('daily_limit', models.IntegerField(default=500)),
+                ('sent_today', models.IntegerField(default=0)),
+                ('sent_today_date', models.DateField(blank=True, null=True)),
+                ('health', models.CharField(choices=[('healthy', 'Healthy'), ('throttled', 'Throttled'), ('failing', 'Failing')], default='healthy', max_length=20)),
+                ('throttled_until', models.DateTimeField(blank=True, null=True)),
+                ('consecutive_failures', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sender_accounts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'unique_together': {('user', 'email')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0003_senderaccount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkemailcampaign',
+            name='eta',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='senderaccount',
+            name='per_minute_limit',
+            field=models.IntegerField(default=20),
+        ),
+        migrations.AddField(
+            model_name='senderaccount',
+            name='per_second_limit',
+            field=models.FloatField(default=1.0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0005_deadletter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignDraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField()),
+                ('recipient', models.EmailField(blank=True, max_length=254)),
+                ('recipient_data', models.JSONField(blank=True, default=dict)),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed'), ('sent', 'Sent')], default='pending', max_length=20)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='drafts', to='emails.bulkemailcampaign')),
+            ],
+            options={
+                'ordering': ['position'],
+                'unique_together': {('campaign', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_contacted(apps, schema_editor):
+    """Index the recipients of every email already sent"""
+    EmailLog = apps.get_model('emails', 'EmailLog')
+    ContactedRecipient = apps.get_model('emails', 'ContactedRecipient')
+
+    batch, seen = [], set()
+    rows = EmailLog.objects.filter(status='sent').order_by('id').values_list('user_id', 'recipients')
+    for user_id, recipients in rows.iterator(chunk_size=2000):
+        for email in (recipients or '').split(','):
+            key = (user_id, email.strip().lower())
+            if key[1] and key not in seen:
+                seen.add(key)
+                batch.append(ContactedRecipient(user_id=user_id, email=key[1]))
+        if len(batch) >= 2000:
+            ContactedRecipient.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ContactedRecipient.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0006_campaigndraft'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactedRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(max_length=254)),
+                ('place_id', models.CharField(blank=True, default='', max_length=255)),
+                ('first_contacted_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contacted_recipients', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'place_id'], name='emails_cont_user_id_93f82a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'email'), name='unique_contacted_recipient')],
+            },
+        ),
+        migrations.RunPython(backfill_contacted, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0007_contactedrecipient'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailLogRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=254)),
+                ('domain', models.CharField(max_length=253)),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipient_rows', to='emails.emaillog')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='email_recipients', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'address'], name='emails_emai_user_id_85bbd3_idx'), models.Index(fields=['user', 'domain'], name='emails_emai_user_id_ba1727_idx'), models.Index(fields=['address'], name='emails_emai_address_3a1f7a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('log', 'address'), name='unique_email_log_recipient')],
+            },
+        ),
+    ]
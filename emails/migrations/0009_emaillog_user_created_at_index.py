@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0008_emaillogrecipient'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emaillog',
+            index=models.Index(fields=['user', 'created_at'], name='emails_emai_user_id_d52e8c_idx'),
+        ),
+    ]
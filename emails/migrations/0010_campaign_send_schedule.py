@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_bulk_sends(apps, schema_editor):
+    """Campaign rows created by async bulk sends (recipients carry template variables)"""
+    BulkEmailCampaign = apps.get_model('emails', 'BulkEmailCampaign')
+    bulk_ids = [
+        campaign_id
+        for campaign_id, recipients in BulkEmailCampaign.objects.values_list('id', 'recipients').iterator()
+        if recipients and isinstance(recipients[0], dict) and 'variables' in recipients[0]
+    ]
+    BulkEmailCampaign.objects.filter(id__in=bulk_ids).update(kind='bulk')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0009_emaillog_user_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkemailcampaign',
+            name='kind',
+            field=models.CharField(choices=[('outreach', 'Outreach'), ('bulk', 'Bulk send')], default='outreach', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='bulkemailcampaign',
+            name='resume_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bulkemailcampaign',
+            name='worker_heartbeat',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bulkemailcampaign',
+            name='worker_token',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='campaigndraft',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='campaigndraft',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deadletter',
+            name='draft',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dead_letters', to='emails.campaigndraft'),
+        ),
+        migrations.AlterField(
+            model_name='campaigndraft',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed'), ('sent', 'Sent'), ('dead', 'Dead-lettered')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='campaigndraft',
+            index=models.Index(fields=['campaign', 'status', 'due_at'], name='emails_camp_campaig_9db774_idx'),
+        ),
+        migrations.RunPython(mark_bulk_sends, migrations.RunPython.noop),
+    ]
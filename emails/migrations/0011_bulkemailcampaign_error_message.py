@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0010_campaign_send_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulkemailcampaign',
+            name='error_message',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def backfill_recipients(apps, schema_editor):
+    """Index the recipients of every email logged before EmailLogRecipient existed"""
+    EmailLog = apps.get_model('emails', 'EmailLog')
+    EmailLogRecipient = apps.get_model('emails', 'EmailLogRecipient')
+
+    batch = []
+    rows = EmailLog.objects.filter(recipient_rows__isnull=True).order_by('id').values_list('id', 'user_id', 'recipients')
+    for log_id, user_id, recipients in rows.iterator(chunk_size=2000):
+        addresses = dict.fromkeys(email.strip().lower() for email in (recipients or '').split(','))
+        for address in addresses:
+            if address:
+                batch.append(EmailLogRecipient(
+                    log_id=log_id, user_id=user_id, address=address, domain=address.rpartition('@')[2]
+                ))
+        if len(batch) >= 2000:
+            EmailLogRecipient.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    EmailLogRecipient.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0011_bulkemailcampaign_error_message'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_recipients, migrations.RunPython.noop),
+    ]
@@ -7,11 +7,14 @@ class EmailLog(models.Model):
     body = models.TextField()
     recipients = models.TextField(help_text='Comma-separated emails')  # Keep original format
     created_at = models.DateTimeField(auto_now_add=True)  # Keep original field name
-    status = models.CharField(max_length=20, default='sent')  # sent, failed, pending
+    status = models.CharField(max_length=20, default='sent')  # sent, failed, pending, sending
     error_message = models.TextField(blank=True, null=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
 
     def __str__(self):
         return f"{self.subject} to {len(self.recipients)} recipients"
@@ -33,19 +36,45 @@ class EmailTemplate(models.Model):
     def __str__(self):
         return self.name
 
+    def clean(self):
+        """Reject templates whose {{placeholders}} do not compile"""
+        from django.core.exceptions import ValidationError
+        from .templating import compile_template, TemplateSyntaxError
+
+        errors = {}
+        for field in ('subject', 'body'):
+            try:
+                compile_template(getattr(self, field))
+            except TemplateSyntaxError as e:
+                errors[field] = str(e)
+        if errors:
+            raise ValidationError(errors)
+
 class BulkEmailCampaign(models.Model):
+    KIND_CHOICES = [
+        ('outreach', 'Outreach'),  # Drafts sent by CampaignWorker
+        ('bulk', 'Bulk send'),     # Tracks an async /api/emails/send/bulk/ request
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='outreach')
     name = models.CharField(max_length=100)
     template = models.ForeignKey(EmailTemplate, on_delete=models.CASCADE, null=True, blank=True)
     subject = models.CharField(max_length=255)
     body = models.TextField()
     recipients = models.JSONField()  # List of business data
-    status = models.CharField(max_length=20, default='draft')  # draft, sending, completed, failed
+    status = models.CharField(max_length=20, default='draft')  # draft, preparing, prepared, sending, scheduled, completed, failed
+    error_message = models.TextField(blank=True, null=True)  # Why the campaign failed
     sent_count = models.IntegerField(default=0)
     total_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    eta = models.DateTimeField(null=True, blank=True)  # Projected completion given sender rate limits
+    resume_at = models.DateTimeField(null=True, blank=True)  # When a 'scheduled' campaign has sends due again
+    # Lease of the worker sending the campaign; a stale heartbeat means the worker died and may be replaced
+    worker_token = models.CharField(max_length=32, blank=True, default='')
+    worker_heartbeat = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
@@ -66,4 +95,163 @@ class EmailAnalytics(models.Model):
         ordering = ['-date']
 
     def __str__(self):
-        return f"{self.user.username} - {self.date}: {self.emails_sent} emails"
\ No newline at end of file
+        return f"{self.user.username} - {self.date}: {self.emails_sent} emails"
+
+class SenderAccount(models.Model):
+    """Additional mailbox (Gmail OAuth2 or SMTP) a user can send campaigns through"""
+
+    PROVIDER_CHOICES = [
+        ('gmail_oauth2', 'Gmail OAuth2'),
+        ('smtp', 'SMTP'),
+    ]
+
+    HEALTH_CHOICES = [
+        ('healthy', 'Healthy'),
+        ('throttled', 'Throttled'),
+        ('failing', 'Failing'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sender_accounts')
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES)
+    email = models.EmailField()
+    display_name = models.CharField(max_length=100, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    # Gmail OAuth2 credentials
+    gmail_access_token = models.TextField(blank=True, null=True)
+    gmail_refresh_token = models.TextField(blank=True, null=True)
+    gmail_token_expires_at = models.DateTimeField(blank=True, null=True)
+
+    # SMTP credentials
+    smtp_host = models.CharField(max_length=255, blank=True)
+    smtp_port = models.IntegerField(default=587)
+    smtp_username = models.CharField(max_length=255, blank=True)
+    smtp_password = models.CharField(max_length=255, blank=True)
+    smtp_use_tls = models.BooleanField(default=True)
+
+    # Rate budget
+    per_second_limit = models.FloatField(default=1.0)
+    per_minute_limit = models.IntegerField(default=20)
+    daily_limit = models.IntegerField(default=500)
+    sent_today = models.IntegerField(default=0)
+    sent_today_date = models.DateField(null=True, blank=True)
+
+    # Health state
+    health = models.CharField(max_length=20, choices=HEALTH_CHOICES, default='healthy')
+    throttled_until = models.DateTimeField(null=True, blank=True)
+    consecutive_failures = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        unique_together = ['user', 'email']
+
+    def __str__(self):
+        return f"{self.email} ({self.get_provider_display()}, {self.health})"
+
+
+class DeadLetter(models.Model):
+    """Recipient that could not be delivered after all retries (or failed permanently)"""
+
+    FAILURE_CLASS_CHOICES = [
+        ('transient', 'Transient'),
+        ('throttled', 'Throttled'),
+        ('permanent', 'Permanent'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    campaign = models.ForeignKey(BulkEmailCampaign, on_delete=models.CASCADE, null=True, blank=True, related_name='dead_letters')
+    draft = models.ForeignKey('CampaignDraft', on_delete=models.SET_NULL, null=True, blank=True, related_name='dead_letters')
+    recipient = models.EmailField()
+    recipient_data = models.JSONField(default=dict, blank=True)  # Business data from the campaign
+    subject = models.CharField(max_length=255)  # Stored draft, reused on requeue
+    body = models.TextField()
+    attempts = models.IntegerField(default=0)
+    failure_class = models.CharField(max_length=20, choices=FAILURE_CLASS_CHOICES)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    requeued_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.recipient} ({self.failure_class}, {self.attempts} attempts)"
+
+class CampaignDraft(models.Model):
+    """Personalized email generated for one campaign recipient ahead of sending"""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead-lettered'),
+    ]
+
+    campaign = models.ForeignKey(BulkEmailCampaign, on_delete=models.CASCADE, related_name='drafts')
+    position = models.IntegerField()  # Index in campaign.recipients
+    recipient = models.EmailField(blank=True)
+    recipient_data = models.JSONField(default=dict, blank=True)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error_message = models.TextField(blank=True, null=True)
+    due_at = models.DateTimeField(null=True, blank=True)  # Earliest send time (carry-over or retry backoff)
+    attempts = models.IntegerField(default=0)  # Failed send attempts so far
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['position']
+        unique_together = ['campaign', 'position']
+        indexes = [
+            models.Index(fields=['campaign', 'status', 'due_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} ({self.status})"
+
+
+class ContactedRecipient(models.Model):
+    """Address a user has successfully emailed (normalized), with its Places id when known"""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='contacted_recipients')
+    email = models.CharField(max_length=254)  # Lowercased, see emails.contacted.normalize_email
+    place_id = models.CharField(max_length=255, blank=True, default='')
+    first_contacted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'email'], name='unique_contacted_recipient'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'place_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.email} ({self.user})"
+
+class EmailLogRecipient(models.Model):
+    """One normalized recipient address of an EmailLog, for indexed recipient queries"""
+
+    log = models.ForeignKey(EmailLog, on_delete=models.CASCADE, related_name='recipient_rows')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='email_recipients')  # Copied from log
+    address = models.CharField(max_length=254)  # Lowercased, see emails.contacted.normalize_email
+    domain = models.CharField(max_length=253)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['log', 'address'], name='unique_email_log_recipient'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'address']),
+            models.Index(fields=['user', 'domain']),
+            models.Index(fields=['address']),
+        ]
+
+    def __str__(self):
+        return self.address
@@ -24,7 +24,11 @@ def gmail_auth_url(request):
     """Get Gmail OAuth2 authorization URL"""
     try:
         oauth_service = GmailOAuth2Service()
-        state = f"user_{request.user.id}"
+        # ?purpose=sender connects an additional mailbox to the user's sender pool
+        if request.query_params.get('purpose') == 'sender':
+            state = f"sender_{request.user.id}"
+        else:
+            state = f"user_{request.user.id}"
         auth_url = oauth_service.get_authorization_url(state=state)
         
         return Response({
@@ -70,7 +74,7 @@ def gmail_callback(request):
             )
         
         # Extract user ID from state parameter
-        if not state or not state.startswith('user_'):
+        if not state or not (state.startswith('user_') or state.startswith('sender_')):
             return Response(
                 {'error': 'Invalid state parameter'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -99,14 +103,20 @@ def gmail_callback(request):
         user_info = oauth_service.get_user_info(token_data['access_token'])
         logger.info(f"User info retrieved: {user_info.get('email')}")
         
-        # Save tokens to user profile
-        logger.info("Saving tokens to user profile...")
-        profile = oauth_service.save_tokens_to_profile(
-            user, 
-            token_data, 
-            user_info
-        )
-        logger.info(f"Tokens saved successfully. Profile connected: {profile.gmail_connected}")
+        if state.startswith('sender_'):
+            # Add mailbox to the user's sender pool
+            logger.info("Saving tokens to sender account...")
+            account = oauth_service.save_tokens_to_sender_account(user, token_data, user_info)
+            logger.info(f"Sender account saved: {account.email}")
+        else:
+            # Save tokens to user profile
+            logger.info("Saving tokens to user profile...")
+            profile = oauth_service.save_tokens_to_profile(
+                user, 
+                token_data, 
+                user_info
+            )
+            logger.info(f"Tokens saved successfully. Profile connected: {profile.gmail_connected}")
         
         # Return HTML response that can close the popup window
         html_response = f"""
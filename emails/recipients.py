@@ -0,0 +1,32 @@
+"""
+Normalized recipients of logged emails
+
+EmailLog.recipients keeps the original comma-separated string; every log also
+gets one EmailLogRecipient row per distinct (lowercased) address, with its
+domain and the owning user copied in. Questions such as "how many different
+people did this user email?" or "which emails went to X?" then run on indexed
+columns (COUNT(DISTINCT address), address = X) instead of loading and
+splitting every recipients string.
+"""
+from .models import EmailLogRecipient
+from .contacted import normalize_email
+
+
+def split_recipients(recipients):
+    """Distinct normalized addresses of a comma-separated recipients string, in order"""
+    addresses = (normalize_email(email) for email in (recipients or '').split(','))
+    return list(dict.fromkeys(address for address in addresses if address))
+
+
+def recipient_rows(log):
+    return [
+        EmailLogRecipient(log_id=log.pk, user_id=log.user_id, address=address, domain=address.rpartition('@')[2])
+        for address in split_recipients(log.recipients)
+    ]
+
+
+def index_recipients(logs):
+    """Create the recipient rows of the given logs (existing rows are kept); returns the rows built"""
+    rows = [row for log in logs for row in recipient_rows(log)]
+    EmailLogRecipient.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
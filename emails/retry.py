@@ -0,0 +1,117 @@
+"""
+Failure classification and retry policy for outgoing email
+
+Failures are sorted into three classes:
+- throttled: the provider rejected the message because of rate limits
+- transient: network/server trouble, the message may succeed later
+- permanent: bad address, rejected content, missing credentials
+Throttled and transient failures are retried with exponential backoff;
+permanent ones (and anything past the attempt limit) go to the dead-letter table.
+"""
+import os
+import random
+import smtplib
+import socket
+import requests
+import urllib3
+
+THROTTLED = 'throttled'
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+# Seconds a throttled sender rests when the provider gives no Retry-After
+THROTTLE_COOLDOWN = int(os.getenv('SENDER_THROTTLE_COOLDOWN', '300'))
+
+
+def get_throttle_delay(exc):
+    """Return seconds to back off if the error is a provider throttle, otherwise None"""
+    response = getattr(exc, 'response', None)
+    if response is not None:
+        text = (getattr(response, 'text', '') or '').lower()
+        if response.status_code in (429, 503) or (response.status_code == 403 and 'limit exceeded' in text):
+            retry_after = response.headers.get('Retry-After', '')
+            return int(retry_after) if retry_after.isdigit() else THROTTLE_COOLDOWN
+
+    # 421/450/451/452: server busy or sending limits reached, try again later
+    if isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code in (421, 450, 451, 452):
+        return THROTTLE_COOLDOWN
+
+    return None
+
+
+def classify_failure(exc):
+    """Return THROTTLED, TRANSIENT or PERMANENT for a send exception"""
+    if get_throttle_delay(exc) is not None:
+        return THROTTLED
+
+    response = getattr(exc, 'response', None)
+    if response is not None:
+        # 401: token revoked or expired mid-flight; the send path expired it, so the retry refreshes it
+        if response.status_code >= 500 or response.status_code in (401, 408):
+            return TRANSIENT
+        return PERMANENT
+
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return TRANSIENT
+
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return PERMANENT
+
+    if isinstance(exc, smtplib.SMTPResponseException):
+        # 4xx replies are temporary by definition, 5xx are final
+        return TRANSIENT if 400 <= exc.smtp_code < 500 else PERMANENT
+
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.timeout, ConnectionError, TimeoutError)):
+        return TRANSIENT
+
+    return PERMANENT
+
+
+def proves_not_sent(exc):
+    """
+    Whether the failure shows the provider never accepted the message
+
+    True for errors raised before anything went out (missing or refused
+    credentials, no connection) and for requests the provider answered with
+    a 4xx rejection. Read timeouts, dropped connections, 5xx replies and
+    anything unknown may come after the message was accepted, so sending it
+    another way could deliver it twice.
+    """
+    if isinstance(exc, requests.exceptions.JSONDecodeError):
+        # The provider answered 2xx: the message is out
+        return False
+    if isinstance(exc, ValueError) and not isinstance(exc, requests.RequestException):
+        # Token/profile checks raise ValueError before the request is made
+        return True
+
+    response = getattr(exc, 'response', None)
+    if response is not None:
+        return 400 <= response.status_code < 500
+
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.ConnectionError):
+        reason = getattr(exc.args[0] if exc.args else None, 'reason', None)
+        return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+    return isinstance(exc, (smtplib.SMTPAuthenticationError, smtplib.SMTPConnectError))
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter and a maximum number of attempts"""
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None):
+        self.max_attempts = max_attempts or int(os.getenv('EMAIL_RETRY_MAX_ATTEMPTS', '5'))
+        self.base_delay = base_delay or float(os.getenv('EMAIL_RETRY_BASE_DELAY', '30'))
+        self.max_delay = max_delay or float(os.getenv('EMAIL_RETRY_MAX_DELAY', '3600'))
+
+    def should_retry(self, failure_class, attempts):
+        return failure_class != PERMANENT and attempts < self.max_attempts
+
+    def next_delay(self, attempts, failure_class, exc=None):
+        """Seconds to wait before attempt number `attempts + 1`"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempts - 1))))
+        if failure_class == THROTTLED and exc is not None:
+            # Never come back before the provider said we could
+            delay = max(delay, get_throttle_delay(exc) or 0)
+        return delay
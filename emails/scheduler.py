@@ -0,0 +1,154 @@
+"""
+Send pacing and scheduling for bulk campaigns
+
+Token buckets pace each sender under its per-second and per-minute limits,
+a heap keeps pending sends ordered by the time they become due (so work that
+runs out of daily budget carries over to the next window instead of failing),
+and estimate_eta() projects when a campaign will finish.
+"""
+import heapq
+import itertools
+import time
+from datetime import timedelta
+from django.utils import timezone
+
+
+class TokenBucket:
+    """Classic token bucket; reservations may go negative to queue future sends"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)          # tokens per second
+        self.capacity = float(capacity)  # maximum burst
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now=None):
+        """Seconds until one token is available, without taking it"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def available(self, now=None):
+        """Whole tokens that can be taken right now without waiting"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return max(0, int(self.tokens))
+
+    def reserve(self, now=None):
+        """Take one token and return how long to wait before using it"""
+        wait = self.delay(now)
+        self.tokens -= 1
+        return wait
+
+
+class SenderRateLimiter:
+    """Per-second and per-minute pacing for one sender"""
+
+    def __init__(self, per_second, per_minute):
+        self.per_second = per_second
+        self.per_minute = per_minute
+        self.buckets = []
+        if per_second:
+            self.buckets.append(TokenBucket(per_second, max(per_second, 1)))
+        if per_minute:
+            self.buckets.append(TokenBucket(per_minute / 60.0, per_minute))
+
+    @property
+    def sustained_rate(self):
+        """Long-run sends per second this sender can keep up (None means unlimited)"""
+        rates = [bucket.rate for bucket in self.buckets]
+        return min(rates) if rates else None
+
+    def delay(self, now=None):
+        now = time.monotonic() if now is None else now
+        return max([bucket.delay(now) for bucket in self.buckets] or [0.0])
+
+    def reserve(self, now=None):
+        now = time.monotonic() if now is None else now
+        return max([bucket.reserve(now) for bucket in self.buckets] or [0.0])
+
+    def available(self, now=None):
+        """Sends possible right now without a pacing wait (None means unlimited)"""
+        now = time.monotonic() if now is None else now
+        counts = [bucket.available(now) for bucket in self.buckets]
+        return min(counts) if counts else None
+
+
+class SendScheduler:
+    """Min-heap of pending sends keyed by due time (epoch seconds)"""
+
+    def __init__(self, items=None, due_at=None):
+        self._counter = itertools.count()
+        due_at = time.time() if due_at is None else due_at
+        # heapify is O(n), so loading millions of recipients stays cheap
+        self._heap = [(due_at, next(self._counter), item) for item in (items or [])]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, item, due_at=None):
+        due_at = time.time() if due_at is None else due_at
+        heapq.heappush(self._heap, (due_at, next(self._counter), item))
+
+    def next_due_at(self):
+        return self._heap[0][0] if self._heap else None
+
+    def pop(self):
+        """Return (item, seconds until it is due)"""
+        due_at, _, item = heapq.heappop(self._heap)
+        return item, max(due_at - time.time(), 0.0)
+
+
+def start_of_next_day(now):
+    return (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def estimate_eta(pending, senders, now=None):
+    """
+    Project when `pending` sends will be done given each sender's pacing and daily budget
+
+    Returns None when the senders have no capacity at all.
+    """
+    now = now or timezone.now()
+    if pending <= 0:
+        return now
+
+    rate = 0.0
+    today_budget = 0
+    daily_budget = 0
+    unlimited = False
+    for sender in senders:
+        sender_rate = sender.limiter.sustained_rate
+        if sender_rate is None or sender.daily_limit is None:
+            unlimited = True
+        rate += sender_rate or 0
+        remaining = sender.remaining_budget()
+        today_budget += remaining if remaining is not None else pending
+        daily_budget += sender.daily_limit if sender.daily_limit is not None else pending
+
+    if rate == 0:
+        # No pacing configured: the only limit is the daily budget
+        if unlimited or pending <= today_budget:
+            return now
+        rate = float('inf')
+
+    if pending <= today_budget:
+        return now + timedelta(seconds=pending / rate)
+
+    if daily_budget <= 0:
+        return None
+
+    # Work beyond today's budget carries over into later daily windows
+    carried = pending - today_budget
+    full_days, remainder = divmod(carried, daily_budget)
+    if remainder == 0:
+        full_days, remainder = full_days - 1, daily_budget
+    window_start = start_of_next_day(now) + timedelta(days=full_days)
+    return window_start + timedelta(seconds=remainder / rate)
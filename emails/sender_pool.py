@@ -0,0 +1,445 @@
+"""
+Sender pool for bulk campaigns
+
+Spreads a campaign's recipients across every mailbox the user has connected
+(the profile Gmail connection plus pooled SenderAccounts). Each sender has its
+own daily budget and health state, and load moves away from senders that are
+throttled or failing. Pacing, budget and health live in one SenderState per
+mailbox for the whole process, so campaigns and bulk sends running at the same
+time share a mailbox's limits instead of each getting the full rate; the daily
+count is also stored in the database so it survives new pools and restarts.
+"""
+import os
+import smtplib
+import threading
+import time
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+from accounts.models import UserProfile
+from .gmail_oauth2 import GmailOAuth2Service
+from .models import SenderAccount
+from .retry import get_throttle_delay, THROTTLE_COOLDOWN
+from .scheduler import SenderRateLimiter, estimate_eta, start_of_next_day
+
+logger = logging.getLogger(__name__)
+
+# Consecutive hard failures before a sender is taken out of rotation
+FAILURE_THRESHOLD = int(os.getenv('SENDER_FAILURE_THRESHOLD', '3'))
+FAILURE_COOLDOWN = int(os.getenv('SENDER_FAILURE_COOLDOWN', '900'))
+# Budget and pacing for the Gmail connection stored on the user profile
+PROFILE_DAILY_LIMIT = int(os.getenv('GMAIL_DAILY_LIMIT', '500'))
+PROFILE_PER_SECOND_LIMIT = float(os.getenv('GMAIL_PER_SECOND_LIMIT', '1'))
+PROFILE_PER_MINUTE_LIMIT = int(os.getenv('GMAIL_PER_MINUTE_LIMIT', '20'))
+# Pacing for the project email backend (0 means unlimited)
+DEFAULT_PER_SECOND_LIMIT = float(os.getenv('EMAIL_PER_SECOND_LIMIT', '0'))
+DEFAULT_PER_MINUTE_LIMIT = int(os.getenv('EMAIL_PER_MINUTE_LIMIT', '0'))
+
+
+class NoSenderAvailable(Exception):
+    """Raised when every sender is throttled, failing or out of daily budget"""
+
+    def __init__(self, message='No healthy sender available', retry_at=None):
+        super().__init__(message)
+        self.retry_at = retry_at
+
+
+class SenderState:
+    """Pacing, daily budget and health of one mailbox, shared by every pool in the process"""
+
+    __slots__ = ('limiter', 'sent_today', 'day', 'in_flight', 'health', 'unavailable_until', 'consecutive_failures')
+
+    def __init__(self, limiter, day):
+        self.limiter = limiter
+        self.sent_today = 0
+        self.day = day
+        self.in_flight = 0
+        self.health = 'healthy'
+        self.unavailable_until = None
+        self.consecutive_failures = 0
+
+
+# Mailbox key -> SenderState
+_states = {}
+# Guards the registry and every change to a SenderState
+_state_lock = threading.Lock()
+
+
+def _shared(name):
+    """Sender attribute stored on its shared SenderState"""
+    return property(lambda self: getattr(self.state, name), lambda self, value: setattr(self.state, name, value))
+
+
+class Sender:
+    """One mailbox in the pool with its budget and health"""
+
+    provider = None
+
+    limiter = _shared('limiter')
+    sent_today = _shared('sent_today')
+    day = _shared('day')
+    in_flight = _shared('in_flight')
+    health = _shared('health')
+    unavailable_until = _shared('unavailable_until')
+    consecutive_failures = _shared('consecutive_failures')
+
+    def __init__(self, key, state_key, email, daily_limit=None, sent_today=0, sent_today_date=None, account=None,
+                 per_second=None, per_minute=None):
+        self.key = key
+        self.email = email
+        self.daily_limit = daily_limit
+        self.account = account
+
+        today = timezone.now().date()
+        stored_sent = sent_today if sent_today_date == today else 0
+        with _state_lock:
+            state = _states.get(state_key)
+            if state is None:
+                state = _states[state_key] = SenderState(SenderRateLimiter(per_second, per_minute), today)
+                if account is not None:
+                    state.health = account.health
+                    state.unavailable_until = account.throttled_until
+                    state.consecutive_failures = account.consecutive_failures
+            elif (state.limiter.per_second, state.limiter.per_minute) != (per_second, per_minute):
+                # Limits were edited since the state was created
+                state.limiter = SenderRateLimiter(per_second, per_minute)
+
+            if state.day != today:
+                state.day = today
+                state.sent_today = 0
+            # Another process may have sent through this mailbox too
+            state.sent_today = max(state.sent_today, stored_sent)
+        self.state = state
+
+    def remaining_budget(self):
+        """Sends left today (None means unlimited)"""
+        today = timezone.now().date()
+        if today != self.day:
+            # New day, new budget
+            self.day = today
+            self.sent_today = 0
+        if self.daily_limit is None:
+            return None
+        return max(self.daily_limit - self.sent_today - self.in_flight, 0)
+
+    def is_available(self, now):
+        if self.unavailable_until and now < self.unavailable_until:
+            return False
+        remaining = self.remaining_budget()
+        return remaining is None or remaining > 0
+
+    def load_score(self):
+        """Fraction of today's budget still free; higher gets picked first"""
+        remaining = self.remaining_budget()
+        if remaining is None:
+            return 1.0
+        return remaining / max(self.daily_limit, 1)
+
+    def send(self, subject, body, recipients):
+        raise NotImplementedError
+
+    def record_send(self):
+        """Persist one successful send (daily count, health)"""
+        if self.account is None:
+            return
+        SenderAccount.objects.filter(pk=self.account.pk, sent_today_date=self.day).update(
+            sent_today=F('sent_today') + 1, health='healthy', consecutive_failures=0, throttled_until=None
+        )
+        SenderAccount.objects.filter(pk=self.account.pk).exclude(sent_today_date=self.day).update(
+            sent_today=1, sent_today_date=self.day, health='healthy', consecutive_failures=0, throttled_until=None
+        )
+
+    def close(self):
+        pass
+
+    def as_dict(self):
+        return {
+            'key': str(self.key),
+            'email': self.email,
+            'provider': self.provider,
+            'health': self.health,
+            'daily_limit': self.daily_limit,
+            'sent_today': self.sent_today,
+            'unavailable_until': self.unavailable_until,
+        }
+
+
+class ProfileGmailSender(Sender):
+    """The Gmail connection stored on the user's profile"""
+
+    provider = 'gmail_oauth2'
+
+    def __init__(self, user, oauth_service):
+        profile = user.profile
+        super().__init__(
+            'profile', ('profile', user.id), profile.gmail_email or user.email, daily_limit=PROFILE_DAILY_LIMIT,
+            sent_today=profile.gmail_sent_today, sent_today_date=profile.gmail_sent_today_date,
+            per_second=PROFILE_PER_SECOND_LIMIT, per_minute=PROFILE_PER_MINUTE_LIMIT
+        )
+        self.user = user
+        self.oauth_service = oauth_service
+
+    def send(self, subject, body, recipients):
+        return self.oauth_service.send_email(user=self.user, subject=subject, body=body, recipients=recipients)
+
+    def record_send(self):
+        UserProfile.objects.filter(user_id=self.user.id, gmail_sent_today_date=self.day).update(
+            gmail_sent_today=F('gmail_sent_today') + 1
+        )
+        UserProfile.objects.filter(user_id=self.user.id).exclude(gmail_sent_today_date=self.day).update(
+            gmail_sent_today=1, gmail_sent_today_date=self.day
+        )
+
+
+class AccountGmailSender(Sender):
+    """A pooled Gmail mailbox connected through OAuth2"""
+
+    provider = 'gmail_oauth2'
+
+    def __init__(self, account, oauth_service):
+        super().__init__(
+            account.id, ('account', account.id), account.email, account.daily_limit,
+            account.sent_today, account.sent_today_date, account,
+            per_second=account.per_second_limit, per_minute=account.per_minute_limit
+        )
+        self.oauth_service = oauth_service
+
+    def send(self, subject, body, recipients):
+        return self.oauth_service.send_email_as(self.account, subject=subject, body=body, recipients=recipients)
+
+
+class SmtpSender(Sender):
+    """A pooled SMTP identity; keeps one authenticated connection open per campaign"""
+
+    provider = 'smtp'
+
+    def __init__(self, account):
+        super().__init__(
+            account.id, ('account', account.id), account.email, account.daily_limit,
+            account.sent_today, account.sent_today_date, account,
+            per_second=account.per_second_limit, per_minute=account.per_minute_limit
+        )
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _get_connection(self):
+        if self._connection is None:
+            self._connection = get_connection(
+                backend='django.core.mail.backends.smtp.EmailBackend',
+                host=self.account.smtp_host,
+                port=self.account.smtp_port,
+                username=self.account.smtp_username or self.account.email,
+                password=self.account.smtp_password,
+                use_tls=self.account.smtp_use_tls,
+                fail_silently=False,
+            )
+            self._connection.open()
+        return self._connection
+
+    def send(self, subject, body, recipients):
+        # An SMTP connection can only carry one transaction at a time
+        with self._lock:
+            message = EmailMessage(subject, body, self.email, recipients, connection=self._get_connection())
+            try:
+                return message.send()
+            except smtplib.SMTPServerDisconnected:
+                # Connection went stale between sends; reconnect once
+                self._connection = None
+                message.connection = self._get_connection()
+                return message.send()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class DefaultSender(Sender):
+    """Project-wide email backend, used when the user has no mailbox connected"""
+
+    provider = 'default'
+
+    def __init__(self):
+        # The project mailbox is paced across every user
+        super().__init__(
+            'default', ('default',), settings.EMAIL_HOST_USER or None,
+            per_second=DEFAULT_PER_SECOND_LIMIT, per_minute=DEFAULT_PER_MINUTE_LIMIT
+        )
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def send(self, subject, body, recipients):
+        # Reuse one backend connection for the whole campaign instead of one per message
+        with self._lock:
+            if self._connection is None:
+                self._connection = get_connection(fail_silently=False)
+            message = EmailMessage(subject, body, settings.EMAIL_HOST_USER or None, recipients, connection=self._connection)
+            return message.send()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class SenderPool:
+    """Distributes sends across a user's healthy senders"""
+
+    def __init__(self, user):
+        self.user = user
+        self.oauth_service = GmailOAuth2Service()
+        self.senders = self._load_senders()
+
+    def _load_senders(self):
+        senders = []
+
+        if self.oauth_service.has_gmail_connection(self.user):
+            senders.append(ProfileGmailSender(self.user, self.oauth_service))
+
+        for account in SenderAccount.objects.filter(user=self.user, is_active=True):
+            if account.provider == 'gmail_oauth2':
+                senders.append(AccountGmailSender(account, self.oauth_service))
+            elif account.provider == 'smtp':
+                senders.append(SmtpSender(account))
+
+        if not senders:
+            senders.append(DefaultSender())
+
+        return senders
+
+    def acquire(self):
+        """
+        Reserve the sender that can send soonest
+
+        Returns (sender, seconds to wait) so the caller paces itself under the
+        sender's per-second and per-minute limits.
+        """
+        with _state_lock:
+            now = timezone.now()
+            available = [s for s in self.senders if s.is_available(now)]
+            if not available:
+                raise NoSenderAvailable(retry_at=self.next_available_at())
+
+            clock = time.monotonic()
+            sender = min(available, key=lambda s: (s.limiter.delay(clock), -s.load_score()))
+            sender.in_flight += 1
+            return sender, sender.limiter.reserve(clock)
+
+    def ready_now(self):
+        """Sends the pool can make right now without any pacing wait (None means unlimited)"""
+        with _state_lock:
+            now = timezone.now()
+            clock = time.monotonic()
+            total = 0
+            for sender in self.senders:
+                if not sender.is_available(now):
+                    continue
+                counts = [c for c in (sender.limiter.available(clock), sender.remaining_budget()) if c is not None]
+                if not counts:
+                    return None
+                total += min(counts)
+            return total
+
+    def next_available_at(self):
+        """Earliest moment a currently unavailable sender comes back"""
+        now = timezone.now()
+
+        candidates = []
+        for sender in self.senders:
+            if sender.unavailable_until and sender.unavailable_until > now:
+                candidates.append(sender.unavailable_until)
+            elif sender.remaining_budget() == 0:
+                # Daily budget used up: back at the start of the next day
+                candidates.append(start_of_next_day(now))
+        return min(candidates) if candidates else None
+
+    def blocked_until(self):
+        """None if some sender can send now, otherwise when the first one comes back"""
+        now = timezone.now()
+        if any(sender.is_available(now) for sender in self.senders):
+            return None
+        return self.next_available_at() or now + timedelta(seconds=THROTTLE_COOLDOWN)
+
+    def estimate_eta(self, pending):
+        """Projected completion time for `pending` more sends"""
+        return estimate_eta(pending, self.senders)
+
+    def report_success(self, sender):
+        """Record a delivered message; never raises, since the message is already out"""
+        with _state_lock:
+            sender.in_flight -= 1
+            sender.sent_today += 1
+            sender.consecutive_failures = 0
+            sender.health = 'healthy'
+            sender.unavailable_until = None
+
+        try:
+            sender.record_send()
+        except Exception as e:
+            # Raising here would make the caller treat a sent message as failed (and send it again)
+            logger.error(f"Sender {sender.email} sent a message but recording it failed: {str(e)}")
+
+    def report_failure(self, sender, exc):
+        """Record a failed send; returns True if the provider throttled the sender"""
+        delay = get_throttle_delay(exc)
+
+        with _state_lock:
+            sender.in_flight -= 1
+            if delay is not None:
+                sender.health = 'throttled'
+                sender.unavailable_until = timezone.now() + timedelta(seconds=delay)
+            elif not isinstance(exc, smtplib.SMTPRecipientsRefused):
+                # A refused recipient says nothing about the sender's health
+                sender.consecutive_failures += 1
+                if sender.consecutive_failures >= FAILURE_THRESHOLD:
+                    sender.health = 'failing'
+                    sender.unavailable_until = timezone.now() + timedelta(seconds=FAILURE_COOLDOWN)
+
+        logger.warning(f"Sender {sender.email} failed ({sender.health}): {str(exc)}")
+
+        if sender.account is not None:
+            SenderAccount.objects.filter(pk=sender.account.pk).update(
+                health=sender.health,
+                throttled_until=sender.unavailable_until,
+                consecutive_failures=sender.consecutive_failures,
+                last_error=str(exc)[:1000],
+            )
+
+        return delay is not None
+
+    def send(self, subject, body, recipients):
+        """
+        Send one message through the best available sender
+
+        A throttled sender rejected the message without sending it, so the
+        message moves on to the next healthy sender. Any other failure is
+        raised to the caller.
+        """
+        for _ in range(len(self.senders)):
+            sender, wait = self.acquire()
+            if wait > 0:
+                # Smooth pacing instead of bursting into provider throttles
+                time.sleep(wait)
+            try:
+                sender.send(subject, body, recipients)
+            except Exception as e:
+                if self.report_failure(sender, e):
+                    continue
+                raise
+            self.report_success(sender)
+            return sender
+
+        raise NoSenderAvailable(retry_at=self.next_available_at())
+
+    def close(self):
+        for sender in self.senders:
+            try:
+                sender.close()
+            except Exception:
+                pass
+
+    def status(self):
+        return [sender.as_dict() for sender in self.senders]
@@ -1,5 +1,23 @@
 from rest_framework import serializers
-from .models import EmailLog, EmailTemplate, BulkEmailCampaign, EmailAnalytics
+from .templating import compile_template, TemplateSyntaxError
+from .models import EmailLog, EmailTemplate, BulkEmailCampaign, EmailAnalytics, SenderAccount, DeadLetter, CampaignDraft
+
+
+class TemplateFieldsMixin:
+    """Compile subject/body on validation so placeholder errors surface as a 400, not mid-campaign"""
+
+    def _validate_template(self, value):
+        try:
+            compile_template(value)
+        except TemplateSyntaxError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+    def validate_subject(self, value):
+        return self._validate_template(value)
+
+    def validate_body(self, value):
+        return self._validate_template(value)
 
 
 class SendEmailSerializer(serializers.Serializer):
@@ -10,6 +28,20 @@ class SendEmailSerializer(serializers.Serializer):
     )
 
 
+class BulkRecipientSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    variables = serializers.DictField(required=False, default=dict)
+
+
+class BulkSendSerializer(TemplateFieldsMixin, serializers.Serializer):
+    """Subject/body templates with {{placeholders}} plus per-recipient variables"""
+    subject = serializers.CharField(max_length=255)
+    body = serializers.CharField()
+    recipients = serializers.ListField(
+        child=BulkRecipientSerializer(), allow_empty=False
+    )
+
+
 class EmailLogSerializer(serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     subject = serializers.CharField()
@@ -23,7 +55,7 @@ class EmailLogSerializer(serializers.Serializer):
         return [r.strip() for r in obj.recipients.split(',') if r.strip()]
 
 
-class EmailTemplateSerializer(serializers.ModelSerializer):
+class EmailTemplateSerializer(TemplateFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = EmailTemplate
         fields = '__all__'
@@ -36,7 +68,10 @@ class BulkEmailCampaignSerializer(serializers.ModelSerializer):
     class Meta:
         model = BulkEmailCampaign
         fields = '__all__'
-        read_only_fields = ['user', 'sent_count', 'created_at', 'started_at', 'completed_at']
+        read_only_fields = [
+            'user', 'kind', 'sent_count', 'error_message', 'created_at', 'started_at', 'completed_at', 'eta',
+            'resume_at', 'worker_token', 'worker_heartbeat',
+        ]
 
 
 class EmailAnalyticsSerializer(serializers.ModelSerializer):
@@ -45,3 +80,73 @@ class EmailAnalyticsSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['user']
 
+
+class SenderAccountSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SenderAccount
+        fields = [
+            'id', 'provider', 'email', 'display_name', 'is_active',
+            'smtp_host', 'smtp_port', 'smtp_username', 'smtp_password', 'smtp_use_tls',
+            'per_second_limit', 'per_minute_limit', 'daily_limit', 'sent_today', 'health', 'throttled_until', 'last_error',
+            'created_at', 'updated_at',
+        ]
+        read_only_fields = [
+            'provider', 'sent_today', 'health', 'throttled_until', 'last_error',
+            'created_at', 'updated_at',
+        ]
+        extra_kwargs = {
+            'smtp_password': {'write_only': True},
+        }
+
+    def validate_email(self, value):
+        """One row per mailbox and user (user is not a field, so unique_together is not checked for us)"""
+        qs = SenderAccount.objects.filter(user=self.context['request'].user, email__iexact=value)
+        if self.instance is not None:
+            qs = qs.exclude(pk=self.instance.pk)
+        if qs.exists():
+            raise serializers.ValidationError('This mailbox is already in your sender pool')
+        return value
+
+    def validate(self, attrs):
+        """SMTP mailboxes need a host and password up front, not a failure at send time"""
+        # New accounts are always SMTP (Gmail mailboxes are added through OAuth2)
+        provider = self.instance.provider if self.instance is not None else 'smtp'
+        if provider != 'smtp':
+            return attrs
+
+        def current(name):
+            return attrs.get(name, getattr(self.instance, name, None))
+
+        errors = {}
+        for name in ('smtp_host', 'smtp_password'):
+            if not (current(name) or '').strip():
+                errors[name] = 'This field is required for SMTP accounts.'
+        port = current('smtp_port')
+        if port is not None and not 0 < port < 65536:
+            errors['smtp_port'] = 'Enter a valid port number.'
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+
+class DeadLetterSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeadLetter
+        fields = [
+            'id', 'campaign', 'recipient', 'recipient_data', 'subject', 'body',
+            'attempts', 'failure_class', 'last_error', 'created_at', 'requeued_at',
+        ]
+        read_only_fields = fields
+
+
+class CampaignDraftSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CampaignDraft
+        fields = [
+            'id', 'campaign', 'position', 'recipient', 'recipient_data', 'subject', 'body',
+            'status', 'error_message', 'created_at', 'updated_at',
+        ]
+        read_only_fields = [
+            'campaign', 'position', 'recipient', 'recipient_data', 'status', 'error_message',
+            'created_at', 'updated_at',
+        ]
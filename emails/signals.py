@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import EmailLog
+from .contacted import record_contacted
+from .recipients import index_recipients
+from .stats import invalidate_user_stats
+
+
+@receiver(post_save, sender=EmailLog)
+def index_log_recipients(sender, instance, created, **kwargs):
+    """Store the normalized recipient rows of a new email log and refresh the user's stats."""
+    if created:
+        index_recipients([instance])
+        transaction.on_commit(lambda: invalidate_user_stats(instance.user_id))
+
+
+@receiver(post_delete, sender=EmailLog)
+def drop_user_stats(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_user_stats(instance.user_id))
+
+
+@receiver(post_save, sender=EmailLog)
+def index_contacted_recipients(sender, instance, **kwargs):
+    """Add the recipients of a sent email to the user's contacted index."""
+    if instance.status == 'sent':
+        record_contacted(instance.user, [(email, '') for email in instance.recipients.split(',')])
@@ -0,0 +1,58 @@
+"""
+Per-user email statistics for the dashboard
+
+The counts come from one conditional-aggregation query over the user's logs
+(covered by the (user, created_at) index) plus one COUNT(DISTINCT) over the
+normalized recipient rows, and the result is cached per user. Writing or
+deleting an EmailLog drops that user's entry, so the dashboard only hits the
+database again after the history actually changed; the timeout bounds
+staleness in other processes when the cache is not shared.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from .models import EmailLog, EmailLogRecipient
+
+
+def _cache_key(user_id):
+    return f'user-email-stats:{user_id}'
+
+
+def invalidate_user_stats(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def compute_user_stats(user):
+    now = timezone.now()
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start_of_week = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    counts = EmailLog.objects.filter(user=user).aggregate(
+        total_emails=Count('id'),
+        emails_this_month=Count('id', filter=Q(created_at__gte=start_of_month)),
+        emails_this_week=Count('id', filter=Q(created_at__gte=start_of_week)),
+        last_email_date=Max('created_at'),
+    )
+    return {
+        'total_emails': counts['total_emails'],
+        'emails_this_month': counts['emails_this_month'],
+        'emails_this_week': counts['emails_this_week'],
+        'unique_recipients': EmailLogRecipient.objects.filter(user=user).values('address').distinct().count(),
+        'last_email_date': counts['last_email_date'],
+    }
+
+
+def user_stats(user):
+    """Dashboard stats of a user (cached until their email history changes)"""
+    now = timezone.now()
+    # An entry from an earlier week or month has stale period counts
+    period = f"{now - timedelta(days=now.weekday()):%Y%m%d}:{now:%Y%m}"
+    cached = cache.get(_cache_key(user.pk))
+    if cached and cached[0] == period:
+        return cached[1]
+
+    stats = compute_user_stats(user)
+    cache.set(_cache_key(user.pk), (period, stats), settings.USER_STATS_CACHE_SECONDS)
+    return stats
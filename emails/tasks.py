@@ -0,0 +1,96 @@
+"""
+In-process background jobs for email delivery
+
+A bounded thread pool runs sends submitted by the API so request latency does
+not depend on provider latency. Each job tracks its state on an EmailLog row
+('pending' -> 'sending' -> 'sent' / 'failed'). The pool lives in memory, so the
+campaign dispatcher calls recover_pending_sends() to queue again the jobs a
+restart lost, and to fail the ones it interrupted mid-send.
+"""
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from .models import EmailLog
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.EMAIL_SEND_WORKERS, thread_name_prefix='email-send')
+
+# EmailLog ids queued by this process and not finished yet
+_queued = set()
+_queued_lock = threading.Lock()
+
+
+def submit(fn, *args, **kwargs):
+    """Run fn in the background pool with fresh database connections"""
+    def run():
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Background email job {getattr(fn, '__name__', fn)} failed: {str(e)}")
+        finally:
+            close_old_connections()
+    return _executor.submit(run)
+
+
+def queue_logged_email(log_id):
+    """Queue delivery of a pending EmailLog"""
+    with _queued_lock:
+        _queued.add(log_id)
+
+    def send_queued():
+        try:
+            send_logged_email(log_id)
+        finally:
+            with _queued_lock:
+                _queued.discard(log_id)
+    return submit(send_queued)
+
+
+def send_logged_email(log_id):
+    """Deliver the message stored on a pending EmailLog and record the outcome"""
+    from .delivery import deliver
+
+    # Claim the job so a copy queued again by recovery never sends it twice
+    if not EmailLog.objects.filter(pk=log_id, status='pending').update(status='sending'):
+        return
+    log = EmailLog.objects.select_related('user').get(pk=log_id)
+    recipients = [r.strip() for r in log.recipients.split(',') if r.strip()]
+
+    try:
+        deliver(log.user, log.subject, log.body, recipients)
+    except Exception as e:
+        EmailLog.objects.filter(pk=log_id).update(status='failed', error_message=str(e))
+        return
+
+    # save() rather than update() so post_save indexes the recipients as contacted
+    log.status = 'sent'
+    log.save(update_fields=['status'])
+
+
+def recover_pending_sends():
+    """
+    Queue again pending sends older than EMAIL_PENDING_TIMEOUT that no worker here holds,
+    and fail sends interrupted mid-delivery; returns (requeued, interrupted)
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.EMAIL_PENDING_TIMEOUT)
+
+    # Whether the provider got the message is unknown: report it rather than risk a second copy
+    interrupted = EmailLog.objects.filter(status='sending', created_at__lt=cutoff).update(
+        status='failed', error_message='Interrupted while sending; the email may or may not have been delivered'
+    )
+
+    stale = EmailLog.objects.filter(status='pending', created_at__lt=cutoff).values_list('id', flat=True)
+    with _queued_lock:
+        lost = [log_id for log_id in stale if log_id not in _queued]
+    for log_id in lost:
+        queue_logged_email(log_id)
+
+    if lost or interrupted:
+        logger.info(f"Queued {len(lost)} lost email sends again, failed {interrupted} interrupted ones")
+    return len(lost), interrupted
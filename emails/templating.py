@@ -0,0 +1,100 @@
+"""
+Compiled placeholder templates for email subjects and bodies
+
+Placeholders look like {{business_name}} or {{sender.phone}}; dotted names
+walk into nested dicts and unknown placeholders render as an empty string.
+A template is parsed once into its literal and placeholder parts, wrapped in
+a render function and cached by its source, so every new EmailTemplate version
+compiles once and campaigns only pay for the lookups and a string join per
+message.
+"""
+import re
+from functools import lru_cache
+
+PLACEHOLDER_NAME_RE = re.compile(r"[A-Za-z_]\w*(\.[A-Za-z_]\w*)*$")
+
+
+class TemplateSyntaxError(ValueError):
+    """Template source has an unbalanced or invalid placeholder"""
+
+
+def _to_str(value):
+    if value is None:
+        return ''
+    return value if type(value) is str else str(value)
+
+
+def _lookup(context, path):
+    value = context
+    for part in path:
+        if not isinstance(value, dict):
+            return ''
+        value = value.get(part)
+        if value is None:
+            return ''
+    return _to_str(value)
+
+
+def parse(source):
+    """Split source into literal strings and placeholder paths (tuples)"""
+    parts = []
+    pos = 0
+    while True:
+        start = source.find('{{', pos)
+        literal = source[pos:] if start == -1 else source[pos:start]
+
+        stray = literal.find('}}')
+        if stray != -1:
+            raise TemplateSyntaxError(f"Unexpected '}}}}' at position {pos + stray}")
+        if literal:
+            parts.append(literal)
+        if start == -1:
+            return parts
+
+        end = source.find('}}', start + 2)
+        if end == -1:
+            raise TemplateSyntaxError(f"Unclosed '{{{{' at position {start}")
+
+        name = source[start + 2:end].strip()
+        if not PLACEHOLDER_NAME_RE.match(name):
+            raise TemplateSyntaxError(f"Invalid placeholder '{{{{{name}}}}}' at position {start}")
+
+        parts.append(tuple(name.split('.')))
+        pos = end + 2
+
+
+@lru_cache(maxsize=1024)
+def compile_template(source):
+    """Compile source into a render(context) function (cached by source)"""
+    parts = tuple(parse(source or ''))
+    if all(type(part) is str for part in parts):
+        text = ''.join(parts)
+        return lambda context: text
+
+    def render_parts(context):
+        return ''.join([part if type(part) is str else _lookup(context, part) for part in parts])
+
+    return render_parts
+
+
+def render(source, context):
+    """Replace every placeholder in source with its value from context"""
+    return compile_template(source or '')(context)
+
+
+def get_sender_context(user, sender=None):
+    """Variables about the sender available to templates as {{sender.*}} (sender: a prebuilt SenderContext)"""
+    from ai_services.sender_context import SenderContext
+
+    info = (sender or SenderContext.for_user(user)).info
+    return {**info, 'name': info['full_name'], 'email': user.email}
+
+
+def build_business_context(business, sender):
+    """Template variables for one business from search results / campaign recipients"""
+    return {
+        **business,
+        'business_name': business.get('name', ''),
+        'business_category': business.get('category', ''),
+        'sender': sender,
+    }
@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.test import SimpleTestCase
+from .scheduler import TokenBucket, SenderRateLimiter, SendScheduler, estimate_eta, start_of_next_day
+from .templating import TemplateSyntaxError, compile_template, parse, render
+
+
+class FakeSender:
+    def __init__(self, per_second=None, per_minute=None, daily_limit=None, remaining=None):
+        self.limiter = SenderRateLimiter(per_second, per_minute)
+        self.daily_limit = daily_limit
+        self.remaining = remaining
+
+    def remaining_budget(self):
+        return self.remaining
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_paced(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        bucket.updated = 0.0
+        self.assertEqual(bucket.reserve(now=0.0), 0.0)
+        self.assertEqual(bucket.reserve(now=0.0), 0.0)
+        # Third token is half a second away at 2 tokens/s
+        self.assertAlmostEqual(bucket.reserve(now=0.0), 0.5)
+        # Reservations queue up: the next one waits a further half second
+        self.assertAlmostEqual(bucket.reserve(now=0.0), 1.0)
+
+    def test_refill_is_capped(self):
+        bucket = TokenBucket(rate=1, capacity=3)
+        bucket.updated = 0.0
+        bucket.tokens = 0.0
+        bucket.delay(now=100.0)
+        self.assertEqual(bucket.tokens, 3.0)
+
+    def test_delay_does_not_take_a_token(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        bucket.updated = 0.0
+        self.assertEqual(bucket.delay(now=0.0), 0.0)
+        self.assertEqual(bucket.delay(now=0.0), 0.0)
+        self.assertEqual(bucket.reserve(now=0.0), 0.0)
+        self.assertAlmostEqual(bucket.delay(now=0.0), 1.0)
+
+
+class SenderRateLimiterTests(SimpleTestCase):
+    def test_strictest_bucket_wins(self):
+        limiter = SenderRateLimiter(per_second=10, per_minute=6)
+        for bucket in limiter.buckets:
+            bucket.updated = 0.0
+        self.assertAlmostEqual(limiter.sustained_rate, 0.1)
+        for _ in range(6):
+            self.assertEqual(limiter.reserve(now=0.0), 0.0)
+        # Per-minute bucket is empty: one token every 10 seconds
+        self.assertAlmostEqual(limiter.reserve(now=0.0), 10.0)
+
+    def test_unlimited(self):
+        limiter = SenderRateLimiter(None, None)
+        self.assertIsNone(limiter.sustained_rate)
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertIsNone(limiter.available())
+
+    def test_available_counts_sends_without_a_wait(self):
+        limiter = SenderRateLimiter(per_second=None, per_minute=5)
+        limiter.buckets[0].updated = 0.0
+        self.assertEqual(limiter.available(now=0.0), 5)
+        for _ in range(3):
+            limiter.reserve(now=0.0)
+        self.assertEqual(limiter.available(now=0.0), 2)
+        for _ in range(4):
+            limiter.reserve(now=0.0)
+        # Queued reservations never count as negative capacity
+        self.assertEqual(limiter.available(now=0.0), 0)
+
+
+class SendSchedulerTests(SimpleTestCase):
+    def test_pops_in_due_order_and_fifo_on_ties(self):
+        scheduler = SendScheduler(['a', 'b'], due_at=100.0)
+        scheduler.push('late', 200.0)
+        scheduler.push('early', 50.0)
+        scheduler.push('c', 100.0)
+        self.assertEqual(scheduler.next_due_at(), 50.0)
+        self.assertEqual([scheduler.pop()[0] for _ in range(len(scheduler))], ['early', 'a', 'b', 'c', 'late'])
+        self.assertIsNone(scheduler.next_due_at())
+
+    def test_pop_returns_wait(self):
+        scheduler = SendScheduler()
+        scheduler.push('past', 0.0)
+        self.assertEqual(scheduler.pop(), ('past', 0.0))
+
+
+class EstimateEtaTests(SimpleTestCase):
+    now = datetime(2026, 3, 10, 12, 0, tzinfo=dt_timezone.utc)
+
+    def test_within_todays_budget(self):
+        sender = FakeSender(per_minute=60, daily_limit=500, remaining=500)
+        self.assertEqual(estimate_eta(30, [sender], now=self.now), self.now + timedelta(seconds=30))
+
+    def test_senders_add_up(self):
+        senders = [FakeSender(per_minute=60, daily_limit=500, remaining=500) for _ in range(2)]
+        self.assertEqual(estimate_eta(30, senders, now=self.now), self.now + timedelta(seconds=15))
+
+    def test_carry_over_to_next_days(self):
+        sender = FakeSender(per_minute=60, daily_limit=100, remaining=40)
+        # 40 today, 100 tomorrow, 10 the day after
+        expected = start_of_next_day(self.now) + timedelta(days=1, seconds=10)
+        self.assertEqual(estimate_eta(150, [sender], now=self.now), expected)
+
+    def test_full_last_day(self):
+        sender = FakeSender(per_minute=60, daily_limit=100, remaining=0)
+        self.assertEqual(estimate_eta(100, [sender], now=self.now), start_of_next_day(self.now) + timedelta(seconds=100))
+
+    def test_no_pacing_and_no_budget_limit(self):
+        self.assertEqual(estimate_eta(1000, [FakeSender()], now=self.now), self.now)
+
+    def test_no_capacity(self):
+        sender = FakeSender(per_minute=60, daily_limit=0, remaining=0)
+        self.assertIsNone(estimate_eta(5, [sender], now=self.now))
+
+    def test_nothing_pending(self):
+        self.assertEqual(estimate_eta(0, [], now=self.now), self.now)
+
+
+class ParseTests(SimpleTestCase):
+    def test_splits_literals_and_paths(self):
+        self.assertEqual(parse('Hi {{ name }}, from {{sender.company}}!'),
+                         ['Hi ', ('name',), ', from ', ('sender', 'company'), '!'])
+
+    def test_plain_text(self):
+        self.assertEqual(parse('no placeholders'), ['no placeholders'])
+        self.assertEqual(parse(''), [])
+
+    def test_syntax_errors(self):
+        for source in ('Hi {{name', 'Hi name}}', 'Hi {{first name}}', 'Hi {{}}', 'Hi {{1st}}'):
+            with self.subTest(source=source):
+                with self.assertRaises(TemplateSyntaxError):
+                    parse(source)
+
+
+class RenderTests(SimpleTestCase):
+    def test_renders_names_and_dotted_paths(self):
+        context = {'name': 'Ana', 'sender': {'company': 'Acme', 'phone': 5551234}}
+        self.assertEqual(render('Hi {{name}} - {{sender.company}} ({{sender.phone}})', context),
+                         'Hi Ana - Acme (5551234)')
+
+    def test_missing_values_render_empty(self):
+        context = {'name': None, 'sender': 'not a dict'}
+        self.assertEqual(render('[{{name}}|{{missing}}|{{sender.company}}|{{a.b.c}}]', context), '[|||]')
+
+    def test_literal_only_and_empty(self):
+        self.assertEqual(render('Hello', {}), 'Hello')
+        self.assertEqual(render('', {}), '')
+        self.assertEqual(render(None, {}), '')
+
+    def test_compiled_once_per_source(self):
+        source = 'Cached {{name}}'
+        fn = compile_template(source)
+        self.assertIs(compile_template(source), fn)
+        self.assertEqual(fn({'name': 'a'}), 'Cached a')
+        self.assertEqual(fn({'name': 'b'}), 'Cached b')
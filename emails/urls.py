@@ -1,9 +1,12 @@
 from django.urls import path
 from .views import (
-    SendEmailView, EmailHistoryView, EmailTemplateListCreateView, 
+    SendEmailView, BulkSendEmailView, SendEmailStatusView, EmailHistoryView, EmailTemplateListCreateView, 
     EmailTemplateDetailView, BulkEmailCampaignListCreateView,
-    BulkEmailCampaignDetailView, BulkEmailCampaignSendView,
-    CreateBulkCampaignFromBusinessesView, EmailAnalyticsView, EmailAnalyticsUpdateView
+    BulkEmailCampaignDetailView, BulkEmailCampaignSendView, BulkEmailCampaignPrepareView,
+    CampaignDraftListView, CampaignDraftDetailView,
+    CreateBulkCampaignFromBusinessesView, EmailAnalyticsView, EmailAnalyticsUpdateView,
+    SenderAccountListCreateView, SenderAccountDetailView,
+    DeadLetterListView, DeadLetterRequeueView
 )
 from .oauth2_views import (
     gmail_auth_url, gmail_callback, gmail_status, 
@@ -14,6 +17,8 @@ from .oauth2_views import (
 urlpatterns = [
     # Basic email operations
     path('send/', SendEmailView.as_view(), name='send_email'),
+    path('send/bulk/', BulkSendEmailView.as_view(), name='send_email_bulk'),
+    path('send/status/<int:job_id>/', SendEmailStatusView.as_view(), name='send_email_status'),
     path('history/', EmailHistoryView.as_view(), name='email_history'),
     
     # Email templates
@@ -23,9 +28,20 @@ urlpatterns = [
     # Bulk email campaigns
     path('campaigns/', BulkEmailCampaignListCreateView.as_view(), name='campaign_list_create'),
     path('campaigns/<int:pk>/', BulkEmailCampaignDetailView.as_view(), name='campaign_detail'),
+    path('campaigns/<int:pk>/prepare/', BulkEmailCampaignPrepareView.as_view(), name='campaign_prepare'),
+    path('campaigns/<int:pk>/drafts/', CampaignDraftListView.as_view(), name='campaign_draft_list'),
+    path('campaigns/<int:pk>/drafts/<int:draft_id>/', CampaignDraftDetailView.as_view(), name='campaign_draft_detail'),
     path('campaigns/<int:pk>/send/', BulkEmailCampaignSendView.as_view(), name='campaign_send'),
     path('campaigns/create-from-businesses/', CreateBulkCampaignFromBusinessesView.as_view(), name='create_campaign_from_businesses'),
     
+    # Dead letters (undeliverable recipients)
+    path('dead-letters/', DeadLetterListView.as_view(), name='dead_letter_list'),
+    path('dead-letters/requeue/', DeadLetterRequeueView.as_view(), name='dead_letter_requeue'),
+    
+    # Sender pool (additional mailboxes)
+    path('senders/', SenderAccountListCreateView.as_view(), name='sender_list_create'),
+    path('senders/<int:pk>/', SenderAccountDetailView.as_view(), name='sender_detail'),
+    
     # Analytics
     path('analytics/', EmailAnalyticsView.as_view(), name='email_analytics'),
     path('analytics/update/', EmailAnalyticsUpdateView.as_view(), name='analytics_update'),
@@ -1,23 +1,30 @@
-from django.core.mail import send_mail
 from django.conf import settings
-from django.db.models import Count, Sum, Q
+from django.db import transaction
+from django.db.models import Count, Sum, Q, Max
 from django.utils import timezone
 from datetime import datetime, timedelta
-import os
-import base64
-import smtplib
-import threading
-from email.mime.text import MIMEText
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import generics
 from .serializers import (
-    SendEmailSerializer, EmailLogSerializer, EmailTemplateSerializer,
-    BulkEmailCampaignSerializer, EmailAnalyticsSerializer
+    SendEmailSerializer, BulkSendSerializer, EmailLogSerializer, EmailTemplateSerializer,
+    BulkEmailCampaignSerializer, EmailAnalyticsSerializer, SenderAccountSerializer,
+    DeadLetterSerializer, CampaignDraftSerializer
 )
-from .models import EmailLog, EmailTemplate, BulkEmailCampaign, EmailAnalytics
+from .models import (
+    EmailLog, EmailTemplate, BulkEmailCampaign, EmailAnalytics, SenderAccount, DeadLetter, CampaignDraft,
+    EmailLogRecipient
+)
+from .campaign_worker import start_campaign_worker, worker_is_alive, claim_prepare
+from .campaign_prepare import prepare_campaign
+from ai_services.executor import submit_job
+from .delivery import deliver, get_smtp_auth_string, DeliveryConfigError, DeliveryUncertainError
 from .gmail_oauth2 import GmailOAuth2Service
+from .bulk_send import render_messages, send_messages, run_bulk_campaign
+from .sender_pool import SenderPool
+from .contacted import ContactedIndex, include_contacted, normalize_email
+from . import tasks
 
 
 class SendEmailView(APIView):
@@ -30,78 +37,44 @@ class SendEmailView(APIView):
         body = serializer.validated_data['body']
         recipients = serializer.validated_data['recipients']
 
-        # Check if user has Gmail OAuth2 connected
-        try:
-            profile = request.user.profile
-            if profile.gmail_connected and profile.is_gmail_token_valid():
-                # Use Gmail OAuth2
-                oauth_service = GmailOAuth2Service()
-                try:
-                    result = oauth_service.send_email(
-                        user=request.user,
-                        subject=subject,
-                        body=body,
-                        recipients=recipients
-                    )
-                    
-                    EmailLog.objects.create(
-                        user=request.user,
-                        subject=subject,
-                        body=body,
-                        recipients=','.join(recipients),
-                        status='sent'
-                    )
-                    
-                    return Response({
-                        'sent': len(recipients), 
-                        'method': 'gmail_oauth2',
-                        'gmail_message_id': result.get('id')
-                    }, status=status.HTTP_200_OK)
-                    
-                except Exception as e:
-                    # Fall back to basic method if Gmail fails
-                    pass
-        
-        except Exception:
-            # Profile doesn't exist or Gmail not connected, use basic method
-            pass
+        # Fail fast on a misconfigured fallback transport, but only when Gmail will not be tried first
+        if not GmailOAuth2Service().has_gmail_connection(request.user):
+            try:
+                get_smtp_auth_string()
+            except DeliveryConfigError as e:
+                return Response({'detail': str(e)}, status=400)
 
-        # Use basic email method (fallback)
-        auth_method = os.getenv('EMAIL_AUTH_METHOD', 'basic')  # basic | gmail_oauth2 | outlook_oauth2
-
-        if auth_method == 'basic':
-            # Send via configured backend (console by default or SMTP with app password)
-            send_mail(subject, body, settings.EMAIL_HOST_USER or None, recipients, fail_silently=False)
+        run_async = request.query_params.get('async')
+        if run_async is None:
+            run_async = settings.EMAIL_SEND_ASYNC
         else:
-            # OAuth2 over SMTP
-            smtp_host = settings.EMAIL_HOST
-            smtp_port = settings.EMAIL_PORT
-
-            if auth_method == 'gmail_oauth2':
-                access_token = os.getenv('GMAIL_OAUTH2_ACCESS_TOKEN', '')
-                if not access_token:
-                    return Response({'detail': 'GMAIL_OAUTH2_ACCESS_TOKEN missing'}, status=400)
-                auth_string = f"user={settings.EMAIL_HOST_USER}\1auth=Bearer {access_token}\1\1"
-            elif auth_method == 'outlook_oauth2':
-                access_token = os.getenv('OUTLOOK_OAUTH2_ACCESS_TOKEN', '')
-                if not access_token:
-                    return Response({'detail': 'OUTLOOK_OAUTH2_ACCESS_TOKEN missing'}, status=400)
-                auth_string = f"user={settings.EMAIL_HOST_USER}\1auth=Bearer {access_token}\1\1"
-            else:
-                return Response({'detail': 'Unsupported EMAIL_AUTH_METHOD'}, status=400)
-
-            msg = MIMEText(body, _charset='utf-8')
-            msg['Subject'] = subject
-            msg['From'] = settings.EMAIL_HOST_USER
-            msg['To'] = ', '.join(recipients)
-
-            with smtplib.SMTP(smtp_host, smtp_port) as server:
-                if settings.EMAIL_USE_TLS:
-                    server.starttls()
-                # XOAUTH2
-                server.ehlo()
-                server.docmd('AUTH', 'XOAUTH2 ' + base64.b64encode(auth_string.encode()).decode())
-                server.sendmail(settings.EMAIL_HOST_USER, recipients, msg.as_string())
+            run_async = run_async.lower() in ('1', 'true', 'yes')
+
+        if run_async:
+            # Queue the send and answer right away; the EmailLog row doubles as the job record
+            log = EmailLog.objects.create(
+                user=request.user,
+                subject=subject,
+                body=body,
+                recipients=','.join(recipients),
+                status='pending'
+            )
+            tasks.queue_logged_email(log.id)
+
+            return Response({
+                'job_id': log.id,
+                'status': 'pending',
+                'status_url': f'/api/emails/send/status/{log.id}/'
+            }, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            result = deliver(request.user, subject, body, recipients)
+        except DeliveryConfigError as e:
+            # Gmail failed and the fallback transport is misconfigured
+            return Response({'detail': str(e)}, status=400)
+        except DeliveryUncertainError as e:
+            # Not retried through the fallback: that could deliver the message twice
+            return Response({'detail': str(e)}, status=status.HTTP_502_BAD_GATEWAY)
 
         EmailLog.objects.create(
             user=request.user,
@@ -111,7 +84,86 @@ class SendEmailView(APIView):
             status='sent'
         )
 
-        return Response({'sent': len(recipients), 'method': 'basic'}, status=status.HTTP_200_OK)
+        return Response({'sent': len(recipients), **result}, status=status.HTTP_200_OK)
+
+
+class BulkSendEmailView(APIView):
+    """Render and send one personalized message per recipient in a single call"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = BulkSendSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        messages = render_messages(request.user, data['subject'], data['body'], data['recipients'])
+
+        run_async = request.query_params.get('async')
+        if run_async is None:
+            # Large lists, and lists the senders cannot take without pacing waits, go to the background
+            run_async = (
+                settings.EMAIL_SEND_ASYNC or len(messages) > settings.EMAIL_BULK_SYNC_LIMIT
+                or not self._fits_without_waiting(request.user, len(messages))
+            )
+        else:
+            run_async = run_async.lower() in ('1', 'true', 'yes')
+
+        if run_async:
+            # Track the job as a campaign so progress shows up on /api/emails/campaigns/<id>/
+            campaign = BulkEmailCampaign.objects.create(
+                user=request.user,
+                name=f'Bulk send {timezone.now().strftime("%Y-%m-%d %H:%M")}',
+                kind='bulk',
+                subject=data['subject'],
+                body=data['body'],
+                recipients=[dict(r) for r in data['recipients']],
+                status='sending',
+                total_count=len(messages),
+                started_at=timezone.now()
+            )
+            tasks.submit(run_bulk_campaign, campaign.id, messages)
+
+            return Response({
+                'job_id': campaign.id,
+                'status': 'sending',
+                'status_url': f'/api/emails/campaigns/{campaign.id}/'
+            }, status=status.HTTP_202_ACCEPTED)
+
+        results = send_messages(request.user, messages)
+        sent = sum(1 for r in results if r['status'] == 'sent')
+
+        return Response({
+            'sent': sent,
+            'failed': len(results) - sent,
+            'results': results
+        }, status=status.HTTP_200_OK)
+
+    def _fits_without_waiting(self, user, count):
+        pool = SenderPool(user)
+        try:
+            ready = pool.ready_now()
+        finally:
+            pool.close()
+        return ready is None or count <= ready
+
+
+class SendEmailStatusView(APIView):
+    """Delivery status of an email queued with SendEmailView ?async=1"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = EmailLog.objects.filter(pk=job_id, user=request.user).values(
+            'id', 'status', 'error_message', 'created_at'
+        ).first()
+        if not job:
+            return Response({'detail': 'Job not found'}, status=404)
+
+        return Response({
+            'job_id': job['id'],
+            'status': job['status'],
+            'error_message': job['error_message'],
+            'created_at': job['created_at'],
+        })
 
 
 
@@ -120,6 +172,13 @@ class EmailHistoryView(APIView):
 
     def get(self, request):
         qs = EmailLog.objects.filter(user=request.user).order_by('-created_at')
+        # Emails sent to an address (?recipient=) or domain (?domain=), via the indexed recipient rows
+        recipient = normalize_email(request.query_params.get('recipient'))
+        if recipient:
+            qs = qs.filter(id__in=EmailLogRecipient.objects.filter(user=request.user, address=recipient).values('log_id'))
+        domain = normalize_email(request.query_params.get('domain')).lstrip('@')
+        if domain:
+            qs = qs.filter(id__in=EmailLogRecipient.objects.filter(user=request.user, domain=domain).values('log_id'))
         # Simple cursor-less pagination via query params
         try:
             page = int(request.query_params.get('page', '1'))
@@ -170,6 +229,15 @@ class BulkEmailCampaignListCreateView(generics.ListCreateAPIView):
         return BulkEmailCampaign.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
+        recipients = serializer.validated_data.get('recipients')
+        if (
+            isinstance(recipients, list) and all(isinstance(r, dict) for r in recipients)
+            and not include_contacted(self.request)
+        ):
+            # Recipients the user already emailed are left out
+            recipients, _ = ContactedIndex(self.request.user).exclude(recipients)
+            serializer.save(user=self.request.user, recipients=recipients)
+            return
         serializer.save(user=self.request.user)
 
 
@@ -190,113 +258,180 @@ class BulkEmailCampaignSendView(APIView):
         except BulkEmailCampaign.DoesNotExist:
             return Response({'detail': 'Campaign not found'}, status=404)
 
-        if campaign.status != 'draft':
-            return Response({'detail': 'Campaign is not in draft status'}, status=400)
+        if campaign.kind != 'outreach':
+            return Response({'detail': 'Bulk sends cannot be restarted'}, status=400)
+
+        if campaign.status in ('sending', 'scheduled'):
+            # A campaign whose worker is gone (e.g. after a restart) can be resumed right away
+            if worker_is_alive(campaign) or not start_campaign_worker(campaign):
+                return Response({'detail': 'Campaign is already sending'}, status=400)
+            return Response({'detail': 'Campaign sending resumed'}, status=200)
+
+        if campaign.status not in ('draft', 'prepared'):
+            return Response({'detail': 'Campaign is not in draft or prepared status'}, status=400)
 
-        # Start sending in background thread
-        campaign.status = 'sending'
         campaign.started_at = timezone.now()
         campaign.total_count = len(campaign.recipients)
-        campaign.save()
+        campaign.save(update_fields=['started_at', 'total_count'])
 
-        # Start background thread for sending
-        thread = threading.Thread(target=self._send_bulk_emails, args=(campaign,))
-        thread.daemon = True
-        thread.start()
+        # Claim the campaign and send it in the background
+        if not start_campaign_worker(campaign):
+            return Response({'detail': 'Campaign is already sending'}, status=400)
 
         return Response({'detail': 'Bulk email sending started with AI generation'}, status=200)
 
-    def _send_bulk_emails(self, campaign):
-        """Background task to send bulk emails with AI generation"""
+
+class BulkEmailCampaignPrepareView(APIView):
+    """Generate every recipient's draft ahead of sending so they can be previewed"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
         try:
-            from ai_services.email_generator import EmailGenerator
-            
-            for i, recipient_data in enumerate(campaign.recipients):
-                try:
-                    # Generate AI email for this specific business
-                    business_name = recipient_data.get('name', 'Business')
-                    business_category = recipient_data.get('category', 'business')
-                    business_country = recipient_data.get('country', None)
-                    business_city = recipient_data.get('city', None)
-                    
-                    # Use AI to generate personalized email with localization
-                    ai_email = EmailGenerator.generate_intro_email(
-                        business_name=business_name,
-                        business_category=business_category,
-                        developer_name=campaign.user.username or 'Developer',
-                        developer_services='Web development and digital solutions',
-                        user=campaign.user,  # Pass the user object for real name and info
-                        business_country=business_country,  # Pass country for language localization
-                        business_city=business_city  # Pass city for more specific localization
-                    )
-                    
-                    # Use AI-generated subject and body, or fallback to campaign defaults
-                    email_subject = ai_email.get('subject', campaign.subject)
-                    email_body = ai_email.get('body', campaign.body)
-                    
-                    # Send individual email - try Gmail OAuth2 first
-                    try:
-                        profile = campaign.user.profile
-                        if profile.gmail_connected and profile.is_gmail_token_valid():
-                            # Use Gmail OAuth2
-                            oauth_service = GmailOAuth2Service()
-                            oauth_service.send_email(
-                                user=campaign.user,
-                                subject=email_subject,
-                                body=email_body,
-                                recipients=[recipient_data.get('email', '')]
-                            )
-                        else:
-                            # Fall back to basic method
-                            send_mail(
-                                email_subject,
-                                email_body,
-                                settings.EMAIL_HOST_USER or None,
-                                [recipient_data.get('email', '')],
-                                fail_silently=False
-                            )
-                    except Exception as e:
-                        # Fall back to basic method if Gmail fails
-                        send_mail(
-                            email_subject,
-                            email_body,
-                            settings.EMAIL_HOST_USER or None,
-                            [recipient_data.get('email', '')],
-                            fail_silently=False
-                        )
-                    
-                    # Log the email with AI generation info
-                    EmailLog.objects.create(
-                        user=campaign.user,
-                        subject=email_subject,
-                        body=email_body,
-                        recipients=recipient_data.get('email', ''),
-                        status='sent'
-                    )
-                    
-                    campaign.sent_count += 1
-                    campaign.save()
-                    
-                except Exception as e:
-                    # Log failed email
-                    EmailLog.objects.create(
-                        user=campaign.user,
-                        subject=campaign.subject,
-                        body=campaign.body,
-                        recipients=recipient_data.get('email', ''),
-                        status='failed',
-                        error_message=str(e)
-                    )
-
-            # Mark campaign as completed
-            campaign.status = 'completed'
-            campaign.completed_at = timezone.now()
-            campaign.save()
-
-        except Exception as e:
-            campaign.status = 'failed'
-            campaign.error_message = str(e)
-            campaign.save()
+            campaign = BulkEmailCampaign.objects.get(pk=pk, user=request.user)
+        except BulkEmailCampaign.DoesNotExist:
+            return Response({'detail': 'Campaign not found'}, status=404)
+
+        # Preparing a prepared campaign again retries its failed drafts; a prepare that died is restarted
+        if not claim_prepare(campaign):
+            return Response({'detail': 'Campaign is not in draft or prepared status'}, status=400)
+
+        submit_job(prepare_campaign, campaign.id, campaign.worker_token)
+
+        return Response({
+            'detail': 'Draft generation started',
+            'drafts_url': f'/api/emails/campaigns/{campaign.id}/drafts/'
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class CampaignDraftListView(generics.ListAPIView):
+    """Preview a campaign's generated drafts, optionally filtered by ?status="""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = CampaignDraftSerializer
+
+    def get_queryset(self):
+        qs = CampaignDraft.objects.filter(campaign_id=self.kwargs['pk'], campaign__user=self.request.user)
+        draft_status = self.request.query_params.get('status')
+        if draft_status:
+            qs = qs.filter(status=draft_status)
+        return qs
+
+
+class CampaignDraftDetailView(generics.RetrieveUpdateAPIView):
+    """Edit one draft before sending; an edited draft is sent as written"""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = CampaignDraftSerializer
+    lookup_url_kwarg = 'draft_id'
+
+    def get_queryset(self):
+        return CampaignDraft.objects.filter(
+            campaign_id=self.kwargs['pk'], campaign__user=self.request.user
+        ).exclude(status='sent')
+
+    def perform_update(self, serializer):
+        serializer.save(status='ready', error_message=None)
+
+
+# Dead-letter views
+class DeadLetterListView(generics.ListAPIView):
+    """Recipients that could not be delivered, optionally filtered by ?campaign=<id>"""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = DeadLetterSerializer
+
+    def get_queryset(self):
+        qs = DeadLetter.objects.filter(user=self.request.user)
+        campaign_id = self.request.query_params.get('campaign')
+        if campaign_id:
+            qs = qs.filter(campaign_id=campaign_id)
+        if self.request.query_params.get('pending') == '1':
+            qs = qs.filter(requeued_at__isnull=True)
+        return qs
+
+
+class DeadLetterRequeueView(APIView):
+    """Requeue dead letters in bulk; they are resent with their stored drafts"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        qs = DeadLetter.objects.filter(
+            user=request.user, requeued_at__isnull=True, campaign__isnull=False
+        ).select_related('campaign')
+
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+                return Response({'detail': 'ids must be a list of dead letter ids'}, status=400)
+            if ids:
+                qs = qs.filter(id__in=ids)
+        campaign_id = request.data.get('campaign')
+        if campaign_id is not None:
+            try:
+                campaign_id = int(campaign_id)
+            except (TypeError, ValueError):
+                return Response({'detail': 'campaign must be a campaign id'}, status=400)
+            qs = qs.filter(campaign_id=campaign_id)
+
+        # Group by campaign: requeued recipients go back into their campaign's drafts
+        by_campaign = {}
+        for letter in qs:
+            by_campaign.setdefault(letter.campaign_id, (letter.campaign, []))[1].append(letter)
+
+        requeued = 0
+        waiting = []
+        for campaign, letters in by_campaign.values():
+            with transaction.atomic():
+                self._requeue_drafts(campaign, letters)
+                DeadLetter.objects.filter(id__in=[letter.id for letter in letters]).update(requeued_at=timezone.now())
+            requeued += len(letters)
+
+            if campaign.status in ('draft', 'preparing', 'prepared'):
+                # Sent with the rest of the campaign
+                waiting.append(campaign.id)
+            elif not worker_is_alive(campaign):
+                start_campaign_worker(campaign)
+            # A running worker picks the drafts up before it completes
+
+        return Response({'requeued': requeued, 'waiting_campaigns': waiting}, status=200)
+
+    def _requeue_drafts(self, campaign, letters):
+        """Make the letters' drafts due again with their stored subject/body"""
+        next_position = None
+        for letter in letters:
+            fields = {
+                'subject': letter.subject, 'body': letter.body, 'status': 'ready',
+                'due_at': None, 'attempts': 0, 'error_message': None,
+            }
+            if letter.draft_id and CampaignDraft.objects.filter(pk=letter.draft_id).update(**fields):
+                continue
+            # Dead letters from before drafts were linked get a new draft at the end of the campaign
+            if next_position is None:
+                next_position = (campaign.drafts.aggregate(Max('position'))['position__max'] or 0) + 1
+            draft = CampaignDraft.objects.create(
+                campaign=campaign, position=next_position, recipient=letter.recipient,
+                recipient_data=letter.recipient_data, **fields
+            )
+            DeadLetter.objects.filter(pk=letter.pk).update(draft=draft)
+            next_position += 1
+
+
+# Sender pool views
+class SenderAccountListCreateView(generics.ListCreateAPIView):
+    """List the user's pooled mailboxes or add an SMTP identity (Gmail ones connect via OAuth2)"""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = SenderAccountSerializer
+
+    def get_queryset(self):
+        return SenderAccount.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user, provider='smtp')
+
+
+class SenderAccountDetailView(generics.RetrieveUpdateDestroyAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = SenderAccountSerializer
+
+    def get_queryset(self):
+        return SenderAccount.objects.filter(user=self.request.user)
 
 
 class CreateBulkCampaignFromBusinessesView(APIView):
@@ -310,6 +445,13 @@ class CreateBulkCampaignFromBusinessesView(APIView):
         if not businesses:
             return Response({'detail': 'No businesses provided'}, status=400)
 
+        # Leave out businesses the user already emailed (send include_contacted=true to keep them)
+        skipped = 0
+        if not include_contacted(request):
+            businesses, skipped = ContactedIndex(request.user).exclude(businesses)
+            if not businesses:
+                return Response({'detail': 'All businesses were already contacted', 'skipped_contacted': skipped}, status=400)
+
         # Create campaign with businesses as recipients
         campaign = BulkEmailCampaign.objects.create(
             user=request.user,
@@ -323,7 +465,8 @@ class CreateBulkCampaignFromBusinessesView(APIView):
         return Response({
             'detail': 'Bulk campaign created successfully',
             'campaign_id': campaign.id,
-            'recipients_count': len(businesses)
+            'recipients_count': len(businesses),
+            'skipped_contacted': skipped
         }, status=201)
 
 